@@ -1,8 +1,8 @@
 from pathlib import Path
 
-from asgiref.wsgi import WsgiToAsgi
 from dotenv import load_dotenv
 
+from parlanchina.asgi import ParlanchinaASGI
 from parlanchina.paths import Mode
 
 
@@ -27,4 +27,4 @@ def create_app():
     return _create_app(root, dirs)
 
 
-app = WsgiToAsgi(create_app())
+app = ParlanchinaASGI(create_app())
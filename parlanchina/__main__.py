@@ -1,21 +1,44 @@
 import argparse
+import json
 import os
 import platform
 import threading
 import time
 import webbrowser
+from datetime import datetime
 from pathlib import Path
 
 from parlanchina.app import create_app
 from parlanchina.paths import Mode, ensure_app_dirs, get_app_root
+from parlanchina.services import chat_store
 
 
 def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Run Parlanchina in desktop or dev mode.")
-    parser.add_argument("mode", nargs="?", choices=("desktop", "dev"), default="desktop")
+    parser = argparse.ArgumentParser(
+        description=(
+            "Run Parlanchina in desktop or dev mode, serve it with an ASGI server, "
+            "rebuild the search index or print the message history."
+        )
+    )
+    parser.add_argument(
+        "mode", nargs="?", choices=("desktop", "dev", "serve", "reindex", "history"), default="desktop"
+    )
     parser.add_argument("--root", help="Override the application root directory.")
     parser.add_argument("--host", default="127.0.0.1", help="Hostname to bind the server to.")
     parser.add_argument("--port", type=int, default=5000, help="Port for the Flask server.")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker processes for 'serve' (default 1)."
+    )
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="For 'history': first timestamp to print (ISO 8601, UTC if no offset).",
+    )
+    parser.add_argument(
+        "--until",
+        type=datetime.fromisoformat,
+        help="For 'history': print entries before this timestamp (ISO 8601).",
+    )
     parser.add_argument("--debug", dest="debug", action="store_true", help="Enable Flask debug mode.")
     parser.add_argument("--no-debug", dest="debug", action="store_false", help="Disable Flask debug mode explicitly.")
     parser.set_defaults(debug=None)
@@ -24,6 +47,15 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
 
 def main(argv: list[str] | None = None) -> None:
     args = parse_args(argv)
+    if args.mode == "reindex":
+        _run_reindex(args)
+        return
+    if args.mode == "serve":
+        _run_serve(args)
+        return
+    if args.mode == "history":
+        _run_history(args)
+        return
     mode = Mode.DESKTOP if args.mode == "desktop" else Mode.DEV
 
     if mode == Mode.DESKTOP:
@@ -40,6 +72,10 @@ def _run_dev(args: argparse.Namespace) -> None:
     app = create_app(root, dirs)
 
     debug = True if args.debug is None else args.debug
+    # With the reloader on, only the child process that serves requests does upkeep.
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        chat_store.start_search_backfill(app)
+        chat_store.start_background_compaction(app)
 
     app.run(
         host=args.host,
@@ -50,6 +86,45 @@ def _run_dev(args: argparse.Namespace) -> None:
     )
 
 
+def _run_serve(args: argparse.Namespace) -> None:
+    """Serve ``parlanchina:app`` (ASGI, native streaming) with hypercorn."""
+    from hypercorn.config import Config
+    from hypercorn.run import run
+
+    root = get_app_root(cli_root=args.root)
+    # Worker processes import parlanchina:app themselves; pass the root along.
+    os.environ["PARLANCHINA_ROOT"] = str(root)
+    _load_dev_dotenv(root)
+
+    config = Config()
+    config.application_path = "parlanchina:app"
+    config.bind = [f"{args.host}:{args.port}"]
+    config.workers = max(1, args.workers)
+    config.accesslog = "-" if args.debug else None
+    print(f"[Parlanchina] Serving on http://{args.host}:{args.port} ({config.workers} worker(s))")
+    run(config)
+
+
+def _run_reindex(args: argparse.Namespace) -> None:
+    root = get_app_root(cli_root=args.root)
+    _load_dev_dotenv(root)
+    app = create_app(root, ensure_app_dirs(root))
+    with app.app_context():
+        started = time.perf_counter()
+        count = chat_store.rebuild_search_index()
+    print(f"[Parlanchina] Indexed {count} session(s) in {time.perf_counter() - started:.1f}s")
+
+
+def _run_history(args: argparse.Namespace) -> None:
+    """Print history entries in ``[--since, --until)`` as JSON lines."""
+    root = get_app_root(cli_root=args.root)
+    _load_dev_dotenv(root)
+    app = create_app(root, ensure_app_dirs(root))
+    with app.app_context():
+        for entry in chat_store.history().read_range(args.since, args.until):
+            print(json.dumps(entry, ensure_ascii=False))
+
+
 def _run_desktop(args: argparse.Namespace) -> None:
     os.environ.setdefault("PARLANCHINA_MODE", "desktop")
     debug = False if args.debug is None else args.debug
@@ -58,6 +133,8 @@ def _run_desktop(args: argparse.Namespace) -> None:
         root = get_app_root(mode=Mode.DESKTOP, cli_root=args.root)
         dirs = ensure_app_dirs(root)
         app = create_app(root, dirs)
+        chat_store.start_search_backfill(app)
+        chat_store.start_background_compaction(app)
         app.run(
             host=args.host,
             port=args.port,
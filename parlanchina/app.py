@@ -5,7 +5,7 @@ from typing import Any
 
 from flask import Flask
 
-from parlanchina.config import load_config
+from parlanchina.config import load_config, register_settings
 from parlanchina.paths import Mode, detect_mode
 from parlanchina.utils.banner import load_banner_html
 from parlanchina.utils.config_view import build_config_html
@@ -116,6 +116,7 @@ def create_app(app_root: Path, dirs: dict) -> Flask:
     app.config["PARLANCHINA_MODELS"] = _resolve_models(config_values)
     app.config["PARLANCHINA_DEFAULT_MODEL"] = _resolve_default_model(config_values)
     app.config["RAW_CONFIG"] = raw_config
+    register_settings(app.config)
     app.config["BANNER_HTML"] = load_banner_html()
 
     env_snapshot_keys = set(_DESKTOP_ENV_KEYS)
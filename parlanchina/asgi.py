@@ -0,0 +1,103 @@
+"""ASGI front end: the Flask app behind ``WsgiToAsgi`` plus a native stream route.
+
+Through ``WsgiToAsgi`` every open chat stream would hold a worker thread
+while it waits on the model. ``GET /chat/<id>/stream`` is therefore served
+here as an async generator on the server's event loop; everything else goes
+to Flask unchanged.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from typing import Any, Awaitable, Callable
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import Flask
+
+from parlanchina.routes import STREAM_HEADERS, STREAM_MIMETYPE, prepare_stream, stream_lines
+from parlanchina.services import aux_jobs, background_loop, chat_store, mcp_manager
+
+logger = logging.getLogger(__name__)
+
+_STREAM_PATH = re.compile(r"^/chat/(?P<session_id>[^/]+)/stream$")
+
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+class ParlanchinaASGI:
+    def __init__(self, flask_app: Flask) -> None:
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope: dict[str, Any], receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] == "http" and scope["method"] == "GET":
+            match = _STREAM_PATH.match(scope["path"])
+            if match:
+                await self._stream(scope, receive, send, match["session_id"])
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                chat_store.start_search_backfill(self.flask_app)
+                chat_store.start_background_compaction(self.flask_app)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await asyncio.to_thread(aux_jobs.shutdown)
+                await asyncio.to_thread(mcp_manager.shutdown)
+                await asyncio.to_thread(background_loop.shutdown)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _prepare(self, session_id: str, model: str | None) -> dict | None:
+        with self.flask_app.app_context():
+            return prepare_stream(session_id, model)
+
+    async def _stream(
+        self, scope: dict[str, Any], receive: Receive, send: Send, session_id: str
+    ) -> None:
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        model = (query.get("model") or [""])[0] or None
+        # Session and tool-selection I/O is blocking; keep it off the loop.
+        job = await asyncio.to_thread(self._prepare, session_id, model)
+        if job is None:
+            # Let Flask produce its regular 404 response.
+            await self.wsgi(scope, receive, send)
+            return
+
+        headers = [(b"content-type", f"{STREAM_MIMETYPE}; charset=utf-8".encode())]
+        headers += [(k.lower().encode(), v.encode()) for k, v in STREAM_HEADERS.items()]
+
+        async def _pump() -> None:
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            with self.flask_app.app_context():
+                async for line in stream_lines(**job):
+                    await send({"type": "http.response.body", "body": line.encode(), "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        async def _disconnected() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        pump = asyncio.create_task(_pump())
+        watcher = asyncio.create_task(_disconnected())
+        try:
+            await asyncio.wait({pump, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+            if not pump.done():
+                # Client went away: stop the model call and any tool calls.
+                logger.info("Stream for session %s cancelled by client disconnect", session_id)
+                pump.cancel()
+            await asyncio.gather(pump, watcher, return_exceptions=True)
+        if not pump.cancelled() and pump.exception() is not None:
+            raise pump.exception()  # type: ignore[misc]
@@ -1,9 +1,12 @@
 import json
+import os
 from pathlib import Path
-from typing import Any
+from typing import Any, Mapping
 
 import yaml
 
+_settings: Mapping[str, Any] = {}
+
 
 def load_config(config_dir: Path) -> dict[str, Any]:
     cfg_json = config_dir / "settings.json"
@@ -16,3 +19,45 @@ def load_config(config_dir: Path) -> dict[str, Any]:
         return yaml.safe_load(cfg_yaml.read_text())
 
     return {}
+
+
+def register_settings(values: Mapping[str, Any]) -> None:
+    """Remember the resolved settings for code running outside an app context."""
+    global _settings
+    _settings = values
+
+
+def get_setting(key: str, default: Any = None) -> Any:
+    """Resolve a setting: environment first, then the settings file."""
+    env_value = os.getenv(key)
+    if env_value not in (None, ""):
+        return env_value
+    try:
+        from flask import current_app
+
+        values: Mapping[str, Any] = current_app.config
+    except RuntimeError:
+        values = _settings
+    value = values.get(key)
+    return default if value in (None, "") else value
+
+
+def get_int_setting(key: str, default: int) -> int:
+    try:
+        return int(get_setting(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_float_setting(key: str, default: float) -> float:
+    try:
+        return float(get_setting(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_bool_setting(key: str, default: bool) -> bool:
+    value = get_setting(key, default)
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes", "on"}
+    return bool(value)
@@ -4,7 +4,7 @@ from typing import Any
 
 from flask import Blueprint, abort, jsonify, request
 
-from parlanchina.services import chat_store, internal_tools, mcp_manager
+from parlanchina.services import background_loop, chat_store, internal_tools, mcp_manager
 
 bp = Blueprint("mcp", __name__, url_prefix="/mcp")
 logger = logging.getLogger(__name__)
@@ -73,8 +73,7 @@ def run_tool(server_name: str, tool_name: str):
     message_html = None
     raw_markdown = result.display_text
     if session_id:
-        session = chat_store.load_session(session_id)
-        if session:
+        if chat_store.load_header(session_id) is not None:
             message = chat_store.append_assistant_message(session_id, raw_markdown)
             message_html = message.get("html")
 
@@ -99,7 +98,12 @@ def list_tools():
     if not session_id:
         abort(400, "session_id is required")
 
-    return jsonify(_build_tool_payload(session_id))
+    catalog = _mcp_catalog()
+    try:
+        with chat_store.session_transaction(session_id) as tx:
+            return jsonify(_build_tool_payload(tx, *catalog))
+    except FileNotFoundError:
+        abort(404, "Session not found")
 
 
 
@@ -116,66 +120,90 @@ def update_tool_selection():
     if not session_id:
         abort(400, "session_id is required")
 
-    session = chat_store.load_session(session_id)
-    if not session:
+    mcp_defs, mcp_servers = _mcp_catalog()
+    try:
+        with chat_store.session_transaction(session_id) as tx:
+            if mode in {"ask", "agent"}:
+                tx.set_mode(mode)
+
+            # Internal tools
+            internal_valid_ids = set(internal_tools.all_tool_ids())
+            if enabled_internal_tools is not None:
+                normalized_internal = [tool_id for tool_id in enabled_internal_tools if tool_id in internal_valid_ids]
+                tx.set_enabled_internal_tools(normalized_internal)
+
+            # MCP tools (only if MCP manager is up)
+            if enabled_mcp_tools is not None and mcp_manager.is_enabled():
+                valid_ids = {tool["id"] for tool in mcp_defs}
+                unknown = _failed_servers(mcp_servers)
+                normalized_mcp = [
+                    tool_id
+                    for tool_id in enabled_mcp_tools
+                    if tool_id in valid_ids or _server_of(tool_id) in unknown
+                ]
+                tx.set_enabled_mcp_tools(normalized_mcp)
+
+            # Respond with updated state
+            return jsonify(_build_tool_payload(tx, mcp_defs, mcp_servers))
+    except FileNotFoundError:
         abort(404, "Session not found")
 
-    current_mode = chat_store.get_mode(session_id)
-    if mode in {"ask", "agent"}:
-        chat_store.set_mode(session_id, mode)
-        current_mode = mode
 
-    # Internal tools
-    internal_valid_ids = set(internal_tools.all_tool_ids())
-    if enabled_internal_tools is not None:
-        normalized_internal = [tool_id for tool_id in enabled_internal_tools if tool_id in internal_valid_ids]
-        chat_store.set_enabled_internal_tools(session_id, normalized_internal)
+def _mcp_catalog() -> tuple[list[dict], list[mcp_manager.MCPServerStatus]]:
+    if not mcp_manager.is_enabled():
+        return [], []
+    return background_loop.run(mcp_manager.list_all_tools_async())
 
-    # MCP tools (only if MCP manager is up)
-    if enabled_mcp_tools is not None and mcp_manager.is_enabled():
-        mcp_defs = mcp_manager.list_all_tools()
-        valid_ids = {tool["id"] for tool in mcp_defs}
-        normalized_mcp = [tool_id for tool_id in enabled_mcp_tools if tool_id in valid_ids]
-        chat_store.set_enabled_mcp_tools(session_id, normalized_mcp)
 
-    # Respond with updated state
-    return jsonify(_build_tool_payload(session_id))
+def _failed_servers(statuses: list[mcp_manager.MCPServerStatus]) -> set[str]:
+    return {status.name for status in statuses if not status.ok}
 
 
-def _build_tool_payload(session_id: str) -> dict:
-    session = chat_store.load_session(session_id)
-    if not session:
-        abort(404, "Session not found")
+def _server_of(tool_id: str) -> str:
+    return tool_id.split(".", 1)[0]
 
-    mode = chat_store.get_mode(session_id)
+
+def _build_tool_payload(
+    tx: chat_store.SessionTransaction,
+    mcp_defs: list[dict],
+    mcp_servers: list[mcp_manager.MCPServerStatus],
+) -> dict:
+    """Build the toolbox state; default/cleanup writes are collected on ``tx``."""
+    mode = tx.mode
 
     # Internal tools
     internal_defs = internal_tools.list_internal_tools()
     internal_ids = {tool["id"] for tool in internal_defs}
-    internal_enabled = chat_store.get_enabled_internal_tools(session_id)
+    internal_enabled = tx.enabled_internal_tools
     if internal_enabled is None:
         internal_enabled = sorted(internal_ids)
-        chat_store.set_enabled_internal_tools(session_id, internal_enabled)
+        tx.set_enabled_internal_tools(internal_enabled)
     internal_enabled_set = set(internal_enabled)
 
     # MCP tools
     mcp_enabled = mcp_manager.is_enabled()
     mcp_reason = mcp_manager.disabled_reason()
-    mcp_defs = mcp_manager.list_all_tools() if mcp_enabled else []
     available_mcp_ids = {tool["id"] for tool in mcp_defs}
+    # Servers that failed to list keep their selections until they answer again.
+    unknown_servers = _failed_servers(mcp_servers)
 
-    enabled_mcp = chat_store.get_enabled_mcp_tools(session_id)
+    enabled_mcp = tx.enabled_mcp_tools
     if enabled_mcp is None and mcp_enabled:
         enabled_mcp = sorted(available_mcp_ids)
-        chat_store.set_enabled_mcp_tools(session_id, enabled_mcp or [])
+        tx.set_enabled_mcp_tools(enabled_mcp or [])
     elif enabled_mcp is None:
         enabled_mcp = []
 
     # Remove stale tool ids that no longer exist
-    cleaned_enabled_mcp = sorted(set(enabled_mcp).intersection(available_mcp_ids))
+    cleaned_enabled_mcp = sorted(
+        tool_id
+        for tool_id in set(enabled_mcp)
+        if tool_id in available_mcp_ids or _server_of(tool_id) in unknown_servers
+    )
     if cleaned_enabled_mcp != enabled_mcp:
-        chat_store.set_enabled_mcp_tools(session_id, cleaned_enabled_mcp)
+        tx.set_enabled_mcp_tools(cleaned_enabled_mcp)
         enabled_mcp = cleaned_enabled_mcp
+    enabled_mcp_set = set(enabled_mcp)
 
     return {
         "mode": mode,
@@ -196,8 +224,18 @@ def _build_tool_payload(session_id: str) -> dict:
                 "name": tool["name"],
                 "id": tool["id"],
                 "description": tool.get("description") or "",
-                "applied": tool["id"] in set(enabled_mcp),
+                "applied": tool["id"] in enabled_mcp_set,
             }
             for tool in mcp_defs
         ],
+        "mcp_servers": [
+            {
+                "name": status.name,
+                "ok": status.ok,
+                "tool_count": status.tool_count,
+                "elapsed_ms": status.elapsed_ms,
+                "error": status.error,
+            }
+            for status in mcp_servers
+        ],
     }
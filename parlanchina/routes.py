@@ -1,7 +1,7 @@
 import asyncio
 import json
 import logging
-import threading
+from collections.abc import AsyncIterator
 
 from flask import (
     Blueprint,
@@ -15,11 +15,33 @@ from flask import (
     url_for,
 )
 
-from parlanchina.services import chat_store, image_store, internal_tools, llm, mcp_manager
+from parlanchina.config import get_int_setting
+from parlanchina.services import (
+    aux_jobs,
+    background_loop,
+    chat_store,
+    context_budget,
+    image_store,
+    internal_tools,
+    llm,
+    mcp_manager,
+    rate_limiter,
+    render_cache,
+    response_cache,
+    titles,
+)
 
 bp = Blueprint("main", __name__)
 logger = logging.getLogger(__name__)
 
+_MAX_PAGE_SIZE = 200
+
+STREAM_MIMETYPE = "text/plain"
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
 
 @bp.get("/")
 def index():
@@ -43,9 +65,12 @@ def new_chat():
 
 @bp.get("/chat/<session_id>")
 def chat(session_id: str):
-    session = chat_store.load_session(session_id)
-    if not session:
+    page = chat_store.load_message_page(
+        session_id, limit=get_int_setting("PARLANCHINA_INITIAL_MESSAGES", 50)
+    )
+    if not page:
         abort(404)
+    session = {**page["session"], "messages": render_cache.with_html(page["messages"])}
 
     models = current_app.config.get("PARLANCHINA_MODELS", [])
     selected_model = session.get("model") or _resolve_model()
@@ -57,9 +82,33 @@ def chat(session_id: str):
         sessions=sessions,
         models=models,
         selected_model=selected_model,
+        first_index=page["start"],
+        total_messages=page["total"],
     )
 
 
+@bp.get("/chat/<session_id>/messages")
+def get_messages(session_id: str):
+    """Return a page of messages; ``before`` is a message index cursor."""
+    before = request.args.get("before", type=int)
+    limit = min(max(request.args.get("limit", 50, type=int), 1), _MAX_PAGE_SIZE)
+    page = chat_store.load_message_page(session_id, before=before, limit=limit)
+    if not page:
+        abort(404)
+    messages = render_cache.with_html(page["messages"])
+    payload = {
+        "messages": messages,
+        "start": page["start"],
+        "end": page["end"],
+        "total": page["total"],
+        "has_more": page["has_more"],
+        "next_before": page["start"] if page["has_more"] else None,
+    }
+    if request.args.get("format") == "html":
+        payload["html"] = render_template("_messages.html", messages=messages)
+    return jsonify(payload)
+
+
 @bp.post("/chat/<session_id>")
 def post_message(session_id: str):
     data = request.get_json(silent=True) or request.form
@@ -68,185 +117,240 @@ def post_message(session_id: str):
     if not content:
         abort(400, "Message content required")
 
-    session = chat_store.load_session(session_id)
+    session = chat_store.load_header(session_id)
     if not session:
         abort(404)
 
     # Check if this is the first user message in the session
-    is_first_message = len(session.get("messages", [])) == 0
-    
-    chat_store.append_user_message(session_id, content, model=model)
-    
-    # Generate session title in background for first message
+    is_first_message = session.get("message_count", 0) == 0
+    title = titles.initial_title(content) if is_first_message else None
+
+    chat_store.append_user_message(session_id, content, model=model, title=title)
+
+    # Model title for the first message, generated in the background
+    title_pending = False
     if is_first_message:
         used_model = model or session.get("model") or _resolve_model()
-        _generate_session_title_async(session_id, content, used_model)
-    
-    return jsonify({"status": "ok"})
+        title_pending = titles.schedule_model_title(
+            current_app._get_current_object(),
+            session_id,
+            content,
+            used_model,
+            expected=title or session.get("title") or titles.DEFAULT_TITLE,
+        )
+
+    return jsonify({"status": "ok", "title": title, "title_pending": title_pending})
 
 
 @bp.get("/chat/<session_id>/stream")
 def stream_response(session_id: str):
-    session = chat_store.load_session(session_id)
-    if not session:
+    """WSGI variant of the stream; ``parlanchina.asgi`` serves it natively."""
+    job = prepare_stream(session_id, request.args.get("model"))
+    if job is None:
         abort(404)
-
-    model = request.args.get("model") or session.get("model") or _resolve_model()
-    payload_messages = _format_messages_for_model(session)
     app = current_app._get_current_object()
-    mode = chat_store.get_mode(session_id)
-
-    # Tool enablement: tools are shown as enabled in UI but not sent to LLM in ask mode
-    internal_enabled = chat_store.get_enabled_internal_tools(session_id)
-    if internal_enabled is None:
-        internal_enabled = internal_tools.all_tool_ids()
-        chat_store.set_enabled_internal_tools(session_id, internal_enabled)
-    
-    # In ask mode, don't pass tools to LLM (they're just for UI display)
-    llm_internal_tools = internal_enabled if mode == "agent" else []
-
-    # MCP tools: only enabled in agent mode (disabled in ask mode)
-    mcp_enabled_tools: list[str] = []
-    if mode == "agent" and mcp_manager.is_enabled():
-        enabled_tools = chat_store.get_enabled_mcp_tools(session_id)
-        if enabled_tools is None:
-            try:
-                enabled_tools = [tool["id"] for tool in mcp_manager.list_all_tools()]
-                chat_store.set_enabled_mcp_tools(session_id, enabled_tools)
-            except Exception:
-                enabled_tools = []
-        mcp_enabled_tools = enabled_tools or []
 
     def generate():
-        import asyncio
         with app.app_context():
-            text_buffer = ""
-            images: list[dict[str, str]] = []
-            # Get or create event loop for this thread
+            # Run the async generator on the shared background loop.
+            yield from background_loop.iterate(stream_lines(**job))
+
+    return Response(generate(), mimetype=STREAM_MIMETYPE, headers=STREAM_HEADERS)
+
+
+def prepare_stream(session_id: str, model: str | None) -> dict | None:
+    """Resolve model, messages and tool selection for a stream (None if no session).
+
+    Runs inside an app context; the result feeds ``stream_lines``.
+    """
+    session = chat_store.load_session(session_id)
+    if not session:
+        return None
+
+    model = model or session.get("model") or _resolve_model()
+    context = context_budget.build_context(
+        context_budget.model_messages(session), session.get("context_summary"), model
+    )
+    if context.needs_summary:
+        context_budget.schedule_summary(current_app._get_current_object(), session_id, model)
+
+    with chat_store.session_transaction(session_id) as tx:
+        mode = tx.mode
+
+        # Tool enablement: tools are shown as enabled in UI but not sent to LLM in ask mode
+        internal_enabled = tx.enabled_internal_tools
+        if internal_enabled is None:
+            internal_enabled = internal_tools.all_tool_ids()
+            tx.set_enabled_internal_tools(internal_enabled)
+
+        # In ask mode, don't pass tools to LLM (they're just for UI display)
+        llm_internal_tools = internal_enabled if mode == "agent" else []
+
+        # MCP tools: only enabled in agent mode (disabled in ask mode)
+        mcp_enabled_tools: list[str] = []
+        mcp_defaults_needed = False
+        if mode == "agent" and mcp_manager.is_enabled():
+            enabled_tools = tx.enabled_mcp_tools
+            mcp_defaults_needed = enabled_tools is None
+            mcp_enabled_tools = enabled_tools or []
+
+    if mcp_defaults_needed:
+        # Listing tools may reach the servers, so it runs outside the session lock.
+        try:
+            mcp_enabled_tools = [tool["id"] for tool in mcp_manager.list_all_tools()]
+        except Exception:
+            mcp_enabled_tools = []
+        else:
             try:
-                loop = asyncio.get_event_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-            # Run the async generator in sync context
-            async_gen = llm.stream_response(
-                payload_messages,
-                model,
-                mode=mode,
-                internal_tools=llm_internal_tools,
-                mcp_tools=mcp_enabled_tools,
-            )
-            while True:
+                with chat_store.session_transaction(session_id) as tx:
+                    if tx.enabled_mcp_tools is None:
+                        tx.set_enabled_mcp_tools(mcp_enabled_tools)
+            except FileNotFoundError:
+                pass
+
+    return {
+        "messages": context.messages,
+        "model": model,
+        "mode": mode,
+        "internal_ids": llm_internal_tools,
+        "mcp_ids": mcp_enabled_tools,
+    }
+
+
+async def stream_lines(
+    messages: list[dict],
+    model: str,
+    mode: str,
+    internal_ids: list[str],
+    mcp_ids: list[str],
+) -> AsyncIterator[str]:
+    """Turn LLM events into the NDJSON lines read by ``stream.js``.
+
+    Needs an app context (image saving, settings) around the iteration.
+    """
+    text_buffer = ""
+    images: list[dict[str, str]] = []
+    usage: dict[str, int] = {}
+    async for event in llm.stream_response(
+        messages,
+        model,
+        mode=mode,
+        internal_tools=internal_ids,
+        mcp_tools=mcp_ids,
+    ):
+        if event.type == "text_delta":
+            delta = event.text or ""
+            if delta:
+                text_buffer += delta
+                yield json.dumps({"type": "text_delta", "text": delta}) + "\n"
+        elif event.type == "image_start":
+            yield json.dumps({"type": "image_start"}) + "\n"
+        elif event.type == "tool_done":
+            yield json.dumps({"type": "tool_progress", **(event.tool or {})}) + "\n"
+        elif event.type == "usage":
+            # Summed over the model calls of this response (agent turns).
+            for key, value in (event.usage or {}).items():
+                usage[key] = usage.get(key, 0) + value
+        elif event.type == "image_call":
+            # Handle both cases: image_b64 (need to save) or already saved (from agent mode)
+            if event.image_b64:
+                # Standard case: save the image from base64
                 try:
-                    event = loop.run_until_complete(async_gen.__anext__())
-                    if event.type == "text_delta":
-                        delta = event.text or ""
-                        if delta:
-                            text_buffer += delta
-                            yield json.dumps({"type": "text_delta", "text": delta}) + "\n"
-                    elif event.type == "image_start":
-                        yield json.dumps({"type": "image_start"}) + "\n"
-                    elif event.type == "image_call":
-                        # Handle both cases: image_b64 (need to save) or already saved (from agent mode)
-                        if event.image_b64:
-                            # Standard case: save the image from base64
-                            try:
-                                meta = image_store.save_image_from_base64(event.image_b64)
-                                alt_text = _derive_alt_text(event.image_params)
-                                image_payload = {"url": meta.url_path, "alt_text": alt_text}
-                                images.append(image_payload)
-                                addition = f"\n\n![{alt_text}]({meta.url_path})\n"
-                                text_buffer += addition
-                                yield (
-                                    json.dumps(
-                                        {
-                                            "type": "image",
-                                            "url": meta.url_path,
-                                            "alt_text": alt_text,
-                                            "markdown": addition,
-                                        }
-                                    )
-                                    + "\n"
-                                )
-                            except Exception as exc:  # pragma: no cover - safety
-                                logger.exception("Failed to persist generated image: %s", exc)
-                                yield json.dumps({"type": "error", "message": "Image save failed"}) + "\n"
-                        elif event.image_params and event.image_params.get("url_path"):
-                            # Agent mode case: image already saved, just emit the markdown
-                            try:
-                                url_path = event.image_params["url_path"]
-                                alt_text = _derive_alt_text(event.image_params)
-                                image_payload = {"url": url_path, "alt_text": alt_text}
-                                images.append(image_payload)
-                                addition = f"\n\n![{alt_text}]({url_path})\n"
-                                text_buffer += addition
-                                yield (
-                                    json.dumps(
-                                        {
-                                            "type": "image",
-                                            "url": url_path,
-                                            "alt_text": alt_text,
-                                            "markdown": addition,
-                                        }
-                                    )
-                                    + "\n"
-                                )
-                            except Exception as exc:  # pragma: no cover - safety
-                                logger.exception("Failed to handle pre-saved image: %s", exc)
-                                yield json.dumps({"type": "error", "message": "Image handling failed"}) + "\n"
-                    elif event.type == "error":
-                        error_message = event.text or "LLM error"
-                        analysis = ""
-                        try:
-                            analysis_prompt = [
-                                {
-                                    "role": "system",
-                                    "content": "You are a helpful assistant that explains model or tool errors succinctly for end users. Provide a brief, calm summary and a likely cause/next step.",
-                                },
-                                {
-                                    "role": "user",
-                                    "content": f"Explain this image-generation error for the user in 2-3 sentences:\n\n{error_message}",
-                                },
-                            ]
-                            analysis = loop.run_until_complete(
-                                llm.complete_response(analysis_prompt, model)
-                            )
-                        except Exception as exc:  # pragma: no cover
-                            logger.exception("Failed to analyze error via LLM: %s", exc)
-                            analysis = ""
-
-                        markdown_error = (
-                            "\n\n**Image generation failed**\n\n"
-                            f"```\n{error_message}\n```\n"
+                    meta = image_store.save_image_from_base64(event.image_b64)
+                    alt_text = _derive_alt_text(event.image_params)
+                    image_payload = {"url": meta.url_path, "alt_text": alt_text}
+                    images.append(image_payload)
+                    addition = f"\n\n![{alt_text}]({meta.url_path})\n"
+                    text_buffer += addition
+                    yield (
+                        json.dumps(
+                            {
+                                "type": "image",
+                                "url": meta.url_path,
+                                "alt_text": alt_text,
+                                "markdown": addition,
+                            }
                         )
-                        if analysis:
-                            markdown_error += f"\n{analysis}\n"
-                        text_buffer += markdown_error
-                        yield (
-                            json.dumps(
-                                {
-                                    "type": "error",
-                                    "message": error_message,
-                                    "analysis": analysis,
-                                    "markdown": markdown_error,
-                                }
-                            )
-                            + "\n"
+                        + "\n"
+                    )
+                except Exception as exc:  # pragma: no cover - safety
+                    logger.exception("Failed to persist generated image: %s", exc)
+                    yield json.dumps({"type": "error", "message": "Image save failed"}) + "\n"
+            elif event.image_params and event.image_params.get("url_path"):
+                # Agent mode case: image already saved, just emit the markdown
+                try:
+                    url_path = event.image_params["url_path"]
+                    alt_text = _derive_alt_text(event.image_params)
+                    image_payload = {"url": url_path, "alt_text": alt_text}
+                    images.append(image_payload)
+                    addition = f"\n\n![{alt_text}]({url_path})\n"
+                    text_buffer += addition
+                    yield (
+                        json.dumps(
+                            {
+                                "type": "image",
+                                "url": url_path,
+                                "alt_text": alt_text,
+                                "markdown": addition,
+                            }
                         )
-                    elif event.type == "text_done":
-                        if event.text:
-                            if not text_buffer or len(event.text) > len(text_buffer):
-                                text_buffer = event.text
-                except StopAsyncIteration:
-                    break
-            yield json.dumps({"type": "text_done", "text": text_buffer, "images": images}) + "\n"
-
-    headers = {
-        "Cache-Control": "no-cache",
-        "X-Accel-Buffering": "no",
-    }
-    return Response(generate(), mimetype="text/plain", headers=headers)
+                        + "\n"
+                    )
+                except Exception as exc:  # pragma: no cover - safety
+                    logger.exception("Failed to handle pre-saved image: %s", exc)
+                    yield json.dumps({"type": "error", "message": "Image handling failed"}) + "\n"
+        elif event.type == "error":
+            error_message = event.text or "LLM error"
+            analysis = ""
+            try:
+                analysis_prompt = [
+                    {
+                        "role": "system",
+                        "content": "You are a helpful assistant that explains model or tool errors succinctly for end users. Provide a brief, calm summary and a likely cause/next step.",
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Explain this image-generation error for the user in 2-3 sentences:\n\n{error_message}",
+                    },
+                ]
+                # Shared by concurrent streams that hit the same error.
+                analysis = await aux_jobs.run_async(
+                    "error_explanation",
+                    (model, error_message),
+                    lambda: llm.complete_response(
+                        analysis_prompt, model, cache_site="error_explanation"
+                    ),
+                )
+            except Exception as exc:  # pragma: no cover
+                logger.exception("Failed to analyze error via LLM: %s", exc)
+                analysis = ""
+
+            markdown_error = (
+                "\n\n**Image generation failed**\n\n"
+                f"```\n{error_message}\n```\n"
+            )
+            if analysis:
+                markdown_error += f"\n{analysis}\n"
+            text_buffer += markdown_error
+            yield (
+                json.dumps(
+                    {
+                        "type": "error",
+                        "message": error_message,
+                        "analysis": analysis,
+                        "markdown": markdown_error,
+                    }
+                )
+                + "\n"
+            )
+        elif event.type == "text_done":
+            if event.text:
+                if not text_buffer or len(event.text) > len(text_buffer):
+                    text_buffer = event.text
+    done: dict = {"type": "text_done", "text": text_buffer, "images": images}
+    if usage:
+        done["usage"] = usage
+    yield json.dumps(done) + "\n"
 
 
 @bp.post("/chat/<session_id>/rename")
@@ -277,7 +381,7 @@ def delete_session(session_id: str):
 @bp.get("/chat/<session_id>/info")
 def get_session_info(session_id: str):
     """Get session information including current title."""
-    session = chat_store.load_session(session_id)
+    session = chat_store.load_header(session_id)
     if not session:
         abort(404)
     return jsonify({
@@ -287,14 +391,47 @@ def get_session_info(session_id: str):
     })
 
 
+@bp.get("/search")
+def search():
+    """Ranked title and message hits; ``snippet`` is escaped HTML with <mark> around hits."""
+    query = request.args.get("q", "").strip()
+    limit = min(max(request.args.get("limit", 20, type=int), 1), _MAX_PAGE_SIZE)
+    return jsonify(chat_store.search(query, limit=limit))
+
+
+@bp.get("/admin/stats")
+def admin_stats():
+    """Counters of the caches, queues, pools and limiters in this process."""
+    return jsonify(
+        {
+            "store": chat_store.store_stats(),
+            "render_cache": render_cache.stats(),
+            "response_cache": response_cache.stats(),
+            "aux_jobs": aux_jobs.stats(),
+            "titles": titles.stats(),
+            "context": context_budget.stats(),
+            "llm": {
+                "planner": llm.planner_stats(),
+                "prompt_cache": llm.prompt_cache_stats(),
+                "coalesce": llm.coalesce_stats(),
+            },
+            "rate_limits": rate_limiter.stats(),
+            "mcp": {
+                "catalog": mcp_manager.catalog_stats(),
+                "pool": mcp_manager.pool_stats(),
+                "coalesce": mcp_manager.coalesce_stats(),
+            },
+        }
+    )
+
+
 @bp.post("/chat/<session_id>/finalize")
 def finalize_message(session_id: str):
     data = request.get_json(force=True)
     content = data.get("content", "")
     model = data.get("model") or None
     images = data.get("images") or []
-    session = chat_store.load_session(session_id)
-    if not session:
+    if chat_store.load_header(session_id) is None:
         abort(404)
     message = chat_store.append_assistant_message(
         session_id, content, model=model, images=images
@@ -317,17 +454,6 @@ def _resolve_model() -> str:
     return ""
 
 
-def _format_messages_for_model(session: dict) -> list[dict]:
-    formatted = []
-    for message in session.get("messages", []):
-        if message["role"] == "assistant":
-            content = message.get("raw_markdown") or message.get("content") or ""
-        else:
-            content = message.get("content") or ""
-        formatted.append({"role": message["role"], "content": content})
-    return formatted
-
-
 def _derive_alt_text(params: dict | None) -> str:
     if not params:
         return "Generated image"
@@ -336,53 +462,3 @@ def _derive_alt_text(params: dict | None) -> str:
         if isinstance(value, str) and value.strip():
             return value.strip()
     return "Generated image"
-
-
-def _generate_session_title_async(session_id: str, user_message: str, model: str):
-    """Generate a session title in a background thread."""
-    # Capture the current Flask app context
-    app = current_app._get_current_object()
-    
-    def _run_title_generation():
-        try:
-            # Use the captured app context in the thread
-            with app.app_context():
-                # Create new event loop for this thread
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
-                # Prepare the title generation prompt
-                title_prompt = [
-                    {
-                        "role": "system", 
-                        "content": "You are a helpful assistant that creates concise, descriptive titles for chat sessions. Generate a short title (3-6 words) that summarizes the main topic or request from the user's message. Respond with only the title, no quotes or additional text."
-                    },
-                    {
-                        "role": "user", 
-                        "content": f"Create a short title for a chat session based on this user message: {user_message}"
-                    }
-                ]
-                
-                # Generate title using AI
-                title = loop.run_until_complete(
-                    llm.complete_response(title_prompt, model)
-                )
-                
-                # Clean up the title (remove quotes if present, limit length)
-                title = title.strip().strip('"').strip("'")
-                if len(title) > 50:  # Limit title length
-                    title = title[:47] + "..."
-                
-                # Update the session with the new title
-                chat_store.update_session_title(session_id, title)
-                logger.info(f"Generated title for session {session_id}: {title}")
-                
-        except Exception as e:
-            logger.error(f"Failed to generate title for session {session_id}: {e}")
-        finally:
-            if 'loop' in locals():
-                loop.close()
-    
-    # Run in background thread
-    thread = threading.Thread(target=_run_title_generation, daemon=True)
-    thread.start()
@@ -0,0 +1,271 @@
+"""Bounded queue for auxiliary LLM jobs (session titles, error explanations).
+
+These calls are not part of the answer the user waits for, so they must not
+grow without bound during a burst of new chats. Jobs are queued and run by a
+fixed number of worker tasks on the shared background loop:
+
+- a job with the same ``(kind, key)`` as a queued or running one shares its
+  result instead of running twice (e.g. one title per session),
+- each job is cancelled after its timeout,
+- a full queue rejects new jobs with ``QueueFull``,
+- ``shutdown`` stops accepting jobs and lets queued ones finish for a while.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import contextvars
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable
+
+from parlanchina.config import get_float_setting, get_int_setting
+from parlanchina.services import background_loop
+from parlanchina.services.background_loop import BackgroundLoop
+
+logger = logging.getLogger(__name__)
+
+JobFactory = Callable[[], Awaitable[Any]]
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class _Job:
+    kind: str
+    key: Hashable | None
+    factory: JobFactory
+    timeout: float
+    context: contextvars.Context
+    future: concurrent.futures.Future = field(default_factory=concurrent.futures.Future)
+    queued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def ident(self) -> tuple[str, Hashable] | None:
+        return None if self.key is None else (self.kind, self.key)
+
+
+@dataclass
+class _Counters:
+    submitted: int = 0
+    deduplicated: int = 0
+    dropped: int = 0
+    completed: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    cancelled: int = 0
+    wait_ms: float = 0.0
+    run_ms: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        data = dict(self.__dict__)
+        data["wait_ms"] = round(self.wait_ms, 2)
+        data["run_ms"] = round(self.run_ms, 2)
+        return data
+
+
+class AuxJobQueue:
+    def __init__(
+        self,
+        loop: BackgroundLoop,
+        *,
+        workers: int = 2,
+        max_queue: int = 256,
+        timeout: float = 30.0,
+    ) -> None:
+        self._background = loop
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.timeout = timeout
+        self._queue: asyncio.Queue[_Job] = asyncio.Queue()
+        self._lock = threading.Lock()
+        self._active: dict[tuple[str, Hashable], _Job] = {}
+        self._counters: dict[str, _Counters] = {}
+        self._depth = 0
+        self._max_depth = 0
+        self._running = 0
+        self._closed = False
+        self._workers = [loop.submit(self._work()) for _ in range(self.workers)]
+
+    # Submitting -----------------------------------------------------------
+
+    def submit(
+        self,
+        kind: str,
+        key: Hashable | None,
+        factory: JobFactory,
+        *,
+        timeout: float | None = None,
+    ) -> concurrent.futures.Future:
+        """Queue ``factory()`` and return a future for its result.
+
+        The job runs in a copy of the caller's context (app context included).
+        """
+        job = _Job(kind, key, factory, timeout or self.timeout, contextvars.copy_context())
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Auxiliary job queue is shut down")
+            counters = self._counters.setdefault(kind, _Counters())
+            counters.submitted += 1
+            existing = self._active.get(job.ident) if job.ident else None
+            if existing is not None:
+                counters.deduplicated += 1
+                return existing.future
+            if self._depth >= self.max_queue:
+                counters.dropped += 1
+                job.future.set_exception(QueueFull(f"{self.max_queue} auxiliary jobs already queued"))
+                return job.future
+            if job.ident:
+                self._active[job.ident] = job
+            self._depth += 1
+            self._max_depth = max(self._max_depth, self._depth)
+        self._background.loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job.future
+
+    async def run_async(
+        self,
+        kind: str,
+        key: Hashable | None,
+        factory: JobFactory,
+        *,
+        timeout: float | None = None,
+    ) -> Any:
+        """Queue a job and await its result from any event loop."""
+        future = asyncio.wrap_future(self.submit(kind, key, factory, timeout=timeout))
+        # A caller going away must not cancel the job for others sharing it.
+        return await asyncio.shield(future)
+
+    # Workers --------------------------------------------------------------
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: _Job) -> None:
+        started = time.monotonic()
+        with self._lock:
+            self._depth -= 1
+            self._running += 1
+            counters = self._counters[job.kind]
+            counters.wait_ms += (started - job.queued_at) * 1000
+        outcome = "completed"
+        try:
+            if not job.future.set_running_or_notify_cancel():
+                outcome = "cancelled"
+                return
+            task = asyncio.create_task(job.context.run(job.factory), context=job.context)
+            try:
+                result = await asyncio.wait_for(task, job.timeout)
+            except asyncio.TimeoutError:
+                outcome = "timed_out"
+                logger.warning("%s job %s timed out after %gs", job.kind, job.key, job.timeout)
+                job.future.set_exception(TimeoutError(f"{job.kind} job timed out after {job.timeout:g}s"))
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                job.future.set_exception(RuntimeError("Auxiliary job queue shut down"))
+                raise
+            except Exception as exc:
+                outcome = "failed"
+                logger.warning("%s job %s failed: %s", job.kind, job.key, exc)
+                job.future.set_exception(exc)
+            else:
+                job.future.set_result(result)
+        finally:
+            with self._lock:
+                self._running -= 1
+                setattr(counters, outcome, getattr(counters, outcome) + 1)
+                counters.run_ms += (time.monotonic() - started) * 1000
+                if job.ident and self._active.get(job.ident) is job:
+                    del self._active[job.ident]
+
+    # Lifecycle ------------------------------------------------------------
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "depth": self._depth,
+                "max_depth": self._max_depth,
+                "running": self._running,
+                "kinds": {kind: c.as_dict() for kind, c in self._counters.items()},
+            }
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop accepting jobs, give queued ones ``timeout`` seconds, cancel the rest."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        async def _drain() -> None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Auxiliary jobs still pending after %gs; cancelling", timeout)
+            for worker in self._workers:
+                worker.cancel()
+            while not self._queue.empty():
+                self._queue.get_nowait().future.cancel()
+
+        if not self._background.running or self._background.in_loop():
+            return
+        try:
+            self._background.run(_drain(), timeout + 5)
+        except Exception:
+            logger.warning("Failed to drain auxiliary jobs", exc_info=True)
+
+
+_queue: AuxJobQueue | None = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> AuxJobQueue:
+    """Return the process-wide auxiliary job queue."""
+    global _queue
+    if _queue is not None:
+        return _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = AuxJobQueue(
+                background_loop.get_loop(),
+                workers=get_int_setting("PARLANCHINA_AUX_WORKERS", 2),
+                max_queue=get_int_setting("PARLANCHINA_AUX_QUEUE_SIZE", 256),
+                timeout=get_float_setting("PARLANCHINA_AUX_JOB_TIMEOUT", 30.0),
+            )
+            atexit.register(shutdown)
+        return _queue
+
+
+def submit(
+    kind: str, key: Hashable | None, factory: JobFactory, *, timeout: float | None = None
+) -> concurrent.futures.Future:
+    return get_queue().submit(kind, key, factory, timeout=timeout)
+
+
+async def run_async(
+    kind: str, key: Hashable | None, factory: JobFactory, *, timeout: float | None = None
+) -> Any:
+    return await get_queue().run_async(kind, key, factory, timeout=timeout)
+
+
+def stats() -> dict[str, Any]:
+    return _queue.stats() if _queue is not None else {}
+
+
+def shutdown() -> None:
+    """Drain and stop the queue (``PARLANCHINA_AUX_DRAIN_TIMEOUT``, default 10 s)."""
+    global _queue
+    with _queue_lock:
+        queue, _queue = _queue, None
+    if queue is not None:
+        queue.close(get_float_setting("PARLANCHINA_AUX_DRAIN_TIMEOUT", 10.0))
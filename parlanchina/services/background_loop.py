@@ -0,0 +1,151 @@
+"""One long-lived event loop for async work started from synchronous code.
+
+Flask views, background threads and the MCP pool used to spin up their own
+loops (``asyncio.run``, ``new_event_loop`` per thread, ``get_event_loop`` in
+the stream view). Anything bound to a loop (the ``AsyncOpenAI`` HTTP pool,
+MCP sessions) then had to be rebuilt per loop or was used across loops.
+Instead, coroutines from sync callers are scheduled here with
+``run_coroutine_threadsafe`` and run on a single daemon thread.
+
+The caller's context variables (and so its Flask app context) are copied
+into the scheduled task.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+from typing import Any, AsyncIterator, Awaitable, Coroutine, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """An event loop running forever on a daemon thread."""
+
+    def __init__(self, name: str = "parlanchina-loop") -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._closed = False
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @property
+    def running(self) -> bool:
+        return not self._closed and self._thread.is_alive()
+
+    def in_loop(self) -> bool:
+        """True when called from the loop thread itself."""
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> concurrent.futures.Future:
+        """Schedule ``coro`` and return a future for its result (fire and forget)."""
+        if self._closed:
+            coro.close()
+            raise RuntimeError("Background event loop is shut down")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+        """Run ``coro`` on the loop and block the calling thread for its result."""
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("Blocking on the background loop from its own thread would deadlock")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Background task did not finish within {timeout:g}s") from None
+
+    async def run_async(self, coro: Awaitable[T]) -> T:
+        """Await ``coro`` on the background loop from any event loop."""
+        if asyncio.get_running_loop() is self.loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))  # type: ignore[arg-type]
+
+    def iterate(self, agen: AsyncIterator[T]) -> Iterator[T]:
+        """Drive an async generator on the loop from a synchronous iterator.
+
+        Closing the iterator (e.g. a WSGI client going away) closes the async
+        generator on the loop, so its ``finally`` blocks and cancellations run.
+        """
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())  # type: ignore[arg-type]
+                except StopAsyncIteration:
+                    return
+        finally:
+            aclose = getattr(agen, "aclose", None)
+            if aclose is not None and self.running and not self.in_loop():
+                try:
+                    self.run(aclose(), timeout=10)
+                except Exception:  # pragma: no cover - best effort cleanup
+                    logger.debug("Closing async generator failed", exc_info=True)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Cancel what is still running and stop the loop thread."""
+        if self._closed:
+            return
+
+        async def _cancel_pending() -> None:
+            pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await self.loop.shutdown_asyncgens()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_cancel_pending(), self.loop).result(timeout)
+        except Exception:
+            logger.warning("Timed out cancelling background tasks")
+        self._closed = True
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+
+_loop: BackgroundLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> BackgroundLoop:
+    """Return the process-wide background loop, starting it on first use."""
+    global _loop
+    if _loop is not None and _loop.running:
+        return _loop
+    with _loop_lock:
+        if _loop is None or not _loop.running:
+            _loop = BackgroundLoop()
+        return _loop
+
+
+def run(coro: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+    return get_loop().run(coro, timeout)
+
+
+def submit(coro: Coroutine[Any, Any, T]) -> concurrent.futures.Future:
+    return get_loop().submit(coro)
+
+
+def iterate(agen: AsyncIterator[T]) -> Iterator[T]:
+    return get_loop().iterate(agen)
+
+
+def shutdown() -> None:
+    """Stop the background loop (it restarts on the next use)."""
+    global _loop
+    with _loop_lock:
+        loop, _loop = _loop, None
+    if loop is not None:
+        loop.close()
+
+
+atexit.register(shutdown)
@@ -1,29 +1,167 @@
-import json
+import atexit
+import logging
+import sqlite3
+import threading
+import time
 import uuid
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 from flask import current_app
 
-from parlanchina.utils.markdown import render_markdown
-
-
-def _data_dir() -> Path:
-    data_dir: Path = current_app.config["DIRS"]["data"]
-    session_dir = data_dir / "sessions"
-    session_dir.mkdir(parents=True, exist_ok=True)
-    return session_dir
-
-
-def _history_path() -> Path:
-    data_dir: Path = current_app.config["DIRS"]["data"]
-    data_dir.mkdir(parents=True, exist_ok=True)
-    return data_dir / "history.jsonl"
-
-
-def _session_path(session_id: str) -> Path:
-    return _data_dir() / f"{session_id}.json"
+from parlanchina.config import get_bool_setting, get_float_setting, get_int_setting, get_setting
+from parlanchina.services import render_cache
+from parlanchina.services.history_log import HistoryLog
+from parlanchina.services.search_index import SearchIndex
+from parlanchina.services.store_base import ChatStoreBackend
+from parlanchina.utils.durable_io import Durability
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION_KEY = "parlanchina_chat_store"
+_HISTORY_KEY = "parlanchina_history"
+_SEARCH_KEY = "parlanchina_search_index"
+_COMPACTOR_KEY = "parlanchina_compactor"
+_backend_lock = threading.Lock()
+
+
+def _backend() -> ChatStoreBackend:
+    """Return the storage backend configured for the current app."""
+    app = current_app._get_current_object()
+    backend = app.extensions.get(_EXTENSION_KEY)
+    if backend is not None:
+        return backend
+    with _backend_lock:
+        backend = app.extensions.get(_EXTENSION_KEY)
+        if backend is None:
+            backend = _create_backend(app.config["DIRS"]["data"])
+            app.extensions[_EXTENSION_KEY] = backend
+            # Writes out anything the backend defers (e.g. the JSON session catalog).
+            atexit.register(backend.close)
+        return backend
+
+
+def _create_backend(data_dir: Path) -> ChatStoreBackend:
+    from parlanchina.services.json_store import JsonChatStore
+
+    kind = str(get_setting("PARLANCHINA_STORE_BACKEND", "json")).lower()
+    durability = str(get_setting("PARLANCHINA_STORE_DURABILITY", "batched")).lower()
+    if kind == "sqlite":
+        from parlanchina.services.sqlite_store import SqliteChatStore
+
+        db_path = Path(get_setting("PARLANCHINA_SQLITE_PATH", data_dir / "parlanchina.db"))
+        store = SqliteChatStore(db_path, durability=durability)
+        if store.is_empty():
+            imported = store.import_sessions(JsonChatStore(data_dir))
+            if imported:
+                logger.info("Imported %s JSON session(s) into %s", imported, db_path)
+        return store
+    if kind != "json":
+        logger.warning("Unknown PARLANCHINA_STORE_BACKEND %r; using json", kind)
+    return JsonChatStore(
+        data_dir,
+        cache_size=get_int_setting("PARLANCHINA_SESSION_CACHE_SIZE", 128),
+        durability=Durability(durability, get_float_setting("PARLANCHINA_FSYNC_INTERVAL", 1.0)),
+    )
+
+
+def history() -> HistoryLog:
+    """Return the app's rotating message history (``data/history.jsonl`` + segments)."""
+    app = current_app._get_current_object()
+    log = app.extensions.get(_HISTORY_KEY)
+    if log is not None:
+        return log
+    with _backend_lock:
+        log = app.extensions.get(_HISTORY_KEY)
+        if log is None:
+            data_dir: Path = app.config["DIRS"]["data"]
+            data_dir.mkdir(parents=True, exist_ok=True)
+            log = HistoryLog(
+                data_dir,
+                max_bytes=get_int_setting("PARLANCHINA_HISTORY_MAX_BYTES", 64 * 1024 * 1024),
+                max_age=get_float_setting("PARLANCHINA_HISTORY_MAX_AGE", 86400.0),
+                codec=str(get_setting("PARLANCHINA_HISTORY_COMPRESSION", "gzip")).lower(),
+                flush_interval=get_float_setting("PARLANCHINA_HISTORY_FLUSH_INTERVAL", 1.0),
+            )
+            app.extensions[_HISTORY_KEY] = log
+        return log
+
+
+def _search_index() -> SearchIndex | None:
+    """Return the full-text index, or None when ``PARLANCHINA_SEARCH_ENABLED`` is off."""
+    if not get_bool_setting("PARLANCHINA_SEARCH_ENABLED", True):
+        return None
+    app = current_app._get_current_object()
+    index = app.extensions.get(_SEARCH_KEY)
+    if index is not None:
+        return index
+    with _backend_lock:
+        index = app.extensions.get(_SEARCH_KEY)
+        if index is None:
+            default_path = app.config["DIRS"]["data"] / "search.db"
+            index = SearchIndex(Path(get_setting("PARLANCHINA_SEARCH_PATH", default_path)))
+            app.extensions[_SEARCH_KEY] = index
+        return index
+
+
+def _index(method: str, *args: Any) -> None:
+    """Apply an update to the search index; indexing problems never fail a write."""
+    index = _search_index()
+    if index is None:
+        return
+    try:
+        getattr(index, method)(*args)
+    except sqlite3.Error:
+        logger.exception("Search index update %s failed", method)
+
+
+def search(query: str, limit: int = 20) -> dict[str, Any]:
+    """Ranked session-title and message hits for ``query``."""
+    index = _search_index()
+    if index is None:
+        return {"query": query, "available": False, "sessions": [], "messages": [], "took_ms": 0.0}
+    return index.search(query, limit=limit)
+
+
+def rebuild_search_index() -> int:
+    """Re-index every stored session; returns the number of sessions indexed."""
+    index = _search_index()
+    if index is None:
+        return 0
+    backend = _backend()
+    sessions = (
+        session
+        for summary in backend.list_sessions()
+        if (session := backend.load_session(summary["id"])) is not None
+    )
+    return index.rebuild(sessions)
+
+
+def start_search_backfill(app) -> threading.Thread | None:
+    """Index stored sessions in the background when the search index is empty.
+
+    Covers the first start after upgrading and a deleted ``search.db``;
+    ``python -m parlanchina reindex`` does the same in the foreground.
+    """
+    with app.app_context():
+        index = _search_index()
+        if index is None or not index.is_empty() or not _backend().list_sessions(limit=1):
+            return None
+
+    def _run() -> None:
+        with app.app_context():
+            try:
+                count = rebuild_search_index()
+            except sqlite3.Error:
+                logger.exception("Search index backfill failed")
+                return
+        logger.info("Indexed %s existing session(s) for search", count)
+
+    thread = threading.Thread(target=_run, name="parlanchina-search-backfill", daemon=True)
+    thread.start()
+    return thread
 
 
 def _now() -> str:
@@ -31,36 +169,56 @@ def _now() -> str:
 
 
 def _append_history(role: str, text: str) -> None:
-    entry = {"ts": _now(), "role": role, "text": text}
-    history_file = _history_path()
-    history_file.parent.mkdir(parents=True, exist_ok=True)
-    with history_file.open("a", encoding="utf-8") as fp:
-        fp.write(json.dumps(entry, ensure_ascii=False) + "\n")
-
-
-def list_sessions() -> list[dict[str, Any]]:
-    """List sessions sorted by updated timestamp (desc)."""
-    _data_dir().mkdir(parents=True, exist_ok=True)
-    sessions: list[dict[str, Any]] = []
-    for file in _data_dir().glob("*.json"):
-        try:
-            with file.open() as f:
-                session = json.load(f)
-                sessions.append(session)
-        except (json.JSONDecodeError, OSError):
-            continue
-    return sorted(sessions, key=lambda s: s.get("updated_at", ""), reverse=True)
+    history().append({"ts": _now(), "role": role, "text": text})
+
+
+def list_sessions(limit: int | None = None, offset: int = 0) -> list[dict[str, Any]]:
+    """List session summaries sorted by updated timestamp (desc).
+
+    Summaries never include message bodies.
+    """
+    return _backend().list_sessions(limit=limit, offset=offset)
 
 
 def load_session(session_id: str) -> Optional[dict[str, Any]]:
-    path = _session_path(session_id)
-    if not path.exists():
-        return None
-    try:
-        with path.open() as f:
-            return json.load(f)
-    except json.JSONDecodeError:
+    return _backend().load_session(session_id)
+
+
+def load_header(session_id: str) -> Optional[dict[str, Any]]:
+    """Return session metadata with ``message_count`` but no messages, or None."""
+    return _backend().load_header(session_id)
+
+
+def load_message_page(
+    session_id: str, *, before: int | None = None, limit: int = 50
+) -> Optional[dict[str, Any]]:
+    """Return up to ``limit`` messages ending just before index ``before``.
+
+    ``before=None`` selects the latest page. The result holds the session
+    header (``session``), the ``messages`` slice, its ``start``/``end``
+    indices, the ``total`` count and ``has_more`` for older pages; pass
+    ``start`` back as the next ``before`` cursor.
+    """
+    limit = max(1, limit)
+    if before is None:
+        result = _backend().load_messages(session_id, -limit, None)
+    else:
+        before = max(0, before)
+        result = _backend().load_messages(session_id, max(0, before - limit), before)
+    if result is None:
         return None
+    header, messages = result
+    total = header.get("message_count", 0)
+    end = total if before is None else min(before, total)
+    start = max(0, end - len(messages))
+    return {
+        "session": header,
+        "messages": messages,
+        "start": start,
+        "end": end,
+        "total": total,
+        "has_more": start > 0,
+    }
 
 
 def create_session(title: str | None, model: str) -> dict[str, Any]:
@@ -79,20 +237,24 @@ def create_session(title: str | None, model: str) -> dict[str, Any]:
         "messages": [],
     }
     _save_session(session)
+    _index("set_title", session_id, session["title"])
     return session
 
 
-def append_user_message(session_id: str, content: str, *, model: str | None = None) -> dict:
-    session = load_session(session_id)
-    if not session:
-        raise FileNotFoundError(f"Session {session_id} not found")
-    session["messages"].append({"role": "user", "content": content})
-    session["updated_at"] = _now()
+def append_user_message(
+    session_id: str, content: str, *, model: str | None = None, title: str | None = None
+) -> dict:
+    updates: dict[str, Any] = {"updated_at": _now()}
     if model:
-        session["model"] = model
-    _save_session(session)
+        updates["model"] = model
+    if title:
+        updates["title"] = title
+    header = _backend().append_message(session_id, {"role": "user", "content": content}, updates)
+    if title:
+        _index("set_title", session_id, title)
+    _index("add_message", session_id, header["message_count"] - 1, "user", content)
     _append_history("user", content)
-    return session
+    return header
 
 
 def append_assistant_message(
@@ -102,132 +264,247 @@ def append_assistant_message(
     model: str | None = None,
     images: list[dict[str, str]] | None = None,
 ) -> dict:
-    session = load_session(session_id)
-    if not session:
-        raise FileNotFoundError(f"Session {session_id} not found")
-    html = render_markdown(content)
-    message = {
+    """Store an assistant reply and return it with rendered ``html``.
+
+    Only the markdown is persisted unless ``PARLANCHINA_STORE_HTML`` is set;
+    rendering here warms the render cache for the next page load.
+    """
+    html = render_cache.render(content)
+    message: dict[str, Any] = {
         "role": "assistant",
         "raw_markdown": content,
-        "html": html,
     }
+    if get_bool_setting("PARLANCHINA_STORE_HTML", False):
+        message["html"] = html
     if images:
         message["images"] = images
-    session["messages"].append(message)
-    session["updated_at"] = _now()
+    updates: dict[str, Any] = {"updated_at": _now()}
     if model:
-        session["model"] = model
-    _save_session(session)
+        updates["model"] = model
+    header = _backend().append_message(session_id, message, updates)
+    _index("add_message", session_id, header["message_count"] - 1, "assistant", content)
     _append_history("assistant", content)
-    return message
+    return {**message, "html": html}
 
 
 def update_session_title(session_id: str, title: str) -> None:
     """Update the title of an existing session."""
-    session = load_session(session_id)
-    if not session:
-        raise FileNotFoundError(f"Session {session_id} not found")
-    session["title"] = title
-    session["updated_at"] = _now()
-    _save_session(session)
+    _update_session(session_id, {"title": title})
 
 
 def delete_session(session_id: str) -> None:
-    """Delete a session file."""
-    path = _session_path(session_id)
-    if not path.exists():
-        raise FileNotFoundError(f"Session {session_id} not found")
-    path.unlink()
+    """Delete a session."""
+    _backend().delete_session(session_id)
+    _index("delete_session", session_id)
 
 
-def get_enabled_tools(session_id: str) -> list[str] | None:
-    session = load_session(session_id)
-    if not session:
-        return None
-    tools = session.get("enabled_tools")
+def _tool_list(tools: Any) -> list[str] | None:
     if isinstance(tools, list):
         return [t for t in tools if isinstance(t, str)]
     return None
 
 
-def set_enabled_tools(session_id: str, enabled_tools: list[str]) -> None:
-    session = load_session(session_id)
+def _header_mode(session: dict[str, Any]) -> str:
+    mode = session.get("mode")
+    if mode in {"ask", "agent"}:
+        return mode
+    return "ask"
+
+
+def _header_mcp_tools(session: dict[str, Any]) -> list[str] | None:
+    # Prefer new field, fall back to legacy enabled_tools
+    tools = session.get("enabled_mcp_tools")
+    if tools is None:
+        tools = session.get("enabled_tools")
+    return _tool_list(tools)
+
+
+def get_enabled_tools(session_id: str) -> list[str] | None:
+    session = _backend().load_header(session_id)
     if not session:
-        raise FileNotFoundError(f"Session {session_id} not found")
-    session["enabled_tools"] = enabled_tools
-    session["updated_at"] = _now()
-    _save_session(session)
+        return None
+    return _tool_list(session.get("enabled_tools"))
+
+
+def set_enabled_tools(session_id: str, enabled_tools: list[str]) -> None:
+    _update_session(session_id, {"enabled_tools": enabled_tools})
 
 
 def get_enabled_internal_tools(session_id: str) -> list[str] | None:
-    session = load_session(session_id)
+    session = _backend().load_header(session_id)
     if not session:
         return None
-    tools = session.get("enabled_internal_tools")
-    if tools is None:
-        return None
-    if isinstance(tools, list):
-        return [t for t in tools if isinstance(t, str)]
-    return None
+    return _tool_list(session.get("enabled_internal_tools"))
 
 
 def set_enabled_internal_tools(session_id: str, enabled_tools: list[str]) -> None:
-    session = load_session(session_id)
-    if not session:
-        raise FileNotFoundError(f"Session {session_id} not found")
-    session["enabled_internal_tools"] = enabled_tools
-    session["updated_at"] = _now()
-    _save_session(session)
+    _update_session(session_id, {"enabled_internal_tools": enabled_tools})
 
 
 def get_enabled_mcp_tools(session_id: str) -> list[str] | None:
-    session = load_session(session_id)
+    session = _backend().load_header(session_id)
     if not session:
         return None
-    # Prefer new field, fall back to legacy enabled_tools
-    tools = session.get("enabled_mcp_tools")
-    if tools is None:
-        tools = session.get("enabled_tools")
-    if tools is None:
-        return None
-    if isinstance(tools, list):
-        return [t for t in tools if isinstance(t, str)]
-    return None
+    return _header_mcp_tools(session)
 
 
 def set_enabled_mcp_tools(session_id: str, enabled_tools: list[str]) -> None:
-    session = load_session(session_id)
-    if not session:
-        raise FileNotFoundError(f"Session {session_id} not found")
-    session["enabled_mcp_tools"] = enabled_tools
-    session["enabled_tools"] = enabled_tools  # keep legacy field in sync
-    session["updated_at"] = _now()
-    _save_session(session)
+    _update_session(session_id, _mcp_tool_updates(enabled_tools))
+
+
+def _mcp_tool_updates(enabled_tools: list[str]) -> dict[str, Any]:
+    return {
+        "enabled_mcp_tools": enabled_tools,
+        "enabled_tools": enabled_tools,  # keep legacy field in sync
+    }
 
 
 def get_mode(session_id: str) -> str:
-    session = load_session(session_id)
+    session = _backend().load_header(session_id)
     if not session:
         return "ask"
-    mode = session.get("mode")
-    if mode in {"ask", "agent"}:
-        return mode
-    return "ask"
+    return _header_mode(session)
 
 
 def set_mode(session_id: str, mode: str) -> None:
     if mode not in {"ask", "agent"}:
         return
-    session = load_session(session_id)
-    if not session:
-        raise FileNotFoundError(f"Session {session_id} not found")
-    session["mode"] = mode
-    session["updated_at"] = _now()
-    _save_session(session)
+    _update_session(session_id, {"mode": mode})
+
+
+class SessionTransaction:
+    """Session header snapshot that collects field updates for a single write.
+
+    Getters reflect pending updates, so read-after-write inside the block is
+    consistent. Nothing is written when no setter was called.
+    """
+
+    def __init__(self, session_id: str, header: dict[str, Any]) -> None:
+        self.session_id = session_id
+        self._header = header
+        self._updates: dict[str, Any] = {}
+
+    def _get(self, field: str) -> Any:
+        if field in self._updates:
+            return self._updates[field]
+        return self._header.get(field)
+
+    @property
+    def header(self) -> dict[str, Any]:
+        return {**self._header, **self._updates}
+
+    @property
+    def mode(self) -> str:
+        return _header_mode(self.header)
+
+    @property
+    def enabled_internal_tools(self) -> list[str] | None:
+        return _tool_list(self._get("enabled_internal_tools"))
+
+    @property
+    def enabled_mcp_tools(self) -> list[str] | None:
+        return _header_mcp_tools(self.header)
+
+    @property
+    def context_summary(self) -> dict[str, Any] | None:
+        summary = self._get("context_summary")
+        return summary if isinstance(summary, dict) else None
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._updates)
+
+    def set_mode(self, mode: str) -> None:
+        if mode in {"ask", "agent"} and mode != self.mode:
+            self._updates["mode"] = mode
+
+    def set_enabled_internal_tools(self, enabled_tools: list[str]) -> None:
+        self._updates["enabled_internal_tools"] = enabled_tools
+
+    def set_enabled_mcp_tools(self, enabled_tools: list[str]) -> None:
+        self._updates.update(_mcp_tool_updates(enabled_tools))
+
+    def set_title(self, title: str) -> None:
+        self._updates["title"] = title
+
+    def set_context_summary(self, summary: dict[str, Any]) -> None:
+        self._updates["context_summary"] = summary
+
+    def pending_updates(self) -> dict[str, Any]:
+        return dict(self._updates)
+
+
+@contextmanager
+def session_transaction(session_id: str, *, touch: bool = True) -> Iterator[SessionTransaction]:
+    """Read a session header and flush all updates with one write on exit.
+
+    The session stays locked for the block, so the read and the write cannot
+    interleave with other writers; keep it short and do not call other store
+    functions inside it. ``touch=False`` keeps ``updated_at`` for metadata
+    written in the background. Raises FileNotFoundError when the session does
+    not exist. Updates are discarded if the block raises.
+    """
+    with _backend().transaction(session_id) as (header, updates):
+        tx = SessionTransaction(session_id, header)
+        yield tx
+        if tx.dirty:
+            updates.update(tx.pending_updates())
+            if touch:
+                updates["updated_at"] = _now()
+    if "title" in updates:
+        _index("set_title", session_id, updates["title"])
+
+
+def store_stats() -> dict[str, Any]:
+    """Return storage backend counters, e.g. session cache hits/misses."""
+    backend = _backend()
+    return {"backend": backend.name, **backend.stats()}
+
+
+def start_background_compaction(app, interval: float | None = None) -> threading.Thread | None:
+    """Periodically run backend maintenance (log compaction, WAL checkpoints).
+
+    Called by the serving entry points rather than ``create_app`` so merely
+    importing the package never touches the data directory. Starting it twice
+    for the same app returns the running thread.
+    """
+    if interval is None:
+        with app.app_context():
+            interval = get_float_setting("PARLANCHINA_COMPACTION_INTERVAL", 300.0)
+    if interval <= 0:
+        return None
+
+    def _run() -> None:
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    compacted = _backend().compact()
+                    if compacted:
+                        logger.info("Compacted %s session(s)", compacted)
+                except Exception:  # pragma: no cover - background safety
+                    logger.exception("Session compaction failed")
+
+    with _backend_lock:
+        thread = app.extensions.get(_COMPACTOR_KEY)
+        if thread is None:
+            thread = threading.Thread(target=_run, name="parlanchina-compactor", daemon=True)
+            thread.start()
+            app.extensions[_COMPACTOR_KEY] = thread
+    return thread
+
+
+def _update_session(
+    session_id: str, updates: dict[str, Any], *, touch: bool = True
+) -> dict[str, Any]:
+    updates = dict(updates)
+    if touch:
+        updates["updated_at"] = _now()
+    header = _backend().update_session(session_id, updates)
+    if "title" in updates:
+        _index("set_title", session_id, updates["title"])
+    return header
 
 
 def _save_session(session: dict[str, Any]) -> None:
-    path = _session_path(session["id"])
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w") as f:
-        json.dump(session, f, indent=2)
+    _backend().save_session(session)
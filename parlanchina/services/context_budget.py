@@ -0,0 +1,290 @@
+"""Token budget for the conversation history sent to the model.
+
+Short sessions are sent whole. Once the history exceeds
+``PARLANCHINA_CONTEXT_MAX_TOKENS``, only the last
+``PARLANCHINA_CONTEXT_RECENT_TURNS`` user turns are sent verbatim. Everything
+before them is represented by a rolling summary stored in the session header
+(``context_summary``), plus as many not-yet-summarised messages as still fit.
+
+The summary is advanced in the background as turns leave the window: the old
+summary and the newly dropped messages go into one ``complete_response``
+call, so each message is summarised once.
+
+Token counts use ``tiktoken`` when it is installed and about four characters
+per token otherwise. They are cached per message content, so each turn only
+counts its new messages.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any
+
+from parlanchina.config import get_int_setting
+from parlanchina.services import aux_jobs, chat_store, llm
+
+logger = logging.getLogger(__name__)
+
+_tiktoken_available = importlib.util.find_spec("tiktoken") is not None
+
+# Role markers and separators the API adds around each message.
+MESSAGE_OVERHEAD_TOKENS = 4
+_TOKEN_CACHE_SIZE = 20_000
+
+_SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Update the summary with the new messages. Keep facts, decisions, names, numbers, code "
+    "identifiers and open questions the assistant may need later; drop pleasantries. "
+    "Write at most 300 words. Respond with only the updated summary."
+)
+_SUMMARY_PREFIX = "Summary of the earlier conversation (older messages are not shown):\n"
+
+_token_cache: "OrderedDict[tuple[str, int, int], int]" = OrderedDict()
+_lock = threading.Lock()
+_stats: dict[str, int] = {
+    "count_hits": 0,
+    "count_misses": 0,
+    "trimmed_requests": 0,
+    "dropped_messages": 0,
+    "tokens_saved": 0,
+    "summaries": 0,
+}
+
+
+@dataclass
+class ContextPlan:
+    messages: list[dict]
+    total_tokens: int
+    sent_tokens: int
+    window_start: int
+    summary_through: int
+    dropped: int = 0
+    needs_summary: bool = False
+
+
+# Token counting -----------------------------------------------------------
+
+
+@lru_cache(maxsize=32)
+def _encoding(model: str | None) -> Any:
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def _encoding_name(model: str | None) -> str:
+    return _encoding(model).name if _tiktoken_available else "chars/4"
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    if not text:
+        return 0
+    if _tiktoken_available:
+        return len(_encoding(model).encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: dict, model: str | None = None) -> int:
+    """Tokens of one message including overhead, cached by content."""
+    content = message.get("content") or ""
+    key = (_encoding_name(model), len(content), hash(content))
+    with _lock:
+        cached = _token_cache.get(key)
+        if cached is not None:
+            _token_cache.move_to_end(key)
+            _stats["count_hits"] += 1
+            return cached
+    tokens = count_tokens(content, model) + MESSAGE_OVERHEAD_TOKENS
+    with _lock:
+        _stats["count_misses"] += 1
+        _token_cache[key] = tokens
+        while len(_token_cache) > _TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return tokens
+
+
+# Planning -----------------------------------------------------------------
+
+
+def model_messages(session: dict) -> list[dict]:
+    """Session messages as ``role``/``content`` pairs (assistant markdown, not HTML)."""
+    formatted = []
+    for message in session.get("messages", []):
+        if message["role"] == "assistant":
+            content = message.get("raw_markdown") or message.get("content") or ""
+        else:
+            content = message.get("content") or ""
+        formatted.append({"role": message["role"], "content": content})
+    return formatted
+
+
+def _window_start(messages: list[dict], turns: int) -> int:
+    """Index of the first message of the last ``turns`` user turns."""
+    seen = 0
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index]["role"] == "user":
+            seen += 1
+            if seen >= turns:
+                return index
+    return 0
+
+
+def _last_user_index(messages: list[dict]) -> int:
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index]["role"] == "user":
+            return index
+    return max(0, len(messages) - 1)
+
+
+def _summary_message(summary: dict | None) -> dict | None:
+    text = (summary or {}).get("text")
+    if not text:
+        return None
+    return {"role": "system", "content": _SUMMARY_PREFIX + text}
+
+
+def build_context(
+    messages: list[dict], summary: dict | None = None, model: str | None = None
+) -> ContextPlan:
+    """Choose what of ``messages`` to send within the token budget."""
+    counts = [message_tokens(m, model) for m in messages]
+    total = sum(counts)
+    budget = get_int_setting("PARLANCHINA_CONTEXT_MAX_TOKENS", 24000)
+    if budget <= 0 or total <= budget:
+        return ContextPlan(list(messages), total, total, 0, 0)
+
+    turns = max(1, get_int_setting("PARLANCHINA_CONTEXT_RECENT_TURNS", 6))
+    start = _window_start(messages, turns)
+    summary_msg = _summary_message(summary)
+    through = min(int((summary or {}).get("through") or 0), start) if summary_msg else 0
+    summary_tokens = message_tokens(summary_msg, model) if summary_msg else 0
+
+    # Shrink the window when even the recent turns do not fit, but always keep
+    # the latest user message and what follows it.
+    recent_tokens = sum(counts[start:])
+    last_user = _last_user_index(messages)
+    while start < last_user and recent_tokens + summary_tokens > budget:
+        recent_tokens -= counts[start]
+        start += 1
+
+    # Fill what is left with the newest messages not covered by the summary.
+    room = budget - recent_tokens - summary_tokens
+    keep_from = start
+    while keep_from > through and counts[keep_from - 1] <= room:
+        keep_from -= 1
+        room -= counts[keep_from]
+    dropped = keep_from - through
+
+    sent = ([summary_msg] if summary_msg else []) + list(messages[keep_from:])
+    sent_tokens = summary_tokens + sum(counts[keep_from:])
+    min_tokens = get_int_setting("PARLANCHINA_CONTEXT_SUMMARY_MIN_TOKENS", 1000)
+    needs_summary = start > through and (dropped > 0 or sum(counts[through:start]) >= min_tokens)
+    with _lock:
+        _stats["trimmed_requests"] += 1
+        _stats["dropped_messages"] += dropped
+        _stats["tokens_saved"] += max(0, total - sent_tokens)
+    return ContextPlan(sent, total, sent_tokens, start, through, dropped, needs_summary)
+
+
+# Rolling summary ----------------------------------------------------------
+
+
+def schedule_summary(app, session_id: str, model: str) -> bool:
+    """Advance the session's summary in the background (one job per session)."""
+    try:
+        aux_jobs.submit(
+            "context_summary",
+            session_id,
+            lambda: _advance_summary(app, session_id, model),
+            timeout=get_int_setting("PARLANCHINA_CONTEXT_SUMMARY_TIMEOUT", 120),
+        )
+    except RuntimeError as exc:
+        logger.warning("Context summary for session %s not queued: %s", session_id, exc)
+        return False
+    return True
+
+
+async def _advance_summary(app, session_id: str, model: str) -> None:
+    with app.app_context():
+        session = await asyncio.to_thread(chat_store.load_session, session_id)
+        if not session:
+            return
+        messages = model_messages(session)
+        summary = session.get("context_summary") or None
+        plan = build_context(messages, summary, model)
+        through = plan.summary_through
+        text = (summary or {}).get("text") or ""
+        chunk_limit = get_int_setting("PARLANCHINA_CONTEXT_SUMMARY_CHUNK_TOKENS", 8000)
+        while through < plan.window_start:
+            # Summarise in chunks so a long backlog never becomes one huge prompt.
+            end, used = through, 0
+            while end < plan.window_start and (end == through or used < chunk_limit):
+                used += message_tokens(messages[end], model)
+                end += 1
+            updated = await _summarize(text, messages[through:end], model)
+            if not updated:
+                return
+            stored = await asyncio.to_thread(_store_summary, session_id, updated, through, end, model)
+            if not stored:
+                return
+            text, through = updated, end
+
+
+async def _summarize(previous: str, new_messages: list[dict], model: str) -> str | None:
+    transcript = "\n\n".join(f"{m['role']}: {m['content']}" for m in new_messages)
+    prompt = [
+        {"role": "system", "content": _SUMMARY_INSTRUCTIONS},
+        {
+            "role": "user",
+            "content": f"Current summary:\n{previous or '(none yet)'}\n\nNew messages:\n{transcript}",
+        },
+    ]
+    reply = (await llm.complete_response(prompt, model)).strip()
+    if not reply or reply in llm.FAILED_COMPLETIONS:
+        logger.warning("Context summary update failed for %s message(s)", len(new_messages))
+        return None
+    with _lock:
+        _stats["summaries"] += 1
+    return reply
+
+
+def _store_summary(session_id: str, text: str, previous: int, through: int, model: str) -> bool:
+    """Write the summary unless another update moved it meanwhile.
+
+    The check and the write share one locked transaction; the summary is
+    metadata, so ``updated_at`` is left alone.
+    """
+    summary = {
+        "text": text,
+        "through": through,
+        "tokens": count_tokens(text, model),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    try:
+        with chat_store.session_transaction(session_id, touch=False) as tx:
+            current = tx.context_summary or {}
+            if int(current.get("through") or 0) != previous:
+                return False
+            tx.set_context_summary(summary)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def stats() -> dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "counter": "tiktoken" if _tiktoken_available else "chars/4",
+            "cached_counts": len(_token_cache),
+        }
@@ -0,0 +1,435 @@
+"""Rotating, compressed message history with a time index.
+
+``data/history.jsonl`` is the active segment. Appends are buffered in memory
+and written by a background flusher (or when the buffer fills), so a chat
+message costs no open/close. Once the active segment exceeds
+``max_bytes`` or ``max_age`` seconds it is moved to ``data/history/`` and
+compressed in the background.
+
+Rolled segments are compressed in independent blocks (gzip members or zstd
+frames) of about ``block_bytes``. ``data/history/index.jsonl`` records one
+checkpoint per block: ``{"segment", "ts", "offset", "codec"}``, where
+``offset`` is the position in the segment file at which a decoder can start.
+``read_range`` uses it to seek straight to the first block of a time range.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import gzip
+import importlib.util
+import io
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+from parlanchina.utils.durable_io import ProcessLocks, atomic_write_bytes
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("gzip", "zstd", "none")
+_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst", "none": ".jsonl"}
+_LOCK_KEY = "history"
+
+
+def _zstd_available() -> bool:
+    return importlib.util.find_spec("zstandard") is not None
+
+
+def _timestamp(value: str | datetime | None) -> str | None:
+    if value is None or isinstance(value, str):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "gzip":
+        return gzip.compress(data)
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _encode_index(checkpoints: list[dict[str, Any]]) -> bytes:
+    return b"".join(json.dumps(c).encode("utf-8") + b"\n" for c in checkpoints)
+
+
+def _epoch(ts: str | None) -> float | None:
+    try:
+        return datetime.fromisoformat(ts).timestamp() if ts else None
+    except ValueError:
+        return None
+
+
+def _entry_ts(line: bytes) -> str:
+    try:
+        return json.loads(line).get("ts", "")
+    except (json.JSONDecodeError, AttributeError):
+        return ""
+
+
+def _segment_codec(name: str) -> str | None:
+    for codec in ("gzip", "zstd"):
+        if name.endswith(_SUFFIXES[codec]):
+            return codec
+    return "none" if name.endswith(".jsonl") else None
+
+
+def _open_reader(path: Path, codec: str, offset: int) -> BinaryIO:
+    f = path.open("rb")
+    f.seek(offset)
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=f)  # type: ignore[return-value]
+    if codec == "zstd":
+        import zstandard
+
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        return io.BufferedReader(reader)  # type: ignore[arg-type]
+    return f
+
+
+class HistoryLog:
+    def __init__(
+        self,
+        data_dir: Path,
+        *,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age: float = 86400.0,
+        codec: str = "gzip",
+        flush_interval: float = 1.0,
+        buffer_bytes: int = 64 * 1024,
+        block_bytes: int = 256 * 1024,
+    ) -> None:
+        if codec not in CODECS:
+            logger.warning("Unknown history compression %r; using gzip", codec)
+            codec = "gzip"
+        if codec == "zstd" and not _zstd_available():
+            logger.warning("zstandard is not installed; compressing history with gzip")
+            codec = "gzip"
+        self.active_path = data_dir / "history.jsonl"
+        self.segment_dir = data_dir / "history"
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.segment_dir / "index.jsonl"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.codec = codec
+        self.flush_interval = flush_interval
+        self.buffer_bytes = buffer_bytes
+        self.block_bytes = block_bytes
+
+        self._lock = threading.Lock()
+        self._process_locks = ProcessLocks(self.segment_dir / ".lock")
+        self._buffer: list[tuple[str, bytes]] = []
+        self._buffered = 0
+        self._handle: BinaryIO | None = None
+        self._last_checkpoint: int | None = None
+        # When the active segment's first entry was written, for age-based rotation.
+        self._active_opened: float | None = None
+        self._closed = False
+        self._compressing: set[threading.Thread] = set()
+
+        if not self.index_path.exists() and self.active_path.exists():
+            self.rebuild_index()
+        self._flusher = threading.Thread(
+            target=self._run_flusher, name="parlanchina-history", daemon=True
+        )
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # Writing ----------------------------------------------------------------
+
+    def append(self, entry: dict[str, Any]) -> None:
+        """Buffer one entry; it must carry an ISO-8601 ``ts``."""
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._buffer.append((entry["ts"], line))
+            self._buffered += len(line)
+            if self._buffered >= self.buffer_bytes:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+        for thread in list(self._compressing):
+            thread.join()
+
+    def _run_flusher(self) -> None:
+        while not self._closed:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:  # pragma: no cover - background safety
+                logger.exception("History flush failed")
+
+    def _flush_locked(self) -> None:
+        if not self._buffer or self._closed:
+            return
+        entries, self._buffer, self._buffered = self._buffer, [], 0
+        self._process_locks.acquire(_LOCK_KEY)
+        try:
+            handle = self._active_handle()
+            last_checkpoint, active_opened = self._last_checkpoint, self._active_opened
+            checkpoints = []
+            start = position = os.fstat(handle.fileno()).st_size
+            chunk = bytearray()
+            segment = self.active_path.name
+            for ts, line in entries:
+                last = self._last_checkpoint
+                if last is None or position - last >= self.block_bytes:
+                    checkpoints.append(self._checkpoint(segment, ts, position, "none"))
+                    self._last_checkpoint = position
+                    if self._active_opened is None:
+                        self._active_opened = _epoch(ts)
+                chunk += line
+                position += len(line)
+            try:
+                handle.write(chunk)
+                handle.flush()
+            except BaseException:
+                # Keep the entries for the next flush instead of dropping them,
+                # and cut off anything that made it to disk so they are not doubled.
+                self._buffer[:0] = entries
+                self._buffered += len(chunk)
+                self._last_checkpoint, self._active_opened = last_checkpoint, active_opened
+                self._handle = None
+                with contextlib.suppress(OSError):
+                    handle.close()
+                with contextlib.suppress(OSError), self.active_path.open("r+b") as f:
+                    f.truncate(start)
+                raise
+            if checkpoints:
+                with self.index_path.open("ab") as f:
+                    f.write(_encode_index(checkpoints))
+            if self._should_rotate(position):
+                self._rotate_locked()
+        finally:
+            self._process_locks.release(_LOCK_KEY)
+
+    def _active_handle(self) -> BinaryIO:
+        """Return the open active segment, reopening it if another process rotated it."""
+        if self._handle is not None:
+            try:
+                current = os.stat(self.active_path)
+                if current.st_ino == os.fstat(self._handle.fileno()).st_ino:
+                    return self._handle
+            except FileNotFoundError:
+                pass
+            self._handle.close()
+        self._handle = self.active_path.open("ab")
+        self._last_checkpoint, self._active_opened = self._active_checkpoints()
+        return self._handle
+
+    def _active_checkpoints(self) -> tuple[int | None, float | None]:
+        """Return the active segment's last checkpoint offset and first entry time."""
+        name = self.active_path.name
+        checkpoints = [c for c in self._read_index() if c["segment"] == name]
+        if not checkpoints:
+            return None, None
+        return max(c["offset"] for c in checkpoints), _epoch(checkpoints[0]["ts"])
+
+    @staticmethod
+    def _checkpoint(segment: str, ts: str | None, offset: int, codec: str) -> dict[str, Any]:
+        return {"segment": segment, "ts": ts or "", "offset": offset, "codec": codec}
+
+    def _should_rotate(self, size: int) -> bool:
+        if size >= self.max_bytes:
+            return True
+        if self.max_age <= 0 or self._active_opened is None:
+            return False
+        return time.time() - self._active_opened >= self.max_age
+
+    # Rotation ---------------------------------------------------------------
+
+    def _rotate_locked(self) -> None:
+        """Move the active segment aside and compress it in the background."""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        self._last_checkpoint = None
+        self._active_opened = None
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        counter = 0
+        stem = f"history-{stamp}"
+        while any((self.segment_dir / f"{stem}{suffix}").exists() for suffix in _SUFFIXES.values()):
+            counter += 1
+            stem = f"history-{stamp}-{counter}"
+        name = f"{stem}.jsonl"
+        rolled = self.segment_dir / name
+        os.replace(self.active_path, rolled)
+        self._rewrite_index(
+            lambda c: [{**c, "segment": name}] if c["segment"] == self.active_path.name else [c]
+        )
+        logger.info("Rotated history segment to %s", rolled)
+        if self.codec == "none":
+            return
+        thread = threading.Thread(
+            target=self._compress_segment, args=(rolled,), name="parlanchina-history-compress"
+        )
+        self._compressing.add(thread)
+        thread.start()
+
+    def _compress_segment(self, source: Path) -> None:
+        try:
+            target = source.with_name(source.name[: -len(".jsonl")] + _SUFFIXES[self.codec])
+            checkpoints = []
+            out = bytearray()
+            block = bytearray()
+            block_ts: str | None = None
+            with source.open("rb") as f:
+                for line in f:
+                    if block_ts is None:
+                        block_ts = _entry_ts(line)
+                    block += line
+                    if len(block) >= self.block_bytes:
+                        checkpoints.append(
+                            self._checkpoint(target.name, block_ts, len(out), self.codec)
+                        )
+                        out += _compress(self.codec, bytes(block))
+                        block, block_ts = bytearray(), None
+            if block:
+                checkpoints.append(self._checkpoint(target.name, block_ts, len(out), self.codec))
+                out += _compress(self.codec, bytes(block))
+            atomic_write_bytes(target, bytes(out))
+
+            with self._lock:
+                self._process_locks.acquire(_LOCK_KEY)
+                try:
+                    updated: list[dict[str, Any]] = []
+                    for checkpoint in self._read_index():
+                        if checkpoint["segment"] != source.name:
+                            updated.append(checkpoint)
+                        elif checkpoints:
+                            # The plain segment's checkpoints become the compressed ones.
+                            updated.extend(checkpoints)
+                            checkpoints = []
+                    updated.extend(checkpoints)
+                    self._write_index(updated)
+                    source.unlink()
+                finally:
+                    self._process_locks.release(_LOCK_KEY)
+            logger.info("Compressed history segment %s", target.name)
+        except Exception:
+            logger.exception("Failed to compress history segment %s", source)
+        finally:
+            self._compressing.discard(threading.current_thread())
+
+    # Index ------------------------------------------------------------------
+
+    def _read_index(self) -> list[dict[str, Any]]:
+        try:
+            data = self.index_path.read_bytes()
+        except FileNotFoundError:
+            return []
+        checkpoints = []
+        for line in data.splitlines():
+            try:
+                checkpoints.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return checkpoints
+
+    def _write_index(self, checkpoints: list[dict[str, Any]]) -> None:
+        atomic_write_bytes(self.index_path, _encode_index(checkpoints))
+
+    def _rewrite_index(self, transform) -> None:
+        checkpoints: list[dict[str, Any]] = []
+        for checkpoint in self._read_index():
+            checkpoints.extend(transform(checkpoint))
+        self._write_index(checkpoints)
+
+    def rebuild_index(self) -> None:
+        """Recreate the index with one checkpoint per segment (used when it is lost)."""
+        segments: list[tuple[str, Path, str]] = []
+        for path in self.segment_dir.glob("history-*"):
+            codec = _segment_codec(path.name)
+            if codec is not None:
+                segments.append((path.name, path, codec))
+        if self.active_path.exists():
+            segments.append((self.active_path.name, self.active_path, "none"))
+        checkpoints = []
+        for name, path, codec in segments:
+            try:
+                with _open_reader(path, codec, 0) as reader:
+                    first = reader.readline()
+            except (OSError, EOFError):
+                logger.warning("Skipping unreadable history segment %s", path)
+                continue
+            if not first:
+                continue
+            ts = _entry_ts(first)
+            checkpoints.append(self._checkpoint(name, ts, 0, codec))
+        # Segment names are not ordered reliably; their first entries are.
+        checkpoints.sort(key=lambda c: (c["segment"] == self.active_path.name, c["ts"]))
+        with self._lock:
+            self._write_index(checkpoints)
+
+    # Reading ----------------------------------------------------------------
+
+    def read_range(
+        self, start: str | datetime | None = None, end: str | datetime | None = None
+    ) -> Iterator[dict[str, Any]]:
+        """Yield entries with ``start <= ts < end``, seeking via the index."""
+        self.flush()
+        start_ts, end_ts = _timestamp(start), _timestamp(end)
+        segments: list[list[dict[str, Any]]] = []
+        for checkpoint in self._read_index():
+            if segments and segments[-1][0]["segment"] == checkpoint["segment"]:
+                segments[-1].append(checkpoint)
+            else:
+                segments.append([checkpoint])
+
+        for i, checkpoints in enumerate(segments):
+            if end_ts is not None and checkpoints[0]["ts"] >= end_ts:
+                break
+            following = segments[i + 1][0]["ts"] if i + 1 < len(segments) else None
+            if start_ts is not None and following is not None and following < start_ts:
+                continue
+            # Start at the last block that begins before the range.
+            first = checkpoints[0]
+            for checkpoint in checkpoints[1:]:
+                if start_ts is None or checkpoint["ts"] >= start_ts:
+                    break
+                first = checkpoint
+            name = first["segment"]
+            path = self.active_path if name == self.active_path.name else self.segment_dir / name
+            for entry in self._read_segment(path, first):
+                ts = entry.get("ts", "")
+                if end_ts is not None and ts >= end_ts:
+                    return
+                if start_ts is None or ts >= start_ts:
+                    yield entry
+
+    @staticmethod
+    def _read_segment(path: Path, checkpoint: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        try:
+            reader = _open_reader(path, checkpoint.get("codec", "none"), checkpoint["offset"])
+        except FileNotFoundError:
+            # Rotated or compressed since the index was read.
+            return
+        with reader:
+            for line in reader:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Partially written tail of the active segment.
+                    continue
@@ -0,0 +1,698 @@
+"""File-based chat session storage (the default backend).
+
+Each session is split into a header (``<id>.json``: metadata and tool
+selections), an append-only message log (``<id>.messages.jsonl``, one message
+per line) and a tiny state file (``<id>.state``: ``message_count``,
+``log_bytes`` and ``updated_at``). Appending a message writes one line plus the
+state file; the header is only rewritten when one of its own fields changes.
+
+``log_bytes`` in the state file is the commit marker: readers ignore anything
+past it, so a line written before a crash that never reached the state file is
+simply dropped by the next append or compaction. The state file overrides the
+same fields in the header, which hold the values as of the last header write.
+Legacy ``<id>.json`` files with embedded ``messages`` are still read as-is and
+are migrated on their next write or by the background compactor.
+
+Headers and rewritten logs are replaced atomically (temp file + ``os.replace``)
+and every read-modify-write runs under a per-session lock that excludes other
+threads and other processes sharing the data directory, so concurrent writers
+(e.g. the title job and ``/finalize``) neither lose updates nor expose torn
+files. fsync behaviour follows the configured durability mode.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional
+
+from parlanchina.services.store_base import SESSION_FIELDS, ChatStoreBackend
+from parlanchina.utils.durable_io import Durability, ProcessLocks, atomic_write_bytes
+
+logger = logging.getLogger(__name__)
+
+_FORMAT_VERSION = 2
+_HEADER_ONLY_FIELDS = ("format", "log_bytes")
+# Fields that change on every append; kept in the ``<id>.state`` file.
+_STATE_FIELDS = ("message_count", "log_bytes", "updated_at")
+
+_CATALOG_VERSION = 2
+# Catalog writes are coalesced; the in-memory copy is always current.
+_CATALOG_FLUSH_DELAY = 2.0
+
+
+def _encode_message(message: dict[str, Any]) -> bytes:
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _is_legacy(header: dict[str, Any]) -> bool:
+    return header.get("format") != _FORMAT_VERSION
+
+
+def _public_view(header: dict[str, Any]) -> dict[str, Any]:
+    view = {k: v for k, v in header.items() if k not in _HEADER_ONLY_FIELDS}
+    messages = view.pop("messages", None)
+    if isinstance(messages, list):
+        view["message_count"] = len(messages)
+    view.setdefault("message_count", 0)
+    return view
+
+
+def _tail_lines(f: BinaryIO, end_offset: int, count: int, block_size: int = 65536) -> list[bytes]:
+    """Return the last ``count`` newline-terminated lines before ``end_offset``."""
+    position = end_offset
+    chunks: list[bytes] = []
+    newlines = 0
+    # One extra newline marks the start of the first wanted line.
+    while position > 0 and newlines <= count:
+        size = min(block_size, position)
+        position -= size
+        f.seek(position)
+        chunk = f.read(size)
+        newlines += chunk.count(b"\n")
+        chunks.append(chunk)
+    data = b"".join(reversed(chunks))
+    return data.split(b"\n")[:-1][-count:] if count else []
+
+
+def _signature(stat: os.stat_result | None) -> tuple[int, int, int]:
+    # Every write replaces the file, so the inode changes even when
+    # mtime/size collide.
+    if stat is None:
+        return (0, 0, 0)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _stat(path: Path) -> os.stat_result | None:
+    try:
+        return path.stat()
+    except FileNotFoundError:
+        return None
+
+
+class _SessionLock:
+    """Reentrant per-session lock held across threads and processes."""
+
+    def __init__(self, key: str, process_locks: ProcessLocks) -> None:
+        self._key = key
+        self._process_locks = process_locks
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+
+    def __enter__(self) -> "_SessionLock":
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._process_locks.acquire(self._key)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._process_locks.release(self._key)
+        self._thread_lock.release()
+
+
+@dataclass
+class _CachedSession:
+    signature: tuple[tuple[int, int, int], tuple[int, int, int]]
+    header: dict[str, Any]
+    messages: list[dict[str, Any]] | None = None
+
+
+class _SessionCache:
+    """Bounded LRU of parsed sessions keyed by id.
+
+    Entries are validated against the (inode, mtime_ns, size) of the header
+    and state files; every append rewrites the state file, so the signature
+    covers the log too.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, _CachedSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, signature: tuple | None) -> _CachedSession | None:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or signature is None or entry.signature != signature:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry
+
+    def put(self, session_id: str, entry: _CachedSession) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[session_id] = entry
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class JsonChatStore(ChatStoreBackend):
+    name = "json"
+
+    def __init__(
+        self,
+        data_dir: Path,
+        cache_size: int = 128,
+        durability: Durability | None = None,
+    ) -> None:
+        self.session_dir = data_dir / "sessions"
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        self.catalog_path = data_dir / "sessions_catalog.json"
+        self._durability = durability or Durability("never")
+        self._process_locks = ProcessLocks(self.session_dir / ".lock")
+        self._locks_guard = threading.Lock()
+        self._locks: dict[str, _SessionLock] = {}
+        self._catalog_lock = threading.RLock()
+        # In-memory catalog, the catalog file mtime it was last synced with,
+        # and whether it has changes not yet written.
+        self._catalog_entries: dict[str, dict[str, Any]] | None = None
+        self._catalog_mtime: int | None = None
+        self._catalog_dirty = False
+        self._catalog_timer: threading.Timer | None = None
+        self._cache = _SessionCache(cache_size)
+
+    # Paths and locks ------------------------------------------------------
+
+    def _session_path(self, session_id: str) -> Path:
+        return self.session_dir / f"{session_id}.json"
+
+    def _log_path(self, session_id: str) -> Path:
+        return self.session_dir / f"{session_id}.messages.jsonl"
+
+    def _state_path(self, session_id: str) -> Path:
+        return self.session_dir / f"{session_id}.state"
+
+    def _session_lock(self, session_id: str) -> _SessionLock:
+        with self._locks_guard:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = _SessionLock(session_id, self._process_locks)
+            return lock
+
+    # Public API -----------------------------------------------------------
+
+    def list_sessions(self, limit: int | None = None, offset: int = 0) -> list[dict[str, Any]]:
+        sessions = [self._catalog_summary(entry) for entry in self._refresh_catalog().values()]
+        sessions.sort(key=lambda s: s.get("updated_at") or "", reverse=True)
+        end = offset + limit if limit is not None else None
+        return sessions[offset:end]
+
+    def load_session(self, session_id: str) -> Optional[dict[str, Any]]:
+        entry = self._cached(session_id)
+        if entry is None:
+            return None
+        if entry.messages is None:
+            if _is_legacy(entry.header):
+                entry.messages = list(entry.header.get("messages") or [])
+            else:
+                entry.messages = self._read_log(session_id, entry.header)
+        session = _public_view(entry.header)
+        session.pop("message_count", None)
+        session["messages"] = list(entry.messages)
+        return session
+
+    def load_header(self, session_id: str) -> Optional[dict[str, Any]]:
+        entry = self._cached(session_id)
+        return _public_view(entry.header) if entry is not None else None
+
+    def load_messages(
+        self, session_id: str, start: int | None = None, end: int | None = None
+    ) -> Optional[tuple[dict[str, Any], list[dict[str, Any]]]]:
+        entry = self._cached(session_id)
+        if entry is None:
+            return None
+        header = _public_view(entry.header)
+        messages = entry.messages
+        if messages is None and _is_legacy(entry.header):
+            messages = entry.header.get("messages") or []
+        if messages is not None:
+            return header, list(messages[start:end])
+        first, last, _ = slice(start, end).indices(header["message_count"])
+        return header, self._read_log_range(session_id, entry.header, first, last)
+
+    def stats(self) -> dict[str, Any]:
+        return {"session_cache": self._cache.stats()}
+
+    def close(self) -> None:
+        self._flush_catalog()
+
+    def save_session(self, session: dict[str, Any]) -> None:
+        """Persist a full session dict.
+
+        Callers follow a load -> mutate -> save pattern and messages are never
+        removed, so messages beyond the stored count are treated as new and
+        appended to the log. A snapshot that is behind the log (another thread
+        appended in between) leaves the log untouched.
+        """
+        session_id = session["id"]
+        messages = session.get("messages") or []
+        with self._session_lock(session_id):
+            stored = self._load_header(session_id)
+            header = _public_view(session)
+            if stored is None or _is_legacy(stored):
+                header.update(self._write_log(session_id, messages))
+            else:
+                header["message_count"] = stored.get("message_count", 0)
+                header["log_bytes"] = stored.get("log_bytes", 0)
+                for message in messages[header["message_count"] :]:
+                    header.update(self._append_log_line(session_id, header, message))
+            self._commit(header)
+
+    def append_message(
+        self, session_id: str, message: dict[str, Any], updates: dict[str, Any]
+    ) -> dict[str, Any]:
+        with self._session_lock(session_id):
+            header, messages = self._require_header(session_id)
+            header_changed = any(
+                header.get(k) != v for k, v in updates.items() if k not in _STATE_FIELDS
+            )
+            header.update(self._append_log_line(session_id, header, message))
+            header.update(updates)
+            if messages is not None:
+                messages = messages + [message]
+            self._commit(header, messages, write_header=header_changed)
+            return _public_view(header)
+
+    @contextmanager
+    def transaction(
+        self, session_id: str
+    ) -> Iterator[tuple[dict[str, Any], dict[str, Any]]]:
+        with self._session_lock(session_id):
+            header, messages = self._require_header(session_id)
+            updates: dict[str, Any] = {}
+            yield _public_view(header), updates
+            if updates:
+                header_changed = any(
+                    header.get(k) != v for k, v in updates.items() if k not in _STATE_FIELDS
+                )
+                header.update(updates)
+                self._commit(header, messages, write_header=header_changed)
+
+    def delete_session(self, session_id: str) -> None:
+        path = self._session_path(session_id)
+        if not path.exists():
+            raise FileNotFoundError(f"Session {session_id} not found")
+        with self._session_lock(session_id):
+            path.unlink()
+            self._log_path(session_id).unlink(missing_ok=True)
+            self._state_path(session_id).unlink(missing_ok=True)
+            self._cache.invalidate(session_id)
+        self._catalog_remove(session_id)
+
+    def compact(self) -> int:
+        """Compact every session that needs it; returns the number rewritten."""
+        compacted = 0
+        for entry in self.list_sessions():
+            try:
+                if self.compact_session(entry["id"]):
+                    compacted += 1
+            except OSError:
+                logger.exception("Failed to compact session %s", entry["id"])
+        return compacted
+
+    def compact_session(self, session_id: str) -> bool:
+        """Migrate a legacy session or drop uncommitted bytes from its log.
+
+        Returns True when anything was rewritten.
+        """
+        with self._session_lock(session_id):
+            header = self._load_header(session_id)
+            if header is None:
+                return False
+            if _is_legacy(header):
+                self._migrate_locked(header)
+                return True
+            try:
+                size = self._log_path(session_id).stat().st_size
+            except FileNotFoundError:
+                size = 0
+            if size == header.get("log_bytes", 0):
+                return False
+            messages = self._read_log(session_id, header)
+            header.update(self._write_log(session_id, messages))
+            self._commit(header, messages)
+            return True
+
+    # Session files --------------------------------------------------------
+
+    def _cached(self, session_id: str) -> _CachedSession | None:
+        """Return the cached raw header, re-reading it when a file changed."""
+        stat = _stat(self._session_path(session_id))
+        if stat is None:
+            self._cache.invalidate(session_id)
+            return None
+        signature = (_signature(stat), _signature(_stat(self._state_path(session_id))))
+        entry = self._cache.get(session_id, signature)
+        if entry is not None:
+            return entry
+        header = self._load_header(session_id)
+        if header is None:
+            return None
+        entry = _CachedSession(signature=signature, header=header)
+        self._cache.put(session_id, entry)
+        return entry
+
+    def _load_header(self, session_id: str) -> Optional[dict[str, Any]]:
+        """Return the raw session header (or a whole legacy session) with its state applied."""
+        path = self._session_path(session_id)
+        try:
+            with path.open(encoding="utf-8") as f:
+                header = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not isinstance(header, dict):
+            return None
+        if not _is_legacy(header):
+            header.update(self._load_state(session_id))
+        return header
+
+    def _load_state(self, session_id: str) -> dict[str, Any]:
+        try:
+            with self._state_path(session_id).open(encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Fall back to the values stored with the header.
+            return {}
+        if not isinstance(state, dict):
+            return {}
+        return {k: state[k] for k in _STATE_FIELDS if k in state}
+
+    def _require_header(
+        self, session_id: str
+    ) -> tuple[dict[str, Any], list[dict[str, Any]] | None]:
+        """Return a mutable split-format header plus cached messages, if any.
+
+        Legacy sessions are migrated first. Caller holds the session lock.
+        """
+        entry = self._cached(session_id)
+        if entry is None:
+            raise FileNotFoundError(f"Session {session_id} not found")
+        if _is_legacy(entry.header):
+            messages = list(entry.header.get("messages") or [])
+            return self._migrate_locked(entry.header), messages
+        return dict(entry.header), entry.messages
+
+    def _commit(
+        self,
+        header: dict[str, Any],
+        messages: list[dict[str, Any]] | None = None,
+        *,
+        write_header: bool = True,
+    ) -> None:
+        """Write the state file (and the header when its own fields changed).
+
+        Refreshes the session cache and the catalog; pass ``messages`` when
+        they are known.
+        """
+        header = dict(header)
+        header["format"] = _FORMAT_VERSION
+        session_id = header["id"]
+        path = self._session_path(session_id)
+        if write_header or not path.exists():
+            payload = json.dumps(header, indent=2, ensure_ascii=False).encode("utf-8")
+            atomic_write_bytes(path, payload, self._durability)
+        state_path = self._state_path(session_id)
+        state = {k: header.get(k) for k in _STATE_FIELDS}
+        atomic_write_bytes(state_path, json.dumps(state).encode("utf-8"), self._durability)
+        signature = (_signature(path.stat()), _signature(state_path.stat()))
+        self._cache.put(
+            session_id,
+            _CachedSession(signature=signature, header=header, messages=messages),
+        )
+        self._catalog_upsert(header, signature)
+
+    def _read_log(self, session_id: str, header: dict[str, Any]) -> list[dict[str, Any]]:
+        """Return the committed messages of a split-format session."""
+        log_bytes = header.get("log_bytes", 0)
+        if not log_bytes:
+            return []
+        try:
+            with self._log_path(session_id).open("rb") as f:
+                data = f.read(log_bytes)
+        except FileNotFoundError:
+            return []
+
+        messages: list[dict[str, Any]] = []
+        for line in data.splitlines():
+            try:
+                messages.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Torn or corrupt line; keep what precedes it.
+                break
+        return messages
+
+    def _read_log_range(
+        self, session_id: str, header: dict[str, Any], start: int, end: int
+    ) -> list[dict[str, Any]]:
+        """Decode only messages ``start``..``end`` of the committed log.
+
+        Ranges near the end (the usual "latest page") are found by scanning
+        backwards from ``log_bytes``; others by streaming lines from the start.
+        Bytes before ``log_bytes`` never change, so no lock is needed.
+        """
+        if start >= end:
+            return []
+        log_bytes = header.get("log_bytes", 0)
+        count = header.get("message_count", 0)
+        try:
+            f = self._log_path(session_id).open("rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            if count - start < start:
+                lines = _tail_lines(f, log_bytes, count - start)[: end - start]
+            else:
+                lines = []
+                position = 0
+                for idx, line in enumerate(f):
+                    position += len(line)
+                    if idx >= end or position > log_bytes:
+                        break
+                    if idx >= start:
+                        lines.append(line)
+
+        messages: list[dict[str, Any]] = []
+        for line in lines:
+            try:
+                messages.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+        return messages
+
+    def _write_log(self, session_id: str, messages: list[dict[str, Any]]) -> dict[str, int]:
+        """Rewrite the whole message log and return the matching header fields."""
+        payload = b"".join(_encode_message(message) for message in messages)
+        atomic_write_bytes(self._log_path(session_id), payload, self._durability)
+        return {"message_count": len(messages), "log_bytes": len(payload)}
+
+    def _append_log_line(
+        self, session_id: str, header: dict[str, Any], message: dict[str, Any]
+    ) -> dict[str, int]:
+        """Write one message at the committed end of the log."""
+        path = self._log_path(session_id)
+        line = _encode_message(message)
+        offset = header.get("log_bytes", 0)
+        mode = "r+b" if path.exists() else "wb"
+        with path.open(mode) as f:
+            f.seek(offset)
+            f.write(line)
+            f.truncate()
+            self._durability.after_write(f)
+        return {
+            "message_count": header.get("message_count", 0) + 1,
+            "log_bytes": offset + len(line),
+        }
+
+    def _migrate_locked(self, session: dict[str, Any]) -> dict[str, Any]:
+        """Split a legacy single-file session into header + log."""
+        header = _public_view(session)
+        header.update(self._write_log(session["id"], session.get("messages") or []))
+        self._commit(header)
+        return header
+
+    # Session catalog ------------------------------------------------------
+    #
+    # The catalog keeps one small summary per session (no messages) so the
+    # sidebar can be built without parsing every session file. Each entry
+    # remembers the signatures of the header and state files it was built
+    # from; files that changed behind our back are re-indexed lazily. Writes
+    # update the in-memory copy and the file is rewritten at most once per
+    # ``_CATALOG_FLUSH_DELAY`` seconds, so an append costs O(1) here.
+
+    @staticmethod
+    def _catalog_entry(header: dict[str, Any], signature: tuple) -> dict[str, Any]:
+        entry = {field: header.get(field) for field in SESSION_FIELDS}
+        entry["message_count"] = _public_view(header)["message_count"]
+        entry["signature"] = [list(part) for part in signature]
+        return entry
+
+    @staticmethod
+    def _catalog_summary(entry: dict[str, Any]) -> dict[str, Any]:
+        summary = {field: entry.get(field) for field in SESSION_FIELDS}
+        summary["message_count"] = entry.get("message_count", 0)
+        return summary
+
+    def _read_catalog(self) -> dict[str, dict[str, Any]] | None:
+        """Return catalog entries, reusing the in-memory copy while the file is unchanged.
+
+        Caller holds ``_catalog_lock``.
+        """
+        try:
+            mtime_ns = self.catalog_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        if self._catalog_entries is not None and self._catalog_mtime == mtime_ns:
+            return self._catalog_entries
+        if mtime_ns is None:
+            return None
+
+        try:
+            with self.catalog_path.open(encoding="utf-8") as f:
+                raw = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return None
+        if not isinstance(raw, dict) or raw.get("version") != _CATALOG_VERSION:
+            return None
+        entries = raw.get("sessions")
+        if not isinstance(entries, dict):
+            return None
+
+        # Another process rewrote the file; its copy replaces ours. Sessions
+        # we changed since are re-indexed by signature on the next refresh.
+        self._catalog_entries, self._catalog_mtime = entries, mtime_ns
+        self._catalog_dirty = False
+        return entries
+
+    def _set_catalog(self, entries: dict[str, dict[str, Any]]) -> None:
+        """Replace the in-memory catalog and schedule a write. Caller holds ``_catalog_lock``."""
+        self._catalog_entries = entries
+        self._catalog_dirty = True
+        if self._catalog_timer is None:
+            timer = threading.Timer(_CATALOG_FLUSH_DELAY, self._flush_catalog)
+            timer.name = "parlanchina-catalog-flush"
+            timer.daemon = True
+            self._catalog_timer = timer
+            timer.start()
+
+    def _flush_catalog(self) -> None:
+        with self._catalog_lock:
+            timer, self._catalog_timer = self._catalog_timer, None
+            if timer is not None:
+                timer.cancel()
+            if not self._catalog_dirty or self._catalog_entries is None:
+                return
+            # Derived data: atomic, but no fsync; it is rebuilt if lost.
+            payload = json.dumps(
+                {"version": _CATALOG_VERSION, "sessions": self._catalog_entries},
+                ensure_ascii=False,
+            )
+            try:
+                atomic_write_bytes(self.catalog_path, payload.encode("utf-8"))
+                self._catalog_mtime = self.catalog_path.stat().st_mtime_ns
+            except OSError:
+                logger.exception("Failed to write session catalog %s", self.catalog_path)
+                return
+            self._catalog_dirty = False
+
+    def _refresh_catalog(self) -> dict[str, dict[str, Any]]:
+        """Bring the catalog in line with the session directory and return a copy.
+
+        Only sessions whose header or state file signature differs from the
+        catalog entry are parsed; a missing or unreadable catalog is rebuilt
+        from scratch.
+        """
+        with self._catalog_lock:
+            cached = self._read_catalog()
+            entries = dict(cached) if cached is not None else {}
+            changed = cached is None
+            headers: dict[str, os.DirEntry] = {}
+            states: dict[str, os.stat_result] = {}
+
+            with os.scandir(self.session_dir) as it:
+                for dir_entry in it:
+                    name = dir_entry.name
+                    try:
+                        if name.endswith(".json") and dir_entry.is_file():
+                            headers[name[: -len(".json")]] = dir_entry
+                        elif name.endswith(".state"):
+                            states[name[: -len(".state")]] = dir_entry.stat()
+                    except OSError:
+                        continue
+
+            for session_id, dir_entry in headers.items():
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                signature = (_signature(stat), _signature(states.get(session_id)))
+                current = entries.get(session_id)
+                if current is not None and current.get("signature") == [
+                    list(part) for part in signature
+                ]:
+                    continue
+                header = self._load_header(session_id)
+                if header is None:
+                    if current is not None:
+                        entries.pop(session_id)
+                        changed = True
+                    continue
+                header.setdefault("id", session_id)
+                entries[session_id] = self._catalog_entry(header, signature)
+                changed = True
+
+            for stale_id in set(entries) - set(headers):
+                entries.pop(stale_id)
+                changed = True
+
+            if changed:
+                self._set_catalog(entries)
+            return dict(entries)
+
+    def _catalog_upsert(self, header: dict[str, Any], signature: tuple) -> None:
+        with self._catalog_lock:
+            entries = self._read_catalog()
+            if entries is None:
+                # Let the next listing rebuild the whole catalog.
+                return
+            entries[header["id"]] = self._catalog_entry(header, signature)
+            self._set_catalog(entries)
+
+    def _catalog_remove(self, session_id: str) -> None:
+        with self._catalog_lock:
+            entries = self._read_catalog()
+            if entries is None or session_id not in entries:
+                return
+            entries.pop(session_id)
+            self._set_catalog(entries)
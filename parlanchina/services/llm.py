@@ -1,40 +1,66 @@
+import asyncio
+import contextvars
 import json
 import logging
 import os
 import re
+import threading
 import time
+import weakref
+from collections import OrderedDict
 from collections.abc import AsyncIterator
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
 from openai import AsyncAzureOpenAI, AsyncOpenAI, OpenAIError
 
-from parlanchina.services import image_store, internal_tools, mcp_manager
+from parlanchina.config import get_bool_setting, get_int_setting, get_setting
+from parlanchina.services import (
+    background_loop,
+    image_store,
+    internal_tools,
+    mcp_manager,
+    rate_limiter,
+    response_cache,
+)
+from parlanchina.services.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-_client = None
+# AsyncOpenAI keeps an HTTP connection pool bound to the loop it was first used
+# on, so clients are cached per event loop. Sync callers all go through the
+# shared background loop and therefore share one client and its connections.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
 _client_signature: tuple[str, str | None, str | None, str | None] | None = None
+_client_lock = threading.Lock()
 
 
 def _get_client():
-    global _client, _client_signature
+    global _client_signature
 
     signature = _current_client_signature()
-    if _client and _client_signature == signature:
-        return _client
-
-    provider, api_key, api_base, api_version = signature
-    if provider == "azure":
-        _client = AsyncAzureOpenAI(
-            api_key=api_key,
-            api_version=api_version,
-            azure_endpoint=api_base,
-        )
-    else:
-        _client = AsyncOpenAI(api_key=api_key, base_url=api_base)
-    _client_signature = signature
-    return _client
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if _client_signature != signature:
+            _clients.clear()
+            _client_signature = signature
+        client = _clients.get(loop)
+        if client is not None:
+            return client
+
+        provider, api_key, api_base, api_version = signature
+        # Retries are left to the rate limiter, which sees every 429.
+        if provider == "azure":
+            client = AsyncAzureOpenAI(
+                api_key=api_key,
+                api_version=api_version,
+                azure_endpoint=api_base,
+                max_retries=0,
+            )
+        else:
+            client = AsyncOpenAI(api_key=api_key, base_url=api_base, max_retries=0)
+        _clients[loop] = client
+        return client
 
 
 def _current_client_signature() -> tuple[str, str | None, str | None, str | None]:
@@ -60,9 +86,83 @@ class LLMEvent:
     text: Optional[str] = None
     image_b64: Optional[str] = None
     image_params: Optional[Dict[str, Any]] = None
+    tool: Optional[Dict[str, Any]] = None
+    usage: Optional[Dict[str, int]] = None
     raw_event: Any | None = None
 
 
+_AGENT_SYSTEM_PROMPT = (
+    "You can call the available tools to fetch or modify data when it helps answer the user. "
+    "Call a tool when you need data or actions; otherwise answer directly. "
+    "When you return tool results, clearly surface the important fields in plain text (e.g., `Title: ...`, `Summary: ...`) before continuing. "
+    "If you both fetch data and generate media (like images), present the fetched fields first, then the media prompt/output. "
+    "Do not state that you lack web access; rely on the provided tools for data retrieval."
+)
+
+_usage_totals: dict[str, dict[str, int]] = {}
+_inflight = SingleFlight()
+
+
+def _usage_field(usage: Any, *names: str) -> int:
+    for name in names:
+        value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if isinstance(value, int):
+            return value
+    return 0
+
+
+def _record_usage(model: str | None, usage: Any) -> Optional[Dict[str, int]]:
+    """Log and tally token usage of one request (chat or Responses API shape)."""
+    if not usage:
+        return None
+    details = None
+    for name in ("prompt_tokens_details", "input_tokens_details"):
+        details = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if details:
+            break
+    result = {
+        "input_tokens": _usage_field(usage, "prompt_tokens", "input_tokens"),
+        "cached_tokens": _usage_field(details, "cached_tokens") if details else 0,
+        "output_tokens": _usage_field(usage, "completion_tokens", "output_tokens"),
+    }
+    totals = _usage_totals.setdefault(
+        model or "", {"requests": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+    )
+    totals["requests"] += 1
+    for key, value in result.items():
+        totals[key] += value
+    logger.info(
+        "Model %s usage: %s input tokens (%s cached), %s output tokens",
+        model,
+        result["input_tokens"],
+        result["cached_tokens"],
+        result["output_tokens"],
+    )
+    return result
+
+
+def _used_tokens(usage: Optional[Dict[str, int]]) -> Optional[int]:
+    return usage["input_tokens"] + usage["output_tokens"] if usage else None
+
+
+def _rate_limited_text(exc: rate_limiter.RateLimited) -> str:
+    wait = f" in about {max(1, round(exc.retry_after))}s" if exc.retry_after else " in a moment"
+    return f"\n\n*System:* The model is busy (rate limit reached). Please try again{wait}."
+
+
+def prompt_cache_stats() -> dict[str, dict[str, Any]]:
+    """Per-model token totals and the share of input tokens served from the prompt cache."""
+    return {
+        model: {
+            **totals,
+            "cache_hit_rate": round(totals["cached_tokens"] / totals["input_tokens"], 3)
+            if totals["input_tokens"]
+            else 0.0,
+        }
+        for model, totals in _usage_totals.items()
+    }
+
+
 def _event_to_dict(event: Any) -> dict:
     try:
         return event.model_dump()
@@ -167,70 +267,81 @@ async def _stream_ask_mode(
         ]
 
     try:
-        stream = await client.responses.create(
-            model=model,
-            input=formatted_messages,
-            stream=True,
-            tools=tools,
-        )
-        accumulated_text = ""
-        sent_image_start = False
-        async for event in stream:
-            payload = _event_to_dict(event)
-            if logger.isEnabledFor(logging.DEBUG):
-                event_type = getattr(event, "type", type(event))
-                logger.debug(
-                    "LLM stream event: %s keys=%s", event_type, list(payload.keys())
+        async with rate_limiter.request(model, rate_limiter.estimate_tokens(formatted_messages)) as permit:
+            stream = await permit.send(
+                lambda: client.responses.create(
+                    model=model,
+                    input=formatted_messages,
+                    stream=True,
+                    tools=tools,
                 )
-                if "partial_image_b64" in payload:
+            )
+            accumulated_text = ""
+            sent_image_start = False
+            async for event in stream:
+                payload = _event_to_dict(event)
+                if logger.isEnabledFor(logging.DEBUG):
+                    event_type = getattr(event, "type", type(event))
                     logger.debug(
-                        "Partial image payload size=%s",
-                        len(payload.get("partial_image_b64") or ""),
+                        "LLM stream event: %s keys=%s", event_type, list(payload.keys())
                     )
-
-            # Signal image generation start even before final base64 arrives
-            if (
-                not sent_image_start
-                and isinstance(getattr(event, "type", ""), str)
-                and "image_generation_call" in event.type
-            ):
-                sent_image_start = True
-                yield LLMEvent(type="image_start", raw_event=event)
-
-            # Look for image data on any event, even if the type label is unexpected
-            image_b64, image_params = _extract_image_b64(payload)
-            if image_b64:
-                logger.debug("Image payload detected on event type %s", getattr(event, "type", ""))
-                yield LLMEvent(
-                    type="image_call",
-                    image_b64=image_b64,
-                    image_params=image_params,
-                    raw_event=event,
-                )
-                continue
-
-            if event.type == "response.output_text.delta":
-                delta = event.delta or ""
-                if delta:
-                    accumulated_text += delta
-                    total_chars += len(delta)
+                    if "partial_image_b64" in payload:
+                        logger.debug(
+                            "Partial image payload size=%s",
+                            len(payload.get("partial_image_b64") or ""),
+                        )
+
+                # Signal image generation start even before final base64 arrives
+                if (
+                    not sent_image_start
+                    and isinstance(getattr(event, "type", ""), str)
+                    and "image_generation_call" in event.type
+                ):
+                    sent_image_start = True
+                    yield LLMEvent(type="image_start", raw_event=event)
+
+                # Look for image data on any event, even if the type label is unexpected
+                image_b64, image_params = _extract_image_b64(payload)
+                if image_b64:
+                    logger.debug("Image payload detected on event type %s", getattr(event, "type", ""))
                     yield LLMEvent(
-                        type="text_delta",
-                        text=delta,
+                        type="image_call",
+                        image_b64=image_b64,
+                        image_params=image_params,
                         raw_event=event,
                     )
-            elif event.type in {
-                "response.output_text.done",
-                "response.completed",
-            }:
-                text_content = _extract_text_output(event) or accumulated_text
-                yield LLMEvent(
-                    type="text_done",
-                    text=text_content,
-                    raw_event=event,
-                )
-            elif event.type == "response.error":
-                yield LLMEvent(type="error", text=str(event), raw_event=event)
+                    continue
+
+                if event.type == "response.output_text.delta":
+                    delta = event.delta or ""
+                    if delta:
+                        accumulated_text += delta
+                        total_chars += len(delta)
+                        yield LLMEvent(
+                            type="text_delta",
+                            text=delta,
+                            raw_event=event,
+                        )
+                elif event.type in {
+                    "response.output_text.done",
+                    "response.completed",
+                }:
+                    if event.type == "response.completed":
+                        usage = _record_usage(model, getattr(getattr(event, "response", None), "usage", None))
+                        permit.settle(_used_tokens(usage))
+                        if usage:
+                            yield LLMEvent(type="usage", usage=usage)
+                    text_content = _extract_text_output(event) or accumulated_text
+                    yield LLMEvent(
+                        type="text_done",
+                        text=text_content,
+                        raw_event=event,
+                    )
+                elif event.type == "response.error":
+                    yield LLMEvent(type="error", text=str(event), raw_event=event)
+    except rate_limiter.RateLimited as exc:
+        logger.warning("Ask mode request not sent: %s", exc)
+        yield LLMEvent(type="error", text=_rate_limited_text(exc))
     except OpenAIError as exc:
         logger.exception("Responses API error: %s", exc)
         yield LLMEvent(
@@ -259,160 +370,95 @@ async def _stream_agent_mode(
     """Handle iterative agent loop using both internal and MCP tools."""
 
     client = _get_client()
-    tool_payloads, tool_name_map = await _build_agent_tool_payloads(
-        enabled_internal_ids=enabled_internal, enabled_mcp_ids=enabled_mcp
-    )
+    user_text = messages[-1].get("content", "") if messages else ""
+    # The plan only needs the user text and tool ids, so it runs while payloads are built.
+    plan_task = _start_plan(user_text, sorted(enabled_internal | enabled_mcp), model)
+    try:
+        tool_payloads, tool_name_map = await _build_agent_tool_payloads(
+            enabled_internal_ids=enabled_internal, enabled_mcp_ids=enabled_mcp
+        )
+    except BaseException:
+        # Failed or cancelled (client went away): nobody will await the plan.
+        if plan_task is not None:
+            plan_task.cancel()
+        raise
     if logger.isEnabledFor(logging.DEBUG):
         logger.debug("Agent loop start: internal=%s mcp=%s", sorted(enabled_internal), sorted(enabled_mcp))
         logger.debug("Agent tool payloads: %s", [p.get("function", {}).get("name") for p in tool_payloads])
-    allowed_names = set(tool_name_map.keys())
     tool_results: list[str] = []
     last_structured: list[dict[str, Any]] = []
     conversation = _format_input(messages)
 
-    # Plan step: ask the model for a brief plan before executing tools.
-    try:
-        available_tool_names = ", ".join(sorted(p.get("function", {}).get("name", "") for p in tool_payloads))
-        plan_prompt = [
-            {
-                "role": "system",
-                "content": (
-                    "Given the user request, produce a brief, numbered plan of tool actions to complete it. "
-                    "Keep it concise (1-3 steps). Available tools this turn: "
-                    f"{available_tool_names or 'none'}. "
-                    "Use only these tools for data/actions; do not invent other tools or browsing. "
-                    "If no tools are needed, state that. Do not execute tools here."
-                ),
-            },
-            {
-                "role": "user",
-                "content": messages[-1].get("content", "") if messages else "",
-            },
-        ]
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug("Plan prompt tools=%s user=%s", available_tool_names, plan_prompt[-1]["content"])
-        plan_resp = await complete_response(plan_prompt, model)
-        if plan_resp:
-            conversation.insert(
-                0,
-                {
-                    "role": "assistant",
-                    "content": f"Plan:\n{plan_resp}",
-                },
-            )
-            logger.debug("Plan response: %s", plan_resp)
-    except Exception:
-        # Planning is best-effort; continue if it fails.
-        logger.debug("Plan step failed; continuing without plan", exc_info=True)
-        pass
     if not tool_payloads:
-        # No valid tools resolved; fall back to plain completion.
+        if plan_task is not None:
+            plan_task.cancel()
+        # No valid tools resolved; fall back to a plain streamed completion.
         logger.debug("No tool payloads; falling back to plain completion")
-        final_text = await complete_response(messages, model)
-        for chunk in _yield_text_chunks(final_text):
-            yield LLMEvent(type="text_delta", text=chunk)
-        yield LLMEvent(type="text_done", text=final_text)
+        async for event in _stream_ask_mode(messages, model, enable_image_tool=False):
+            yield event
         return
 
-    if tool_payloads:
-        tool_list = ", ".join(sorted(tool_name_map.keys()))
-        conversation = [
-            {
-                "role": "system",
-                "content": (
-                    "You can call the available tools to fetch or modify data when it helps answer the user. "
-                    f"Tools enabled for this turn: {tool_list}. "
-                    "Call a tool when you need data or actions; otherwise answer directly. "
-                    "When you return tool results, clearly surface the important fields in plain text (e.g., `Title: ...`, `Summary: ...`) before continuing. "
-                    "If you both fetch data and generate media (like images), present the fetched fields first, then the media prompt/output. "
-                    "Do not state that you lack web access; rely on the provided tools for data retrieval."
-                ),
-            }
-        ] + conversation
+    # Prefix-cache friendly layout: constant system prompt (tools travel
+    # sorted in ``tools``), then the history, then what changes per request.
+    conversation = [{"role": "system", "content": _AGENT_SYSTEM_PROMPT}] + conversation
+    if plan_task is not None:
+        plan_resp = await _finish_plan(plan_task)
+        if plan_resp:
+            # A system note just before the new user message, so the request
+            # still ends with the user turn the model has to answer.
+            note = {"role": "system", "content": f"Plan for answering the next message:\n{plan_resp}"}
+            at = len(conversation) - 1 if conversation[-1]["role"] == "user" else len(conversation)
+            conversation.insert(at, note)
     max_turns = 6
+    # Everything forwarded as text_delta so far, across turns.
+    streamed: list[str] = []
     for _ in range(max_turns):
+        message = _StreamedMessage()
         try:
-            response = await client.chat.completions.create(
+            async for delta in _stream_chat_turn(
+                client,
+                message,
                 model=model,
                 messages=conversation,
                 tools=tool_payloads,
                 tool_choice="auto",
-            )
-        except OpenAIError as exc:
-            logger.exception("Chat completion error: %s", exc)
-            yield LLMEvent(type="error", text="Tool-enabled model call failed.")
-            return
-        except Exception as exc:  # pragma: no cover - catch-all safety
-            logger.exception("Unexpected tool-call error: %s", exc)
-            yield LLMEvent(type="error", text="Unexpected error during tool call.")
+            ):
+                streamed.append(delta)
+                yield LLMEvent(type="text_delta", text=delta)
+        except Exception as exc:
+            yield _agent_turn_error(exc)
             return
-
-        choice = (response.choices or [None])[0]
-        message = getattr(choice, "message", None)
-        if not message:
-            break
-
-        tool_calls = getattr(message, "tool_calls", None) or []
-        if tool_calls:
+        if message.usage:
+            yield LLMEvent(type="usage", usage=message.usage)
+
+        if message.tool_calls:
+            if message.content:
+                # Text before the tool calls was already shown; keep the next turn apart.
+                streamed.append("\n\n")
+                yield LLMEvent(type="text_delta", text="\n\n")
             assistant_message = {
                 "role": "assistant",
-                "content": message.content or "",
-                "tool_calls": [_tool_call_to_dict(tc) for tc in tool_calls],
+                "content": message.content,
+                "tool_calls": message.tool_calls,
             }
             conversation.append(assistant_message)
-            for tc in tool_calls:
-                call = _tool_call_to_dict(tc)
-                tool_name = call.get("function", {}).get("name") or ""
-                args = _parse_tool_args(call.get("function", {}).get("arguments"))
-                logger.debug("Tool call requested: %s args=%s", tool_name, args)
-                # Accept both safe names and full ids from the model
-                resolved_tool_id = tool_name_map.get(tool_name) or (
-                    tool_name if tool_name in tool_name_map.values() else None
-                )
-                allowed = tool_name in allowed_names or tool_name in tool_name_map.values()
-                if not resolved_tool_id or not allowed:
-                    # Model asked for a tool that is not enabled this turn.
-                    result_text = f"Tool {tool_name} is disabled for this turn."
-                elif resolved_tool_id.startswith("internal."):
-                    if resolved_tool_id not in enabled_internal:
-                        result_text = f"Tool {tool_name} is disabled for this turn."
-                    else:
-                        result_text = await _run_internal_tool(resolved_tool_id, args)
-                        # Emit image events for internal image tools
-                        if resolved_tool_id == "internal.image":
-                            image_results = _get_and_clear_agent_image_results()
-                            for img in image_results:
-                                yield LLMEvent(
-                                    type="image_call",
-                                    image_b64=None,  # Already saved to file
-                                    image_params={"prompt": img["prompt"], "size": img["size"], "url_path": img["url_path"]},
-                                )
-                else:
-                    if resolved_tool_id not in enabled_mcp:
-                        result_text = f"Tool {tool_name} is disabled for this turn."
-                    else:
-                        result_text = await _run_mcp_tool(resolved_tool_id, args)
-                logger.debug("Tool call result for %s: %s", tool_name, result_text[:500])
+            calls = _prepare_tool_calls(message.tool_calls, tool_name_map, enabled_internal, enabled_mcp)
+            results: list[str] = []
+            async for event in _run_tool_calls(calls, results):
+                yield event
+            for call, result_text in zip(calls, results):
+                logger.debug("Tool call result for %s: %s", call.name, result_text[:500])
                 tool_results.append(result_text)
                 parsed_structured = _unwrap_tool_result(result_text)
                 if parsed_structured:
                     last_structured.extend(parsed_structured)
-                conversation.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": call.get("id") or "",
-                        "content": result_text,
-                        "name": tool_name or None,
-                    }
-                )
+                conversation.append(call.message(result_text))
             continue
 
-        final_text = message.content or ""
-        if final_text:
-            for chunk in _yield_text_chunks(final_text):
-                yield LLMEvent(type="text_delta", text=chunk)
-            yield LLMEvent(type="text_done", text=final_text)
+        if message.content:
+            yield LLMEvent(type="text_done", text="".join(streamed))
             return
+        break
 
     # If we reach here, we didn't get a final answer. Ask the model to summarize tool results.
     if tool_results:
@@ -451,73 +497,43 @@ async def _stream_agent_mode(
         ]
 
         for _ in range(2):
+            msg = _StreamedMessage()
             try:
-                resp = await client.chat.completions.create(
+                async for delta in _stream_chat_turn(
+                    client,
+                    msg,
                     model=model,
                     messages=final_conversation,
                     tools=tool_payloads,
                     tool_choice="auto",
-                )
-            except Exception:
-                break
+                ):
+                    streamed.append(delta)
+                    yield LLMEvent(type="text_delta", text=delta)
+            except Exception as exc:
+                yield _agent_turn_error(exc)
+                return
 
-            choice = (resp.choices or [None])[0]
-            msg = getattr(choice, "message", None)
-            if not msg:
-                continue
-            tool_calls = getattr(msg, "tool_calls", None) or []
-            if tool_calls:
+            if msg.tool_calls:
+                if msg.content:
+                    streamed.append("\n\n")
+                    yield LLMEvent(type="text_delta", text="\n\n")
                 assistant_msg = {
                     "role": "assistant",
-                    "content": msg.content or "",
-                    "tool_calls": [_tool_call_to_dict(tc) for tc in tool_calls],
+                    "content": msg.content,
+                    "tool_calls": msg.tool_calls,
                 }
                 final_conversation.append(assistant_msg)
-                for tc in tool_calls:
-                    call = _tool_call_to_dict(tc)
-                    tool_name = call.get("function", {}).get("name") or ""
-                    args = _parse_tool_args(call.get("function", {}).get("arguments"))
-                    resolved_tool_id = tool_name_map.get(tool_name) or (
-                        tool_name if tool_name in tool_name_map.values() else None
-                    )
-                    allowed = tool_name in allowed_names or tool_name in tool_name_map.values()
-                    if not resolved_tool_id or not allowed:
-                        result_text = f"Tool {tool_name} is disabled for this turn."
-                    elif resolved_tool_id.startswith("internal."):
-                        if resolved_tool_id not in enabled_internal:
-                            result_text = f"Tool {tool_name} is disabled for this turn."
-                        else:
-                            result_text = await _run_internal_tool(resolved_tool_id, args)
-                            # Emit image events for internal image tools in summary phase too
-                            if resolved_tool_id == "internal.image":
-                                image_results = _get_and_clear_agent_image_results()
-                                for img in image_results:
-                                    yield LLMEvent(
-                                        type="image_call",
-                                        image_b64=None,  # Already saved to file
-                                        image_params={"prompt": img["prompt"], "size": img["size"], "url_path": img["url_path"]},
-                                    )
-                    else:
-                        if resolved_tool_id not in enabled_mcp:
-                            result_text = f"Tool {tool_name} is disabled for this turn."
-                        else:
-                            result_text = await _run_mcp_tool(resolved_tool_id, args)
+                calls = _prepare_tool_calls(msg.tool_calls, tool_name_map, enabled_internal, enabled_mcp)
+                results = []
+                async for event in _run_tool_calls(calls, results):
+                    yield event
+                for call, result_text in zip(calls, results):
                     tool_results.append(result_text)
-                    final_conversation.append(
-                        {
-                            "role": "tool",
-                            "tool_call_id": call.get("id") or "",
-                            "content": result_text,
-                            "name": tool_name or None,
-                        }
-                    )
+                    final_conversation.append(call.message(result_text))
                 continue
 
-            final_text = msg.content or ""
-            if final_text:
-                for chunk in _yield_text_chunks(final_text):
-                    yield LLMEvent(type="text_delta", text=chunk)
-                yield LLMEvent(type="text_done", text=final_text)
+            if msg.content:
+                yield LLMEvent(type="text_done", text="".join(streamed))
                 return
 
         # If still nothing, fall back to a concise summary without tools.
@@ -535,7 +551,11 @@ async def _stream_agent_mode(
                 "content": f"User request: {last_user}\n\nTool results:\n" + "\n\n".join(summary_sources),
             },
         ]
+        # A user-visible answer, so never served from the response cache.
         summary_text = await complete_response(summary_prompt, model)
+        if summary_text in FAILED_COMPLETIONS:
+            yield LLMEvent(type="error", text="Tool-enabled model call failed.")
+            return
         yield LLMEvent(type="text_done", text=summary_text)
         return
 
@@ -545,6 +565,126 @@ async def _stream_agent_mode(
     )
 
 
+def _agent_turn_error(exc: Exception) -> LLMEvent:
+    """Log a failed agent-mode model turn and return the error event for it."""
+    if isinstance(exc, rate_limiter.RateLimited):
+        logger.warning("Agent turn not sent: %s", exc)
+        return LLMEvent(type="error", text=_rate_limited_text(exc))
+    if isinstance(exc, OpenAIError):
+        logger.exception("Chat completion error: %s", exc)
+        return LLMEvent(type="error", text="Tool-enabled model call failed.")
+    logger.exception("Unexpected tool-call error: %s", exc)
+    return LLMEvent(type="error", text="Unexpected error during tool call.")
+
+
+_PLANNER_MODES = {"off", "concurrent", "auto"}
+# What complete_response returns instead of raising; never cache or store these.
+FAILED_COMPLETIONS = {"Error generating response", "Unexpected error"}
+_plan_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_planner_stats: dict[str, Any] = {
+    "planned": 0,
+    "cache_hits": 0,
+    "skipped": 0,
+    "failed": 0,
+    "plan_ms": 0.0,
+    "wait_ms": 0.0,
+    "last_plan_ms": None,
+    "last_wait_ms": None,
+}
+
+
+def _planner_mode() -> str:
+    mode = str(get_setting("PARLANCHINA_AGENT_PLANNER", "auto")).strip().lower()
+    if mode not in _PLANNER_MODES:
+        logger.warning("Unknown PARLANCHINA_AGENT_PLANNER %r; using 'auto'", mode)
+        return "auto"
+    return mode
+
+
+def _start_plan(user_text: str, tool_ids: list[str], model: str) -> Optional[asyncio.Task]:
+    """Start the planning call as a task, or return None when it is skipped.
+
+    ``off`` never plans, ``concurrent`` always does, ``auto`` skips short
+    messages (``PARLANCHINA_PLANNER_MIN_CHARS``) and turns without tools.
+    """
+    mode = _planner_mode()
+    skip = mode == "off" or (
+        mode == "auto"
+        and (not tool_ids or len(user_text.strip()) < get_int_setting("PARLANCHINA_PLANNER_MIN_CHARS", 40))
+    )
+    if skip:
+        _planner_stats["skipped"] += 1
+        return None
+    return asyncio.create_task(_plan(user_text, tool_ids, model))
+
+
+async def _finish_plan(task: asyncio.Task) -> Optional[str]:
+    """Await a started plan; the time spent here is what planning adds to the turn."""
+    started = time.perf_counter()
+    try:
+        plan = await task
+    except Exception:
+        # Planning is best-effort; continue if it fails.
+        logger.debug("Plan step failed; continuing without plan", exc_info=True)
+        _planner_stats["failed"] += 1
+        plan = None
+    waited = (time.perf_counter() - started) * 1000
+    _planner_stats["wait_ms"] += waited
+    _planner_stats["last_wait_ms"] = round(waited, 2)
+    logger.info("Plan phase blocked the agent turn for %.0f ms", waited)
+    return plan
+
+
+async def _plan(user_text: str, tool_ids: list[str], model: str) -> Optional[str]:
+    key = (model, user_text, tuple(tool_ids))
+    cached = _plan_cache.get(key)
+    if cached is not None:
+        _plan_cache.move_to_end(key)
+        _planner_stats["cache_hits"] += 1
+        return cached
+
+    available_tool_names = ", ".join(tool_ids)
+    plan_prompt = [
+        {
+            "role": "system",
+            "content": (
+                "Given the user request, produce a brief, numbered plan of tool actions to complete it. "
+                "Keep it concise (1-3 steps). Available tools this turn: "
+                f"{available_tool_names or 'none'}. "
+                "Use only these tools for data/actions; do not invent other tools or browsing. "
+                "If no tools are needed, state that. Do not execute tools here."
+            ),
+        },
+        {
+            "role": "user",
+            "content": user_text,
+        },
+    ]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Plan prompt tools=%s user=%s", available_tool_names, user_text)
+    started = time.perf_counter()
+    # No cache_site: _plan_cache is the only cache for plans.
+    plan = await complete_response(plan_prompt, model)
+    elapsed = (time.perf_counter() - started) * 1000
+    _planner_stats["planned"] += 1
+    _planner_stats["plan_ms"] += elapsed
+    _planner_stats["last_plan_ms"] = round(elapsed, 2)
+    if not plan or plan in FAILED_COMPLETIONS:
+        _planner_stats["failed"] += 1
+        return None
+    logger.debug("Plan response: %s", plan)
+    _plan_cache[key] = plan
+    _plan_cache.move_to_end(key)
+    while len(_plan_cache) > max(0, get_int_setting("PARLANCHINA_PLANNER_CACHE_SIZE", 128)):
+        _plan_cache.popitem(last=False)
+    return plan
+
+
+def planner_stats() -> dict[str, Any]:
+    """Counters and timings of the agent planning phase."""
+    return {**_planner_stats, "cached_plans": len(_plan_cache)}
+
+
 async def _build_agent_tool_payloads(
     enabled_internal_ids: set[str],
     enabled_mcp_ids: set[str],
@@ -554,8 +694,9 @@ async def _build_agent_tool_payloads(
     name_map: dict[str, str] = {}
     used_names: set[str] = set()
 
+    # Sorted so the tool list, and the request prefix, is the same every turn.
     # Internal tools
-    for tool_id in enabled_internal_ids:
+    for tool_id in sorted(enabled_internal_ids):
         definition = internal_tools.get_internal_tool_definition(tool_id)
         if not definition:
             continue
@@ -574,7 +715,7 @@ async def _build_agent_tool_payloads(
         )
 
     # MCP tools
-    for tool_id in enabled_mcp_ids:
+    for tool_id in sorted(enabled_mcp_ids):
         definition = await mcp_manager.get_tool_definition_async(tool_id)
         if not definition:
             continue
@@ -594,7 +735,67 @@ async def _build_agent_tool_payloads(
     return payloads, name_map
 
 
+@dataclass
+class _StreamedMessage:
+    """Assistant message assembled from chat-completion stream chunks."""
+
+    content: str = ""
+    tool_calls: list[dict] = field(default_factory=list)
+    usage: Optional[Dict[str, int]] = None
+
+
+async def _stream_chat_turn(client: Any, message: _StreamedMessage, **request: Any) -> AsyncIterator[str]:
+    """Stream one chat completion, yielding text deltas as they arrive.
+
+    Tool-call fragments are merged by their ``index`` into ``message.tool_calls``
+    (ids and names arrive once, ``arguments`` in pieces).
+    """
+    started = time.time()
+    if get_bool_setting("PARLANCHINA_STREAM_USAGE", True):
+        # The last chunk then carries usage, including cached prompt tokens.
+        request.setdefault("stream_options", {"include_usage": True})
+    estimate = rate_limiter.estimate_tokens(request.get("messages")) + rate_limiter.estimate_tokens(
+        request.get("tools") or []
+    )
+    calls: dict[int, dict] = {}
+    async with rate_limiter.request(request.get("model") or "", estimate) as permit:
+        stream = await permit.send(lambda: client.chat.completions.create(stream=True, **request))
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                message.usage = _record_usage(request.get("model"), chunk.usage)
+                permit.settle(_used_tokens(message.usage))
+            choice = (getattr(chunk, "choices", None) or [None])[0]
+            delta = getattr(choice, "delta", None)
+            if delta is None:
+                continue
+            text = getattr(delta, "content", None)
+            if text:
+                message.content += text
+                yield text
+            for fragment in getattr(delta, "tool_calls", None) or []:
+                call = calls.setdefault(
+                    getattr(fragment, "index", len(calls)),
+                    {"id": "", "type": "function", "function": {"name": "", "arguments": ""}},
+                )
+                if getattr(fragment, "id", None):
+                    call["id"] = fragment.id
+                function = getattr(fragment, "function", None)
+                if function is not None:
+                    call["function"]["name"] += getattr(function, "name", None) or ""
+                    call["function"]["arguments"] += getattr(function, "arguments", None) or ""
+    message.tool_calls = [calls[index] for index in sorted(calls)]
+    logger.info(
+        "Model %s streamed %s chars and %s tool call(s) in %.2fs",
+        request.get("model"),
+        len(message.content),
+        len(message.tool_calls),
+        time.time() - started,
+    )
+
+
 def _tool_call_to_dict(tool_call: Any) -> dict:
+    if isinstance(tool_call, dict):
+        return tool_call
     try:
         return tool_call.model_dump()
     except Exception:
@@ -614,6 +815,145 @@ def _tool_call_to_dict(tool_call: Any) -> dict:
     }
 
 
+@dataclass
+class _ToolCall:
+    call_id: str
+    name: str
+    args: dict
+    # Resolved tool id, or None when the tool is not enabled this turn.
+    tool_id: Optional[str]
+
+    @property
+    def server(self) -> str:
+        return (self.tool_id or "").split(".", 1)[0]
+
+    def message(self, result_text: str) -> dict:
+        return {
+            "role": "tool",
+            "tool_call_id": self.call_id,
+            "content": result_text,
+            "name": self.name or None,
+        }
+
+
+def _prepare_tool_calls(
+    tool_calls: list[Any],
+    tool_name_map: dict[str, str],
+    enabled_internal: set[str],
+    enabled_mcp: set[str],
+) -> list[_ToolCall]:
+    prepared: list[_ToolCall] = []
+    for tc in tool_calls:
+        call = _tool_call_to_dict(tc)
+        tool_name = call.get("function", {}).get("name") or ""
+        args = _parse_tool_args(call.get("function", {}).get("arguments"))
+        logger.debug("Tool call requested: %s args=%s", tool_name, args)
+        # Accept both safe names and full ids from the model
+        tool_id = tool_name_map.get(tool_name) or (
+            tool_name if tool_name in tool_name_map.values() else None
+        )
+        enabled = enabled_internal if (tool_id or "").startswith("internal.") else enabled_mcp
+        if tool_id not in enabled:
+            tool_id = None
+        prepared.append(_ToolCall(call.get("id") or "", tool_name, args, tool_id))
+    return prepared
+
+
+async def _execute_tool_call(call: _ToolCall) -> tuple[str, list[dict]]:
+    """Run one tool call; returns its result text and any images it saved."""
+    images: list[dict] = []
+    if not call.tool_id:
+        # Model asked for a tool that is not enabled this turn.
+        return f"Tool {call.name} is disabled for this turn.", images
+    try:
+        if call.tool_id.startswith("internal."):
+            return await _run_internal_tool(call.tool_id, call.args, images), images
+        return await _run_mcp_tool(call.tool_id, call.args), images
+    except Exception as exc:  # pragma: no cover - runners report their own failures
+        logger.exception("Tool %s failed", call.tool_id)
+        return f"Failed to run {call.tool_id}: {exc}", images
+
+
+class _ToolLimits:
+    """Tool-call concurrency limits shared by every turn and session.
+
+    The semaphores belong to the background loop; a new set is made if that
+    loop is restarted.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.overall = asyncio.Semaphore(max(1, get_int_setting("PARLANCHINA_TOOL_CONCURRENCY", 4)))
+        self.per_server = max(1, get_int_setting("PARLANCHINA_TOOL_CONCURRENCY_PER_SERVER", 2))
+        self._servers: dict[str, asyncio.Semaphore] = {}
+
+    def server(self, name: str) -> asyncio.Semaphore:
+        limit = self._servers.get(name)
+        if limit is None:
+            limit = self._servers[name] = asyncio.Semaphore(self.per_server)
+        return limit
+
+
+_tool_limits: Optional[_ToolLimits] = None
+
+
+def _get_tool_limits() -> _ToolLimits:
+    # Only called on the background loop thread, so no lock is needed.
+    global _tool_limits
+    loop = asyncio.get_running_loop()
+    if _tool_limits is None or _tool_limits.loop is not loop:
+        _tool_limits = _ToolLimits(loop)
+    return _tool_limits
+
+
+async def _limited_tool_call(
+    call: _ToolCall, context: contextvars.Context
+) -> tuple[str, list[dict]]:
+    """Run one tool call under the shared limits (on the background loop)."""
+    limits = _get_tool_limits()
+    async with limits.server(call.server), limits.overall:
+        started = time.perf_counter()
+        # The caller's context carries the app context the tool runners need.
+        result = await asyncio.create_task(_execute_tool_call(call), context=context)
+    elapsed = time.perf_counter() - started
+    logger.debug("Tool %s finished in %.2fs", call.tool_id or call.name, elapsed)
+    return result
+
+
+async def _run_tool_calls(calls: list[_ToolCall], results: list[str]) -> AsyncIterator[LLMEvent]:
+    """Run the tool calls of one assistant turn concurrently.
+
+    ``results`` is filled in call order (tool messages must follow the order of
+    ``tool_calls``); events are yielded as each call completes.
+    """
+    results[:] = [""] * len(calls)
+    loop = background_loop.get_loop()
+
+    async def _run(index: int, call: _ToolCall) -> tuple[int, str, list[dict]]:
+        limited = _limited_tool_call(call, contextvars.copy_context())
+        result_text, images = await loop.run_async(limited)
+        return index, result_text, images
+
+    tasks = [asyncio.create_task(_run(index, call)) for index, call in enumerate(calls)]
+    try:
+        for completed, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+            index, result_text, images = await next_done
+            results[index] = result_text
+            for img in images:
+                yield LLMEvent(
+                    type="image_call",
+                    image_b64=None,  # Already saved to file
+                    image_params={"prompt": img["prompt"], "size": img["size"], "url_path": img["url_path"]},
+                )
+            yield LLMEvent(
+                type="tool_done",
+                tool={"name": calls[index].name, "completed": completed, "total": len(calls)},
+            )
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 async def _run_mcp_tool(tool_name: str, args: dict | None) -> str:
     if "." not in tool_name:
         return f"Tool name {tool_name} is not in server.tool format."
@@ -626,31 +966,34 @@ async def _run_mcp_tool(tool_name: str, args: dict | None) -> str:
         return f"Failed to run {tool_name}: {exc}"
 
 
-async def _run_internal_tool(tool_id: str, args: dict | None) -> str:
+async def _run_internal_tool(tool_id: str, args: dict | None, images: list[dict]) -> str:
     if tool_id == "internal.image":
-        return await _run_internal_image_tool(args or {})
+        return await _run_internal_image_tool(args or {}, images)
     return f"Unknown internal tool: {tool_id}"
 
 
-async def _run_internal_image_tool(args: dict) -> str:
+async def _run_internal_image_tool(args: dict, images: list[dict]) -> str:
     prompt = (args.get("prompt") or "").strip()
     if not prompt:
         return "Image generation failed: prompt is required."
     size = args.get("size") or "1024x1024"
     client = _get_client()
     try:
-        response = await client.images.generate(
-            model="gpt-image-1",
-            prompt=prompt,
-            size=size,
-        )
+        async with rate_limiter.request("gpt-image-1", rate_limiter.estimate_tokens(prompt)) as permit:
+            response = await permit.send(
+                lambda: client.images.generate(
+                    model="gpt-image-1",
+                    prompt=prompt,
+                    size=size,
+                )
+            )
         data = response.data[0] if getattr(response, "data", None) else None
         b64_content = getattr(data, "b64_json", None) if data else None
         url = getattr(data, "url", None) if data else None
         if b64_content:
             meta = image_store.save_image_from_base64(b64_content)
-            # Store image info for later event emission
-            _store_agent_image_result(meta.url_path, prompt, size)
+            # Reported to the caller, which emits the image event
+            images.append({"url_path": meta.url_path, "prompt": prompt, "size": size})
             # Return just text description, not markdown (event will handle the image)
             return f"Image generated successfully with prompt: {prompt}"
         if url:
@@ -661,25 +1004,6 @@ async def _run_internal_image_tool(args: dict) -> str:
         return f"Image generation failed: {exc}"
 
 
-# Global storage for agent mode image results
-_agent_image_results: list[dict] = []
-
-def _store_agent_image_result(url_path: str, prompt: str, size: str):
-    """Store image result for agent mode to emit as image_call event."""
-    _agent_image_results.append({
-        "url_path": url_path,
-        "prompt": prompt,
-        "size": size
-    })
-
-def _get_and_clear_agent_image_results() -> list[dict]:
-    """Get and clear stored image results."""
-    global _agent_image_results
-    results = _agent_image_results.copy()
-    _agent_image_results.clear()
-    return results
-
-
 def _parse_tool_args(raw_args: Any) -> dict:
     if isinstance(raw_args, dict):
         return raw_args
@@ -721,12 +1045,6 @@ def _unwrap_tool_result(raw: str) -> list[dict[str, Any]]:
     return []
 
 
-def _yield_text_chunks(text: str, chunk_size: int = 200) -> List[str]:
-    if not text:
-        return []
-    return [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
-
-
 def _safe_tool_name(full_name: str, used: set[str]) -> str:
     """Generate an OpenAI-compliant tool name and keep a reverse map."""
     base = re.sub(r"[^a-zA-Z0-9_-]", "_", full_name) or "tool"
@@ -759,24 +1077,59 @@ def _extract_text_output(response) -> str:
     return ""
 
 
-async def complete_response(messages: List[dict], model: str) -> str:
-    """Return a full assistant response using the Responses API."""
+async def complete_response(messages: List[dict], model: str, *, cache_site: str | None = None) -> str:
+    """Return a full assistant response using the Responses API.
+
+    Auxiliary call sites pass ``cache_site`` to go through the opt-in
+    response cache (``services/response_cache.py``); failures are not cached.
+    Identical concurrent calls share one request.
+    """
+    if cache_site and response_cache.enabled():
+        key, cached = response_cache.lookup(cache_site, model, messages)
+        if cached is not None:
+            return cached
+        content = await _coalesced_completion(messages, model)
+        if content and content not in FAILED_COMPLETIONS:
+            response_cache.store(cache_site, key, content)
+        return content
+    return await _coalesced_completion(messages, model)
+
+
+def coalesce_stats() -> dict[str, Any]:
+    """Completions requested vs. shared with an identical one in flight."""
+    return _inflight.stats()
+
+
+async def _coalesced_completion(messages: List[dict], model: str) -> str:
+    formatted_messages = _format_input(messages)
+    key = (model, json.dumps(formatted_messages, ensure_ascii=False, default=str))
+    return await _inflight.do(
+        "completion", key, lambda: _complete(formatted_messages, model)
+    )
+
 
+async def _complete(formatted_messages: List[dict], model: str) -> str:
     client = _get_client()
     started = time.time()
-    formatted_messages = _format_input(messages)
 
     try:
-        response = await client.responses.create(
-            model=model,
-            input=formatted_messages,
-        )
+        async with rate_limiter.request(model, rate_limiter.estimate_tokens(formatted_messages)) as permit:
+            response = await permit.send(
+                lambda: client.responses.create(
+                    model=model,
+                    input=formatted_messages,
+                )
+            )
+            permit.settle(_used_tokens(_record_usage(model, getattr(response, "usage", None))))
         content = _extract_text_output(response)
         elapsed = time.time() - started
         logger.info(
             "Model %s completed %s chars in %.2fs", model, len(content), elapsed
         )
         return content or ""
+    except rate_limiter.RateLimited as exc:
+        logger.warning("Completion not sent: %s", exc)
+        return "Error generating response"
     except OpenAIError as exc:
         logger.exception("Responses API error: %s", exc)
         return "Error generating response"
@@ -0,0 +1,212 @@
+"""Cached tool listings per MCP server.
+
+Listing tools is an MCP round trip (and, for a cold stdio server, a process
+start), yet the catalog is needed on every Toolbox request and every agent
+turn. Entries are keyed on the server definition and the ``mcp.json`` mtime,
+are fresh for ``ttl`` seconds and are then served stale for up to ``max_stale``
+seconds while a task on the shared background loop re-lists the server.
+Concurrent misses for one server share a single listing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+from parlanchina.services.background_loop import BackgroundLoop
+from parlanchina.services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    config: Any
+    generation: Hashable
+    tools: list[Any]
+    by_name: dict[str, Any]
+    fetched_at: float
+    expires_at: float
+    refreshing: bool = False
+    error: str | None = None
+
+
+@dataclass
+class _Counters:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+    errors: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(self.__dict__)
+
+
+def _matches(entry: _Entry | None, config: Any, generation: Hashable) -> bool:
+    return entry is not None and entry.config == config and entry.generation == generation
+
+
+class ToolCatalog:
+    def __init__(
+        self,
+        fetch: Callable[[Any], Awaitable[list[Any]]],
+        *,
+        loop: BackgroundLoop,
+        ttl: float = 300.0,
+        max_stale: float = 3600.0,
+    ) -> None:
+        self._fetch = fetch
+        self._loop = loop
+        self.ttl = max(0.0, ttl)
+        self.max_stale = max(0.0, max_stale)
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        # One fetch per server at a time; concurrent misses wait for it.
+        self._inflight = SingleFlight()
+        self._loading: set[asyncio.Future] = set()
+        self._counters: dict[str, _Counters] = {}
+
+    # Lookups --------------------------------------------------------------
+
+    def tools(self, config: Any, generation: Hashable) -> list[Any]:
+        """Tool summaries of ``config``; blocks only when nothing usable is cached."""
+        entry = self._usable(config, generation)
+        if entry is None:
+            entry = self._load(config, generation)
+        return entry.tools
+
+    async def tools_async(self, config: Any, generation: Hashable) -> list[Any]:
+        entry = self._usable(config, generation)
+        if entry is None:
+            entry = await self._load_async(config, generation)
+        return entry.tools
+
+    def tool(self, config: Any, generation: Hashable, tool_name: str) -> Any | None:
+        entry = self._usable(config, generation) or self._load(config, generation)
+        return entry.by_name.get(tool_name)
+
+    async def tool_async(self, config: Any, generation: Hashable, tool_name: str) -> Any | None:
+        entry = self._usable(config, generation)
+        if entry is None:
+            entry = await self._load_async(config, generation)
+        return entry.by_name.get(tool_name)
+
+    def _usable(self, config: Any, generation: Hashable) -> _Entry | None:
+        """Return a cached entry that may be served, scheduling a refresh if stale."""
+        name = config.name
+        now = time.monotonic()
+        with self._lock:
+            counters = self._counters.setdefault(name, _Counters())
+            entry = self._entries.get(name)
+            if self.ttl == 0 or not _matches(entry, config, generation):
+                counters.misses += 1
+                return None
+            if now < entry.expires_at:
+                counters.hits += 1
+                return entry
+            if now >= entry.expires_at + self.max_stale:
+                counters.misses += 1
+                return None
+            counters.stale_hits += 1
+            if entry.refreshing:
+                return entry
+            entry.refreshing = True
+        try:
+            self._loop.submit(self._refresh(config, generation))
+        except RuntimeError:
+            # Loop shut down: keep serving the stale listing.
+            with self._lock:
+                entry.refreshing = False
+        return entry
+
+    # Loading --------------------------------------------------------------
+
+    def _load(self, config: Any, generation: Hashable) -> _Entry:
+        return self._loop.run(self._load_async(config, generation))
+
+    async def _load_async(self, config: Any, generation: Hashable) -> _Entry:
+        # Shielded: a caller that gives up (list timeout) leaves the listing
+        # running, so a slow server still ends up in the cache.
+        task = asyncio.ensure_future(
+            self._inflight.do(
+                "list_tools", (config.name, generation), lambda: self._fetch_entry(config, generation)
+            )
+        )
+        self._loading.add(task)
+        task.add_done_callback(self._loading.discard)
+        return await asyncio.shield(task)
+
+    async def _fetch_entry(self, config: Any, generation: Hashable) -> _Entry:
+        return self._store(config, generation, await self._fetch(config))
+
+    async def _refresh(self, config: Any, generation: Hashable) -> None:
+        name = config.name
+        try:
+            await self._load_async(config, generation)
+        except Exception as exc:
+            logger.warning("Background refresh of MCP tools for %s failed: %s", name, exc)
+            with self._lock:
+                self._counters.setdefault(name, _Counters()).errors += 1
+                entry = self._entries.get(name)
+                if entry is not None:
+                    # Keep serving the old listing; try again after a pause.
+                    entry.error = str(exc)
+                    entry.expires_at = time.monotonic() + min(self.ttl, 30.0)
+        else:
+            with self._lock:
+                self._counters.setdefault(name, _Counters()).refreshes += 1
+        finally:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    entry.refreshing = False
+
+    def _store(self, config: Any, generation: Hashable, tools: list[Any]) -> _Entry:
+        now = time.monotonic()
+        entry = _Entry(
+            config=config,
+            generation=generation,
+            tools=list(tools),
+            by_name={tool.name: tool for tool in tools},
+            fetched_at=now,
+            expires_at=now + self.ttl,
+        )
+        with self._lock:
+            self._entries[config.name] = entry
+        return entry
+
+    # Maintenance ----------------------------------------------------------
+
+    def invalidate(self, server_name: str | None = None) -> None:
+        with self._lock:
+            if server_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(server_name, None)
+
+    def retain(self, server_names: list[str]) -> None:
+        """Forget servers that are no longer configured."""
+        keep = set(server_names)
+        with self._lock:
+            for name in list(self._entries):
+                if name not in keep:
+                    del self._entries[name]
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            result: dict[str, Any] = {}
+            for name, counters in self._counters.items():
+                entry = self._entries.get(name)
+                result[name] = {
+                    **counters.as_dict(),
+                    "tools": len(entry.tools) if entry else 0,
+                    "age": round(now - entry.fetched_at, 1) if entry else None,
+                    "error": entry.error if entry else None,
+                }
+            return result
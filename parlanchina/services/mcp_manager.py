@@ -1,16 +1,24 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
 import importlib
 import json
 import logging
+import threading
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Optional
 
 from flask import current_app
 
+from parlanchina.config import get_float_setting, get_int_setting
 from parlanchina.paths import detect_mode, get_app_root
+from parlanchina.services import background_loop
+from parlanchina.services.mcp_catalog import ToolCatalog
+from parlanchina.services.mcp_pool import MCPClientPool
+from parlanchina.services.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +49,16 @@ class MCPToolSummary:
     name: str
     description: str
     input_schema: dict | None
+    read_only: bool = False
+
+
+@dataclass
+class MCPServerStatus:
+    name: str
+    ok: bool
+    tool_count: int = 0
+    elapsed_ms: float = 0.0
+    error: str | None = None
 
 
 @dataclass
@@ -66,6 +84,8 @@ class _ServerConfig:
     name: str
     description: str | None
     transport: _TransportConfig
+    # Tools to treat as read-only even if the server does not annotate them.
+    read_only_tools: frozenset[str] = frozenset()
 
 
 CONFIG_FILENAME = "mcp.json"
@@ -75,6 +95,77 @@ _servers: dict[str, _ServerConfig] = {}
 _config_path: Path | None = None
 _config_mtime: float | None = None
 
+_pool: MCPClientPool | None = None
+_pool_lock = threading.Lock()
+_catalog: ToolCatalog | None = None
+_inflight = SingleFlight()
+
+
+def _get_pool() -> MCPClientPool:
+    """Return the process-wide pool of warm MCP client connections."""
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = MCPClientPool(
+                _new_client,
+                size=get_int_setting("PARLANCHINA_MCP_POOL_SIZE", 1),
+                concurrency=get_int_setting("PARLANCHINA_MCP_MAX_CONCURRENCY", 4),
+                idle_timeout=get_float_setting("PARLANCHINA_MCP_IDLE_TIMEOUT", 300.0),
+                health_interval=get_float_setting("PARLANCHINA_MCP_HEALTH_INTERVAL", 30.0),
+                connect_timeout=get_float_setting("PARLANCHINA_MCP_CONNECT_TIMEOUT", 60.0),
+                loop=background_loop.get_loop(),
+            )
+            atexit.register(shutdown)
+        return _pool
+
+
+def _get_catalog() -> ToolCatalog:
+    """Return the process-wide cache of per-server tool listings."""
+    global _catalog
+    if _catalog is not None:
+        return _catalog
+    with _pool_lock:
+        if _catalog is None:
+            _catalog = ToolCatalog(
+                _list_tools,
+                loop=background_loop.get_loop(),
+                ttl=get_float_setting("PARLANCHINA_MCP_TOOLS_TTL", 300.0),
+                max_stale=get_float_setting("PARLANCHINA_MCP_TOOLS_MAX_STALE", 3600.0),
+            )
+        return _catalog
+
+
+def refresh_tools(server_name: str | None = None) -> None:
+    """Drop cached tool listings so the next lookup asks the server again."""
+    if _catalog is not None:
+        _catalog.invalidate(server_name)
+
+
+def catalog_stats() -> dict[str, Any]:
+    """Per-server hit/miss counters of the tool catalog cache."""
+    return _catalog.stats() if _catalog is not None else {}
+
+
+def shutdown() -> None:
+    """Close pooled MCP connections (stops stdio server processes)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def pool_stats() -> dict[str, Any]:
+    """Per-server connection counters of the MCP client pool."""
+    return _pool.stats() if _pool is not None else {}
+
+
+def coalesce_stats() -> dict[str, Any]:
+    """Read-only tool calls made vs. shared with an identical call in flight."""
+    return _inflight.stats()
+
 
 def _determine_config_directory() -> Path:
     try:
@@ -122,6 +213,7 @@ def _load_config_from_file(path: Path) -> tuple[dict[str, _ServerConfig], str |
             entry: dict[str, Any] = {"name": name}
             if isinstance(server_cfg.get("description"), str):
                 entry["description"] = server_cfg["description"]
+            entry["readOnlyTools"] = server_cfg.get("readOnlyTools")
             entry["transport"] = server_cfg.get("transport") or {
                 "type": server_cfg.get("type", "stdio"),
                 "command": server_cfg.get("command"),
@@ -137,6 +229,7 @@ def _load_config_from_file(path: Path) -> tuple[dict[str, _ServerConfig], str |
         servers_blob = [
             {
                 "name": name,
+                "readOnlyTools": server_cfg.get("readOnlyTools"),
                 "transport": {
                     "type": server_cfg.get("type", "stdio"),
                     "command": server_cfg.get("command"),
@@ -183,6 +276,10 @@ def _ensure_servers_loaded() -> None:
     _servers, _config_error = _load_config_from_file(path)
     if _config_error:
         logger.warning("MCP configuration issue: %s", _config_error)
+    if _pool is not None:
+        _pool.retain(list(_servers.values()))
+    if _catalog is not None:
+        _catalog.retain(list(_servers))
 
 
 def _parse_server(entry: dict[str, Any]) -> Optional[_ServerConfig]:
@@ -200,6 +297,7 @@ def _parse_server(entry: dict[str, Any]) -> Optional[_ServerConfig]:
             "headers": entry.get("headers"),
         }
     description = entry.get("description") if isinstance(entry.get("description"), str) else None
+    read_only = entry.get("readOnlyTools") if isinstance(entry.get("readOnlyTools"), list) else []
 
     if not isinstance(name, str) or not isinstance(transport, dict):
         return None
@@ -233,7 +331,12 @@ def _parse_server(entry: dict[str, Any]) -> Optional[_ServerConfig]:
             headers={k: str(v) for k, v in headers.items()} if headers else None,
         )
 
-    return _ServerConfig(name=name, description=description, transport=transport_cfg)
+    return _ServerConfig(
+        name=name,
+        description=description,
+        transport=transport_cfg,
+        read_only_tools=frozenset(str(tool) for tool in read_only),
+    )
 
 
 def is_enabled() -> bool:
@@ -270,7 +373,7 @@ def list_tools(server_name: str) -> list[MCPToolSummary]:
     try:
         asyncio.get_running_loop()
     except RuntimeError:
-        return asyncio.run(_list_tools_async(server))
+        return _get_catalog().tools(server, _config_mtime)
     else:
         raise RuntimeError("list_tools cannot be called from a running event loop; use list_tools_async")
 
@@ -282,75 +385,111 @@ async def list_tools_async(server_name: str) -> list[MCPToolSummary]:
         raise ValueError(f"Unknown MCP server: {server_name}")
     if not is_enabled():
         return []
-    return await _list_tools_async(server)
+    return await _get_catalog().tools_async(server, _config_mtime)
+
+
+def _tool_entries(server_name: str, tools: list[MCPToolSummary]) -> list[dict[str, Any]]:
+    return [
+        {
+            "server": server_name,
+            "name": tool.name,
+            "id": f"{server_name}.{tool.name}",
+            "description": tool.description,
+            "input_schema": tool.input_schema,
+        }
+        for tool in tools
+    ]
 
 
 def list_all_tools() -> list[dict[str, Any]]:
-    """Return flattened tools across all servers with stable ids."""
+    """Return flattened tools across all servers with stable ids.
+
+    Servers are listed concurrently; those that fail or time out are logged
+    and left out (use ``list_all_tools_async`` to get their status).
+    """
+    tools, _ = background_loop.run(list_all_tools_async())
+    return tools
+
+
+async def list_all_tools_async(
+    timeout: float | None = None,
+) -> tuple[list[dict[str, Any]], list[MCPServerStatus]]:
+    """List every server concurrently, each bounded by ``timeout`` seconds.
+
+    Returns the tools of the servers that answered plus one status per
+    configured server, so one slow or broken server does not hide the rest.
+    """
     _ensure_servers_loaded()
-    tools: list[dict[str, Any]] = []
     if not is_enabled():
-        return tools
-    for server_name in _servers:
-        for tool in list_tools(server_name):
-            tools.append(
-                {
-                    "server": server_name,
-                    "name": tool.name,
-                    "id": f"{server_name}.{tool.name}",
-                    "description": tool.description,
-                    "input_schema": tool.input_schema,
-                }
-            )
-    return tools
+        return [], []
+    if timeout is None:
+        timeout = get_float_setting("PARLANCHINA_MCP_LIST_TIMEOUT", 15.0)
+    catalog = _get_catalog()
+    generation = _config_mtime
+
+    async def _one(server: _ServerConfig) -> tuple[list[MCPToolSummary], MCPServerStatus]:
+        started = time.perf_counter()
+        try:
+            tools = await asyncio.wait_for(catalog.tools_async(server, generation), timeout)
+        except Exception as exc:
+            error = f"timed out after {timeout:g}s" if isinstance(exc, TimeoutError) else str(exc)
+            logger.warning("Listing tools of MCP server %s failed: %s", server.name, error)
+            status = MCPServerStatus(server.name, ok=False, error=error or type(exc).__name__)
+            tools = []
+        else:
+            status = MCPServerStatus(server.name, ok=True, tool_count=len(tools))
+        status.elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        return tools, status
+
+    servers = list(_servers.values())
+    results = await asyncio.gather(*(_one(server) for server in servers))
+    tools: list[dict[str, Any]] = []
+    for server, (summaries, _) in zip(servers, results):
+        tools.extend(_tool_entries(server.name, summaries))
+    return tools, [status for _, status in results]
 
 
-def get_tool_definition(tool_id: str) -> Optional[dict[str, Any]]:
-    """Map a tool id like 'server.tool' to its full definition."""
+def _split_tool_id(tool_id: str) -> tuple[_ServerConfig, str] | None:
     _ensure_servers_loaded()
-    if "." not in tool_id:
+    if "." not in tool_id or not is_enabled():
         return None
     server_name, tool_name = tool_id.split(".", 1)
-    try:
-        tools = list_tools(server_name)
-    except ValueError:
+    server = _servers.get(server_name)
+    if server is None:
         return None
+    return server, tool_name
 
-    for tool in tools:
-        if tool.name == tool_name:
-            return {
-                "server": server_name,
-                "name": tool.name,
-                "id": tool_id,
-                "full_name": f"{server_name}.{tool.name}",
-                "description": tool.description,
-                "parameters": tool.input_schema or {"type": "object", "properties": {}},
-            }
-    return None
+
+def _tool_definition(server: _ServerConfig, tool: MCPToolSummary | None) -> Optional[dict[str, Any]]:
+    if tool is None:
+        return None
+    return {
+        "server": server.name,
+        "name": tool.name,
+        "id": f"{server.name}.{tool.name}",
+        "full_name": f"{server.name}.{tool.name}",
+        "description": tool.description,
+        "parameters": tool.input_schema or {"type": "object", "properties": {}},
+    }
+
+
+def get_tool_definition(tool_id: str) -> Optional[dict[str, Any]]:
+    """Map a tool id like 'server.tool' to its full definition."""
+    parts = _split_tool_id(tool_id)
+    if parts is None:
+        return None
+    server, tool_name = parts
+    return _tool_definition(server, _get_catalog().tool(server, _config_mtime, tool_name))
 
 
 async def get_tool_definition_async(tool_id: str) -> Optional[dict[str, Any]]:
     """Async variant for contexts that already run an event loop."""
-    _ensure_servers_loaded()
-    if "." not in tool_id:
-        return None
-    server_name, tool_name = tool_id.split(".", 1)
-    try:
-        tools = await list_tools_async(server_name)
-    except ValueError:
+    parts = _split_tool_id(tool_id)
+    if parts is None:
         return None
-
-    for tool in tools:
-        if tool.name == tool_name:
-            return {
-                "server": server_name,
-                "name": tool.name,
-                "id": tool_id,
-                "full_name": f"{server_name}.{tool.name}",
-                "description": tool.description,
-                "parameters": tool.input_schema or {"type": "object", "properties": {}},
-            }
-    return None
+    server, tool_name = parts
+    tool = await _get_catalog().tool_async(server, _config_mtime, tool_name)
+    return _tool_definition(server, tool)
 
 
 def call_tool(server_name: str, tool_name: str, args: dict[str, Any]) -> MCPToolResult:
@@ -366,7 +505,8 @@ def call_tool(server_name: str, tool_name: str, args: dict[str, Any]) -> MCPTool
             display_text="MCP is disabled because fastmcp is not installed or no servers are configured.",
         )
     try:
-        return asyncio.run(_call_tool_async(server, tool_name, args or {}))
+        result = _get_pool().run(server, _tool_call(tool_name, args or {}))
+        return _tool_result(server, tool_name, result)
     except Exception as exc:  # pragma: no cover - defensive logging for unexpected errors
         logger.exception("Error calling MCP tool %s on %s", tool_name, server_name)
         return MCPToolResult(
@@ -389,8 +529,15 @@ async def call_tool_async(server_name: str, tool_name: str, args: dict[str, Any]
             raw_result=None,
             display_text="MCP is disabled because fastmcp is not installed or no servers are configured.",
         )
+    args = args or {}
     try:
-        return await _call_tool_async(server, tool_name, args or {})
+        if await _is_read_only(server, tool_name):
+            # Identical concurrent calls of a read-only tool share one round trip.
+            key = (server.name, tool_name, json.dumps(_safe_json(args), sort_keys=True))
+            return await _inflight.do(
+                "read_only_tool", key, lambda: _call_tool_async(server, tool_name, args)
+            )
+        return await _call_tool_async(server, tool_name, args)
     except Exception as exc:  # pragma: no cover - defensive logging for unexpected errors
         logger.exception("Error calling MCP tool %s on %s", tool_name, server_name)
         return MCPToolResult(
@@ -401,29 +548,66 @@ async def call_tool_async(server_name: str, tool_name: str, args: dict[str, Any]
         )
 
 
-async def _list_tools_async(server: _ServerConfig) -> list[MCPToolSummary]:
+async def _is_read_only(server: _ServerConfig, tool_name: str) -> bool:
+    if tool_name in server.read_only_tools:
+        return True
+    try:
+        tool = await _get_catalog().tool_async(server, _config_mtime, tool_name)
+    except Exception:
+        return False
+    return bool(tool and tool.read_only)
+
+
+def _new_client(server: _ServerConfig):
     transport = _build_transport(server.transport)
-    async with Client(transport=transport, name=f"parlanchina-{server.name}") as client:  # type: ignore[arg-type]
-        tools = await client.list_tools()
-        summaries: list[MCPToolSummary] = []
-        for tool in tools:
-            description = tool.description or tool.title or ""
-            input_schema = _extract_schema(tool)
-            summaries.append(
-                MCPToolSummary(
-                    name=tool.name,
-                    description=description,
-                    input_schema=input_schema,
-                )
+    return Client(transport=transport, name=f"parlanchina-{server.name}")  # type: ignore[misc]
+
+
+async def _fetch_tools(client: Any) -> list[MCPToolSummary]:
+    tools = await client.list_tools()
+    summaries: list[MCPToolSummary] = []
+    for tool in tools:
+        description = tool.description or tool.title or ""
+        input_schema = _extract_schema(tool)
+        annotations = getattr(tool, "annotations", None)
+        summaries.append(
+            MCPToolSummary(
+                name=tool.name,
+                description=description,
+                input_schema=input_schema,
+                read_only=_read_only_hint(annotations),
             )
-        return summaries
+        )
+    return summaries
+
+
+def _read_only_hint(annotations: Any) -> bool:
+    # Field name differs between versions of the mcp package.
+    hint = getattr(annotations, "read_only_hint", None)
+    if hint is None:
+        hint = getattr(annotations, "readOnlyHint", None)
+    return bool(hint)
+
+
+async def _list_tools(server: _ServerConfig) -> list[MCPToolSummary]:
+    timeout = get_float_setting("PARLANCHINA_MCP_CONNECT_TIMEOUT", 60.0)
+    return await _get_pool().run_async(server, _fetch_tools, retry=True, timeout=timeout)
+
+
+def _tool_call(tool_name: str, args: dict[str, Any]):
+    # Never retried: a tool call may have side effects on the server.
+    async def _call(client: Any) -> Any:
+        return await client.call_tool(tool_name, arguments=args, raise_on_error=False)
+
+    return _call
 
 
 async def _call_tool_async(server: _ServerConfig, tool_name: str, args: dict[str, Any]) -> MCPToolResult:
-    transport = _build_transport(server.transport)
-    async with Client(transport=transport, name=f"parlanchina-{server.name}") as client:  # type: ignore[arg-type]
-        result = await client.call_tool(tool_name, arguments=args, raise_on_error=False)
+    result = await _get_pool().run_async(server, _tool_call(tool_name, args))
+    return _tool_result(server, tool_name, result)
+
 
+def _tool_result(server: _ServerConfig, tool_name: str, result: Any) -> MCPToolResult:
     display = _format_result_text(server.name, tool_name, result)
     return MCPToolResult(
         server_name=server.name,
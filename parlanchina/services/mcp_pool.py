@@ -0,0 +1,395 @@
+"""Long-lived MCP client connections shared across requests.
+
+Opening a fastmcp ``Client`` means launching the server process (stdio) or
+connecting (SSE) and running the MCP handshake, so connections are kept warm
+per configured server and reused by every listing and tool call.
+
+Clients are bound to the event loop that opened them while callers come from
+Flask worker threads and other loops, so all of a pool's connections live on
+one ``BackgroundLoop`` (the shared one from ``services.background_loop`` when
+passed in, else a private one); operations are scheduled on it and awaited
+from the caller's side.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, TypeVar
+
+from parlanchina.services.background_loop import BackgroundLoop
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Connection:
+    """One open client; its context is entered and exited by a single task."""
+
+    def __init__(self, client: Any) -> None:
+        self.client = client
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.broken = False
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error: Exception | None = None
+        self._task: asyncio.Task | None = None
+
+    async def open(self, timeout: float) -> None:
+        self._task = asyncio.create_task(self._hold())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise TimeoutError(f"MCP server did not connect within {timeout:g}s") from None
+        except asyncio.CancelledError:
+            await self.close()
+            raise
+        if self._error is not None:
+            raise self._error
+
+    async def _hold(self) -> None:
+        try:
+            async with self.client:
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as exc:
+            self._error = exc
+        finally:
+            self.broken = True
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        if self.broken:
+            return False
+        try:
+            return bool(self.client.is_connected())
+        except Exception:
+            return False
+
+    async def healthy(self, timeout: float = 5.0) -> bool:
+        """Ping the server; ``is_connected`` lags behind a crashed stdio process."""
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.client.ping(), timeout)
+        except Exception:
+            return False
+        return True
+
+    async def close(self) -> None:
+        self.broken = True
+        self._stop.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._task, 10)
+        except (asyncio.TimeoutError, Exception):
+            self._task.cancel()
+
+
+class _ServerPool:
+    def __init__(
+        self,
+        config: Any,
+        connect: Callable[[Any], Any],
+        *,
+        size: int,
+        concurrency: int,
+        idle_timeout: float,
+        connect_timeout: float,
+    ) -> None:
+        self.config = config
+        self._connect = connect
+        self.size = max(1, size)
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._lock = asyncio.Lock()
+        # Signalled when a connection being opened outside the lock settles.
+        self._settled = asyncio.Condition(self._lock)
+        self._connections: list[_Connection] = []
+        self._opening = 0
+        self._closed = False
+        self.counters = {"connects": 0, "calls": 0, "errors": 0, "dropped": 0}
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[_Connection]:
+        """Borrow a live connection; at most ``concurrency`` borrowers at a time."""
+        async with self._semaphore:
+            conn = await self._checkout()
+            self.counters["calls"] += 1
+            try:
+                yield conn
+            except Exception:
+                self.counters["errors"] += 1
+                if not await conn.healthy():
+                    conn.broken = True
+                raise
+            finally:
+                conn.in_flight -= 1
+                conn.last_used = time.monotonic()
+
+    async def _checkout(self) -> _Connection:
+        """Reuse a connection or reserve a slot, then connect without holding the lock."""
+        doomed: list[_Connection] = []
+        async with self._lock:
+            while True:
+                doomed += self._drop(lambda c: not c.alive)
+                best = min(self._connections, key=lambda c: c.in_flight, default=None)
+                room = len(self._connections) + self._opening < self.size
+                if best is not None and (not best.in_flight or not room):
+                    best.in_flight += 1
+                    break
+                if room:
+                    best = None
+                    self._opening += 1
+                    break
+                # Every slot is still connecting: wait for one rather than exceed the size.
+                await self._settled.wait()
+        await _close_all(doomed)
+        if best is not None:
+            return best
+
+        conn = _Connection(self._connect(self.config))
+        try:
+            await conn.open(self.connect_timeout)
+        except BaseException:
+            async with self._lock:
+                self._opening -= 1
+                self._settled.notify_all()
+            raise
+        async with self._lock:
+            self._opening -= 1
+            self._settled.notify_all()
+            closed = self._closed
+            if not closed:
+                self.counters["connects"] += 1
+                conn.in_flight += 1
+                self._connections.append(conn)
+        if closed:
+            await conn.close()
+            raise RuntimeError(f"MCP pool for {_name(self.config)} is closed")
+        return conn
+
+    def _drop(self, predicate: Callable[[_Connection], bool]) -> list[_Connection]:
+        """Unregister idle connections matching ``predicate``; the caller closes them."""
+        doomed = [c for c in self._connections if c.in_flight == 0 and predicate(c)]
+        for conn in doomed:
+            self._connections.remove(conn)
+            self.counters["dropped"] += 1
+        return doomed
+
+    async def maintain(self) -> None:
+        """Close idle or dead connections and ping the rest."""
+        now = time.monotonic()
+        async with self._lock:
+            doomed = self._drop(lambda c: not c.alive or now - c.last_used > self.idle_timeout)
+            idle = [c for c in self._connections if c.in_flight == 0]
+        await _close_all(doomed)
+        for conn in idle:
+            if not await conn.healthy(10):
+                logger.warning(
+                    "MCP server %s failed a health check; reconnecting on next use",
+                    _name(self.config),
+                )
+                conn.broken = True
+        async with self._lock:
+            doomed = self._drop(lambda c: not c.alive)
+        await _close_all(doomed)
+
+    async def close(self) -> None:
+        async with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            await conn.close()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connections": len(self._connections),
+            "opening": self._opening,
+            "in_flight": sum(c.in_flight for c in self._connections),
+            **self.counters,
+        }
+
+
+async def _close_all(connections: list[_Connection]) -> None:
+    for conn in connections:
+        await conn.close()
+
+
+def _name(config: Any) -> str:
+    return str(getattr(config, "name", config))
+
+
+class MCPClientPool:
+    """Per-server connection pools living on one background event loop."""
+
+    def __init__(
+        self,
+        connect: Callable[[Any], Any],
+        *,
+        size: int = 1,
+        concurrency: int = 4,
+        idle_timeout: float = 300.0,
+        health_interval: float = 30.0,
+        connect_timeout: float = 60.0,
+        loop: BackgroundLoop | None = None,
+    ) -> None:
+        self._connect = connect
+        self._options = {
+            "size": size,
+            "concurrency": concurrency,
+            "idle_timeout": idle_timeout,
+            "connect_timeout": connect_timeout,
+        }
+        self.health_interval = health_interval
+        self._pools: dict[Hashable, _ServerPool] = {}
+        self._closed = False
+        # Tasks started by the pool; on a shared loop, close() cancels only these.
+        self._tasks: set[asyncio.Task] = set()
+        self._owns_loop = loop is None
+        self._background = loop or BackgroundLoop("parlanchina-mcp")
+        self._loop = self._background.loop
+        if health_interval > 0:
+            self._submit(self._maintain_forever())
+
+    # Scheduling -----------------------------------------------------------
+
+    def _submit(self, coro: Awaitable[T]) -> concurrent.futures.Future:
+        return self._background.submit(self._tracked(coro))
+
+    async def _tracked(self, coro: Awaitable[T]) -> T:
+        task = asyncio.current_task()
+        self._tasks.add(task)  # type: ignore[arg-type]
+        try:
+            return await coro
+        finally:
+            self._tasks.discard(task)  # type: ignore[arg-type]
+
+    def run(
+        self,
+        config: Any,
+        operation: Callable[[Any], Awaitable[T]],
+        *,
+        retry: bool = False,
+        timeout: float | None = None,
+    ) -> T:
+        """Run ``operation(client)`` for ``config`` and block until it finishes.
+
+        ``timeout`` bounds the operation itself, not the wait for a connection.
+        """
+        if self._background.in_loop():
+            raise RuntimeError("MCPClientPool.run would block its own loop; use run_async")
+        return self._submit(self._run(config, operation, retry, timeout)).result()
+
+    async def run_async(
+        self,
+        config: Any,
+        operation: Callable[[Any], Awaitable[T]],
+        *,
+        retry: bool = False,
+        timeout: float | None = None,
+    ) -> T:
+        """Awaitable variant usable from any event loop."""
+        coro = self._run(config, operation, retry, timeout)
+        if asyncio.get_running_loop() is self._loop:
+            # Own task so close() can release this caller too.
+            return await asyncio.ensure_future(self._tracked(coro))
+        return await asyncio.wrap_future(self._submit(coro))
+
+    async def _run(
+        self,
+        config: Any,
+        operation: Callable[[Any], Awaitable[T]],
+        retry: bool,
+        timeout: float | None,
+    ) -> T:
+        if self._closed:
+            raise RuntimeError("MCP client pool is shut down")
+        while True:
+            conn: _Connection | None = None
+            try:
+                async with self._pool_for(config).connection() as conn:
+                    return await asyncio.wait_for(operation(conn.client), timeout)
+            except Exception:
+                # Retry once on a fresh connection when the server died under
+                # us. Tool errors come back as results and never get here.
+                if retry and conn is not None and conn.broken:
+                    logger.info("Reconnecting to MCP server %s", _name(config))
+                    retry = False
+                    continue
+                raise
+
+    def _pool_for(self, config: Any) -> _ServerPool:
+        key = _name(config)
+        pool = self._pools.get(key)
+        if pool is not None and pool.config != config:
+            # Server definition changed in mcp.json: retire the old connections.
+            asyncio.ensure_future(pool.close())
+            pool = None
+        if pool is None:
+            pool = self._pools[key] = _ServerPool(config, self._connect, **self._options)
+        return pool
+
+    # Lifecycle ------------------------------------------------------------
+
+    def retain(self, configs: list[Any]) -> None:
+        """Close pools for servers that are no longer configured (or changed)."""
+        wanted = {_name(c): c for c in configs}
+
+        async def _retain() -> None:
+            for key, pool in list(self._pools.items()):
+                if wanted.get(key) != pool.config:
+                    del self._pools[key]
+                    await pool.close()
+
+        if not self._closed:
+            self._submit(_retain())
+
+    async def _maintain_forever(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.health_interval)
+            for pool in list(self._pools.values()):
+                try:
+                    await pool.maintain()
+                except Exception:  # pragma: no cover - background safety
+                    logger.exception("MCP pool maintenance failed for %s", _name(pool.config))
+
+    def stats(self) -> dict[str, Any]:
+        return {key: pool.stats() for key, pool in self._pools.items()}
+
+    def close(self, timeout: float = 15.0) -> None:
+        """Disconnect every client (stopping stdio servers).
+
+        A private loop is stopped as well; a shared one keeps running.
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        async def _close_all() -> None:
+            pools, self._pools = list(self._pools.values()), {}
+            await asyncio.gather(*(pool.close() for pool in pools), return_exceptions=True)
+            # Fail whatever is still running (e.g. a connect in progress) so
+            # threads blocked in run() are released instead of waiting forever.
+            pending = [t for t in self._tasks if t is not asyncio.current_task()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if not self._background.running:
+            return
+        try:
+            self._background.submit(_close_all()).result(timeout)
+        except Exception:
+            logger.warning("Timed out closing MCP connections")
+        if self._owns_loop:
+            self._background.close(timeout)
@@ -0,0 +1,432 @@
+"""Client-side rate limiting and adaptive concurrency per model.
+
+Every OpenAI request goes through the limiter of its model:
+
+- two token buckets, requests per minute (``rpm``) and tokens per minute
+  (``tpm``, estimated from the prompt size and corrected with the reported
+  usage), keep the request rate under the provider quota,
+- an AIMD concurrency limit grows by about one per round of successful
+  requests and is halved on 429 and 5xx responses,
+- a ``Retry-After`` (or ``retry-after-ms``) header pauses the whole model,
+  and the failed request is retried after it,
+- waiting requests form a FIFO queue and give up at their deadline with
+  ``RateLimited``.
+
+The SDK's own retries are disabled (see ``llm._get_client``) so that every
+429 reaches the limiter. Requests on any event loop or thread share the same
+limiter; wakeups are posted to the waiter's own loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from openai import APIConnectionError, APIStatusError, RateLimitError
+
+from parlanchina.config import get_float_setting, get_int_setting, get_setting
+
+logger = logging.getLogger(__name__)
+
+# Buckets hold this many seconds of quota, so an idle model cannot burst a
+# whole minute of requests at once.
+_BURST_SECONDS = 10.0
+# Several requests failing together count as one overload signal.
+_DECREASE_INTERVAL = 1.0
+# Pause used for a 429 without a Retry-After header.
+_DEFAULT_RETRY_AFTER = 1.0
+_MAX_RETRY_AFTER = 60.0
+
+
+class RateLimited(RuntimeError):
+    """No capacity for the request before its deadline, or retries exhausted."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    def __init__(self, per_minute: int) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * _BURST_SECONDS)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def refill(self, now: float) -> None:
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until ``amount`` is available (0 when it already is)."""
+        if self.unlimited:
+            return 0.0
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            # May go negative: an oversized request (or a usage correction) is paid back over time.
+            self.level -= amount
+
+
+@dataclass(eq=False)
+class _Waiter:
+    loop: asyncio.AbstractEventLoop
+    tokens: int
+    wake: asyncio.Future | None = None
+
+
+@dataclass
+class _Counters:
+    granted: int = 0
+    queued: int = 0
+    max_queued: int = 0
+    timed_out: int = 0
+    throttled: int = 0
+    server_errors: int = 0
+    retries: int = 0
+    decreases: int = 0
+    wait_ms: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {**self.__dict__, "wait_ms": round(self.wait_ms, 2)}
+
+
+@dataclass
+class Permit:
+    """One admitted request; holds a concurrency slot until released."""
+
+    limiter: "ModelLimiter"
+    tokens: int
+    deadline: float
+    attempts: int = 0
+    settled: bool = field(default=False, repr=False)
+
+    async def send(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``factory()``; on 429/5xx back off and retry while the deadline allows."""
+        while True:
+            self.attempts += 1
+            try:
+                return await factory()
+            except (RateLimitError, APIStatusError, APIConnectionError) as exc:
+                retry_after = self.limiter.failed(exc)
+                if retry_after is None or self.attempts > self.limiter.max_retries:
+                    if isinstance(exc, RateLimitError):
+                        raise RateLimited(
+                            f"Rate limit reached for {self.limiter.model}", retry_after
+                        ) from exc
+                    raise
+                if time.monotonic() + retry_after >= self.deadline:
+                    raise RateLimited(
+                        f"Rate limit reached for {self.limiter.model}", retry_after
+                    ) from exc
+                self.limiter.count("retries")
+                await asyncio.sleep(retry_after)
+                await self.limiter.reacquire(self)
+
+    def settle(self, used_tokens: int | None) -> None:
+        """Charge the token bucket with the reported usage instead of the estimate."""
+        if used_tokens is None or self.settled:
+            return
+        self.settled = True
+        self.limiter.adjust_tokens(used_tokens - self.tokens)
+
+
+class ModelLimiter:
+    def __init__(
+        self,
+        model: str,
+        *,
+        rpm: int = 0,
+        tpm: int = 0,
+        concurrency: int = 8,
+        max_concurrency: int = 32,
+        max_retries: int = 2,
+    ) -> None:
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self._requests = _Bucket(rpm)
+        self._tokens = _Bucket(tpm)
+        self._limit = float(min(max(1, concurrency), self.max_concurrency))
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._queue: deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        self._counters = _Counters()
+
+    # Admission ------------------------------------------------------------
+
+    async def acquire(self, tokens: int, deadline: float) -> Permit:
+        waiter = _Waiter(asyncio.get_running_loop(), tokens)
+        started = time.monotonic()
+        with self._lock:
+            self._queue.append(waiter)
+            self._counters.max_queued = max(self._counters.max_queued, len(self._queue))
+        try:
+            await self._wait_turn(waiter, deadline, admit=True)
+        finally:
+            with self._lock:
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+                    self._wake_head()
+        with self._lock:
+            waited = time.monotonic() - started
+            self._counters.wait_ms += waited * 1000
+            if waited > 0.001:
+                self._counters.queued += 1
+        return Permit(self, tokens, deadline)
+
+    async def reacquire(self, permit: Permit) -> None:
+        """Wait for the buckets again for a retry; the permit keeps its slot."""
+        waiter = _Waiter(asyncio.get_running_loop(), permit.tokens)
+        with self._lock:
+            # Retries go first: they were admitted before anything still queued.
+            self._queue.appendleft(waiter)
+        try:
+            await self._wait_turn(waiter, permit.deadline, admit=False)
+        finally:
+            with self._lock:
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+                    self._wake_head()
+
+    async def _wait_turn(self, waiter: _Waiter, deadline: float, *, admit: bool) -> None:
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                waiter.wake = waiter.loop.create_future()
+                wait = self._try_take(waiter, now, admit) if self._queue[0] is waiter else None
+                if wait == 0.0:
+                    self._queue.popleft()
+                    self._wake_head()
+                    return
+            remaining = deadline - now
+            if remaining <= 0:
+                with self._lock:
+                    self._counters.timed_out += 1
+                raise RateLimited(
+                    f"No capacity for {self.model} before the request deadline",
+                    wait if wait and math.isfinite(wait) else None,
+                )
+            try:
+                await asyncio.wait_for(waiter.wake, min(wait or remaining, remaining))
+            except TimeoutError:
+                pass
+
+    def _try_take(self, waiter: _Waiter, now: float, admit: bool) -> float:
+        """Take capacity for ``waiter`` and return 0, or return seconds to wait."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if admit and self._in_flight >= int(self._limit):
+            # Woken by a release.
+            return math.inf
+        self._requests.refill(now)
+        self._tokens.refill(now)
+        wait = max(self._requests.wait_for(1), self._tokens.wait_for(waiter.tokens))
+        if wait > 0:
+            return wait
+        self._requests.take(1)
+        self._tokens.take(waiter.tokens)
+        if admit:
+            self._in_flight += 1
+            self._counters.granted += 1
+        return 0.0
+
+    def _wake_head(self) -> None:
+        if not self._queue:
+            return
+        head = self._queue[0]
+        if head.wake is None:
+            return
+        try:
+            head.loop.call_soon_threadsafe(_resolve, head.wake)
+        except RuntimeError:
+            # The waiter's loop is closed; its task is gone with it.
+            pass
+
+    def release(self, ok: bool) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if ok:
+                self._limit = min(self.max_concurrency, self._limit + 1.0 / self._limit)
+            self._wake_head()
+
+    # Feedback -------------------------------------------------------------
+
+    def failed(self, exc: Exception) -> float | None:
+        """Record a failed attempt; return the delay before a retry, or None if not retryable."""
+        status = getattr(exc, "status_code", None)
+        now = time.monotonic()
+        with self._lock:
+            if isinstance(exc, RateLimitError):
+                if getattr(exc, "code", None) == "insufficient_quota":
+                    return None
+                self._counters.throttled += 1
+            elif isinstance(exc, APIStatusError):
+                if status is None or status < 500:
+                    return None
+                self._counters.server_errors += 1
+            else:
+                # Connection errors: retry, but they say nothing about the quota.
+                return _DEFAULT_RETRY_AFTER
+            if now - self._last_decrease >= _DECREASE_INTERVAL:
+                self._limit = max(1.0, self._limit / 2)
+                self._last_decrease = now
+                self._counters.decreases += 1
+            delay = _retry_after(exc)
+            if delay is None and isinstance(exc, RateLimitError):
+                delay = _DEFAULT_RETRY_AFTER
+            if delay is not None:
+                # Hold back every request to this model, not only the retry.
+                self._paused_until = max(self._paused_until, now + delay)
+        logger.warning(
+            "Model %s returned HTTP %s; concurrency limit now %.1f", self.model, status, self._limit
+        )
+        return delay if delay is not None else _DEFAULT_RETRY_AFTER
+
+    def adjust_tokens(self, delta: int) -> None:
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            self._tokens.take(delta)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            setattr(self._counters, name, getattr(self._counters, name) + 1)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                **self._counters.as_dict(),
+                "limit": round(self._limit, 2),
+                "in_flight": self._in_flight,
+                "waiting": len(self._queue),
+                "paused_for": round(max(0.0, self._paused_until - now), 2),
+                "rpm": round(self._requests.rate * 60),
+                "tpm": round(self._tokens.rate * 60),
+            }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _retry_after(exc: Exception) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            delay = float(headers["retry-after-ms"]) / 1000
+        elif headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                delay = float(value)
+            except ValueError:
+                delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        else:
+            return None
+    except (TypeError, ValueError):
+        return None
+    return min(max(0.0, delay), _MAX_RETRY_AFTER)
+
+
+def estimate_tokens(payload: Any) -> int:
+    """Rough prompt size (about four characters per token)."""
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False, default=str)
+    return len(text) // 4 + 1
+
+
+_limiters: dict[str, ModelLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _model_limits(model: str) -> dict[str, Any]:
+    """Per-model overrides from ``PARLANCHINA_LLM_RATE_LIMITS`` (a JSON object)."""
+    raw = get_setting("PARLANCHINA_LLM_RATE_LIMITS")
+    if not raw:
+        return {}
+    try:
+        limits = json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError:
+        logger.warning("PARLANCHINA_LLM_RATE_LIMITS is not valid JSON; ignoring it")
+        return {}
+    entry = limits.get(model) if isinstance(limits, dict) else None
+    return entry if isinstance(entry, dict) else {}
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    limiter = _limiters.get(model)
+    if limiter is not None:
+        return limiter
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            overrides = _model_limits(model)
+            limiter = ModelLimiter(
+                model,
+                rpm=int(overrides.get("rpm", get_int_setting("PARLANCHINA_LLM_RPM", 0))),
+                tpm=int(overrides.get("tpm", get_int_setting("PARLANCHINA_LLM_TPM", 0))),
+                concurrency=int(
+                    overrides.get("concurrency", get_int_setting("PARLANCHINA_LLM_CONCURRENCY", 8))
+                ),
+                max_concurrency=int(
+                    overrides.get(
+                        "max_concurrency", get_int_setting("PARLANCHINA_LLM_MAX_CONCURRENCY", 32)
+                    )
+                ),
+                max_retries=get_int_setting("PARLANCHINA_LLM_MAX_RETRIES", 2),
+            )
+            _limiters[model] = limiter
+        return limiter
+
+
+@asynccontextmanager
+async def request(model: str, tokens: int, timeout: float | None = None) -> AsyncIterator[Permit]:
+    """Admit one request to ``model`` within ``PARLANCHINA_LLM_QUEUE_TIMEOUT`` seconds.
+
+    The concurrency slot is held for the whole block, so a streamed response
+    counts until it has been read.
+    """
+    if timeout is None:
+        timeout = get_float_setting("PARLANCHINA_LLM_QUEUE_TIMEOUT", 60.0)
+    deadline = time.monotonic() + timeout
+    limiter = get_limiter(model)
+    permit = await limiter.acquire(tokens, deadline)
+    ok = False
+    try:
+        yield permit
+        ok = True
+    finally:
+        limiter.release(ok)
+
+
+def stats() -> dict[str, dict[str, Any]]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.model: limiter.stats() for limiter in limiters}
+
+
+def reset() -> None:
+    """Forget all limiters (settings are read again on next use)."""
+    with _limiters_lock:
+        _limiters.clear()
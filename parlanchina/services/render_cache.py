@@ -0,0 +1,161 @@
+"""Content-addressed cache of rendered assistant markdown.
+
+Session files store only ``raw_markdown``; HTML is produced on demand and kept
+in an in-memory LRU keyed by a hash of the markdown and the renderer version.
+An optional disk tier (``PARLANCHINA_RENDER_CACHE_DIR``) survives restarts and
+is shared between worker processes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from flask import current_app
+
+from parlanchina.config import get_int_setting, get_setting
+from parlanchina.utils.durable_io import atomic_write_bytes
+from parlanchina.utils.markdown import RENDERER_VERSION, render_markdown
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION_KEY = "parlanchina_render_cache"
+_cache_lock = threading.Lock()
+
+
+def content_key(md_text: str) -> str:
+    digest = hashlib.sha256(f"{RENDERER_VERSION}\0{md_text}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, max_entries: int = 512, disk_dir: Path | None = None) -> None:
+        self.max_entries = max(0, max_entries)
+        self.disk_dir = disk_dir
+        if disk_dir is not None:
+            disk_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def render(self, md_text: str) -> str:
+        key = content_key(md_text)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+        html = self._read_disk(key)
+        if html is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            html = render_markdown(md_text)
+            with self._lock:
+                self.misses += 1
+            self._write_disk(key, html)
+        self._remember(key, html)
+        return html
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk": str(self.disk_dir) if self.disk_dir else None,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, html: str) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Path | None:
+        if self.disk_dir is None:
+            return None
+        return self.disk_dir / key[:2] / f"{key}.html"
+
+    def _read_disk(self, key: str) -> str | None:
+        path = self._disk_path(key)
+        if path is None:
+            return None
+        try:
+            return path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logger.warning("Cannot read render cache entry %s", path)
+            return None
+
+    def _write_disk(self, key: str, html: str) -> None:
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Content addressed: no fsync needed, a lost entry is re-rendered.
+            atomic_write_bytes(path, html.encode("utf-8"))
+        except OSError:
+            logger.warning("Cannot write render cache entry %s", path)
+
+
+def _cache() -> RenderCache:
+    app = current_app._get_current_object()
+    cache = app.extensions.get(_EXTENSION_KEY)
+    if cache is not None:
+        return cache
+    with _cache_lock:
+        cache = app.extensions.get(_EXTENSION_KEY)
+        if cache is None:
+            disk_dir = get_setting("PARLANCHINA_RENDER_CACHE_DIR")
+            cache = RenderCache(
+                get_int_setting("PARLANCHINA_RENDER_CACHE_SIZE", 512),
+                Path(disk_dir) if disk_dir else None,
+            )
+            app.extensions[_EXTENSION_KEY] = cache
+        return cache
+
+
+def render(md_text: str) -> str:
+    """Return sanitized HTML for ``md_text``, rendering it at most once."""
+    return _cache().render(md_text)
+
+
+def message_html(message: dict[str, Any]) -> str:
+    """HTML for a stored assistant message; legacy messages keep their stored HTML."""
+    html = message.get("html")
+    if isinstance(html, str):
+        return html
+    return render(message.get("raw_markdown") or "")
+
+
+def with_html(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Return ``messages`` with ``html`` filled in for assistant entries."""
+    rendered = []
+    for message in messages:
+        if message.get("role") == "assistant" and "html" not in message:
+            message = {**message, "html": message_html(message)}
+        rendered.append(message)
+    return rendered
+
+
+def stats() -> dict[str, Any]:
+    return _cache().stats()
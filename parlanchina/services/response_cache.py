@@ -0,0 +1,284 @@
+"""Opt-in cache of auxiliary model replies (titles, error explanations).
+
+These prompts repeat (the same tool error in many streams, the same opening
+message) and their replies do not need to be fresh, so with
+``PARLANCHINA_RESPONSE_CACHE`` enabled ``llm.complete_response`` looks them up
+by a hash of the model and the normalized messages first. Answers to the user
+are never cached; only call sites that pass ``cache_site`` use it. Agent plans
+have their own cache in ``llm`` and do not go through this one.
+
+Entries expire after ``PARLANCHINA_RESPONSE_CACHE_TTL`` seconds. The memory LRU
+is bounded by entry count and bytes; an optional disk tier
+(``PARLANCHINA_RESPONSE_CACHE_DIR``) survives restarts, is shared between
+worker processes and is pruned oldest-first past its byte limit.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from flask import current_app, has_app_context
+
+from parlanchina.config import get_bool_setting, get_float_setting, get_int_setting, get_setting
+from parlanchina.utils.durable_io import atomic_write_bytes
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION_KEY = "parlanchina_response_cache"
+_cache_lock = threading.Lock()
+# Bump when the key layout or normalization changes.
+_KEY_VERSION = "1"
+# Re-check the disk tier size every this many writes.
+_PRUNE_EVERY = 64
+
+
+def normalize_messages(messages: list[dict]) -> list[dict[str, str]]:
+    """Role and whitespace-collapsed content; other fields do not affect the reply."""
+    return [
+        {
+            "role": str(message.get("role") or "").lower(),
+            "content": " ".join(str(message.get("content") or "").split()),
+        }
+        for message in messages
+    ]
+
+
+def request_key(model: str, messages: list[dict]) -> str:
+    payload = json.dumps(
+        {"v": _KEY_VERSION, "model": model, "messages": normalize_messages(messages)},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _SiteCounters:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    expired: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {**self.__dict__, "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0}
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        *,
+        ttl: float = 86400.0,
+        max_entries: int = 1024,
+        max_bytes: int = 8 * 1024 * 1024,
+        disk_dir: Path | None = None,
+        disk_max_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.ttl = max(0.0, ttl)
+        self.max_entries = max(0, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = max(0, disk_max_bytes)
+        if disk_dir is not None:
+            disk_dir.mkdir(parents=True, exist_ok=True)
+        # key -> (expires_at wall clock, text)
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._sites: dict[str, _SiteCounters] = {}
+        self._disk_writes = 0
+
+    def get(self, site: str, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            counters = self._sites.setdefault(site, _SiteCounters())
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    counters.hits += 1
+                    return entry[1]
+                self._forget(key)
+                counters.expired += 1
+        cached = self._read_disk(key, now)
+        with self._lock:
+            if cached is None:
+                counters.misses += 1
+                return None
+            counters.disk_hits += 1
+        self._remember(key, *cached)
+        return cached[1]
+
+    def put(self, site: str, key: str, text: str) -> None:
+        if self.ttl == 0:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._sites.setdefault(site, _SiteCounters()).stores += 1
+        self._remember(key, expires_at, text)
+        self._write_disk(key, expires_at, text)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "disk": str(self.disk_dir) if self.disk_dir else None,
+                "sites": {site: c.as_dict() for site, c in self._sites.items()},
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # Memory tier ----------------------------------------------------------
+
+    def _remember(self, key: str, expires_at: float, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if self.max_entries == 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = (expires_at, text)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._forget(next(iter(self._entries)))
+
+    def _forget(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1].encode("utf-8"))
+
+    # Disk tier ------------------------------------------------------------
+
+    def _disk_path(self, key: str) -> Path | None:
+        if self.disk_dir is None:
+            return None
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str, now: float) -> tuple[float, str] | None:
+        path = self._disk_path(key)
+        if path is None:
+            return None
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning("Cannot read response cache entry %s", path)
+            return None
+        if not isinstance(data, dict) or float(data.get("expires_at") or 0) <= now:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        return float(data["expires_at"]), str(data.get("text") or "")
+
+    def _write_disk(self, key: str, expires_at: float, text: str) -> None:
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # A lost entry only costs a model call: no fsync.
+            payload = json.dumps({"expires_at": expires_at, "text": text}, ensure_ascii=False)
+            atomic_write_bytes(path, payload.encode("utf-8"))
+        except OSError:
+            logger.warning("Cannot write response cache entry %s", path)
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % _PRUNE_EVERY == 0
+        if prune:
+            threading.Thread(
+                target=self.prune_disk, name="parlanchina-response-cache", daemon=True
+            ).start()
+
+    def prune_disk(self) -> int:
+        """Delete expired entries, then the oldest ones past ``disk_max_bytes``."""
+        if self.disk_dir is None:
+            return 0
+        now = time.time()
+        files: list[tuple[float, int, Path]] = []
+        removed = 0
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if stat.st_mtime + self.ttl <= now:
+                removed += _unlink(path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            removed += _unlink(path)
+            total -= size
+        return removed
+
+
+def _unlink(path: Path) -> int:
+    try:
+        os.unlink(path)
+    except OSError:
+        return 0
+    return 1
+
+
+def enabled() -> bool:
+    # The cache lives on the app; calls outside an app context skip it.
+    return has_app_context() and get_bool_setting("PARLANCHINA_RESPONSE_CACHE", False)
+
+
+def _cache() -> ResponseCache:
+    app = current_app._get_current_object()
+    cache = app.extensions.get(_EXTENSION_KEY)
+    if cache is not None:
+        return cache
+    with _cache_lock:
+        cache = app.extensions.get(_EXTENSION_KEY)
+        if cache is None:
+            disk_dir = get_setting("PARLANCHINA_RESPONSE_CACHE_DIR")
+            cache = ResponseCache(
+                ttl=get_float_setting("PARLANCHINA_RESPONSE_CACHE_TTL", 86400.0),
+                max_entries=get_int_setting("PARLANCHINA_RESPONSE_CACHE_SIZE", 1024),
+                max_bytes=get_int_setting("PARLANCHINA_RESPONSE_CACHE_MAX_BYTES", 8 * 1024 * 1024),
+                disk_dir=Path(disk_dir) if disk_dir else None,
+                disk_max_bytes=get_int_setting(
+                    "PARLANCHINA_RESPONSE_CACHE_DISK_MAX_BYTES", 64 * 1024 * 1024
+                ),
+            )
+            app.extensions[_EXTENSION_KEY] = cache
+        return cache
+
+
+def lookup(site: str, model: str, messages: list[dict]) -> tuple[str, str | None]:
+    """Return ``(key, cached reply or None)``."""
+    key = request_key(model, messages)
+    return key, _cache().get(site, key)
+
+
+def store(site: str, key: str, text: str) -> None:
+    _cache().put(site, key, text)
+
+
+def stats() -> dict[str, Any]:
+    return _cache().stats()
@@ -0,0 +1,229 @@
+"""Full-text index over session titles and messages (SQLite FTS5).
+
+The index lives in its own database (``data/search.db``) so it works with
+either chat store backend. ``chat_store`` feeds it incrementally as messages
+are appended and titles change; ``rebuild`` re-indexes existing data.
+"""
+
+from __future__ import annotations
+
+import html
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_sessions (
+    session_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT ''
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS titles_fts USING fts5(
+    title, session_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    body, session_id UNINDEXED, idx UNINDEXED, role UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Hit markers from FTS5 ``snippet()``: private-use characters that survive
+# HTML escaping and are swapped for ``<mark>`` tags afterwards.
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+
+
+def _match_query(text: str) -> str:
+    """Turn free text into an FTS5 query: all terms, the last one as a prefix."""
+    terms = [term.replace('"', '""') for term in text.split()]
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _snippet_html(snippet: str | None) -> str:
+    """Escape message text in a snippet, then turn the hit markers into ``<mark>``."""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def message_text(message: dict[str, Any]) -> str:
+    """Searchable text of a stored message."""
+    return message.get("content") or message.get("raw_markdown") or ""
+
+
+def _indexable(text: str) -> str:
+    # Stored text must not contain the hit markers, or a snippet could open a stray <mark>.
+    return text.replace(_MARK_START, "").replace(_MARK_END, "")
+
+
+class SearchIndex:
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.available = self._create_schema()
+
+    def _create_schema(self) -> bool:
+        try:
+            self._connection().executescript(_SCHEMA)
+        except sqlite3.DatabaseError as exc:
+            logger.warning(
+                "Full-text search disabled (missing FTS5 or unusable %s): %s", self.db_path, exc
+            )
+            return False
+        return True
+
+    def _recreate(self) -> bool:
+        """Drop an unusable index database and start from an empty one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local = threading.local()
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{self.db_path}{suffix}").unlink(missing_ok=True)
+        self.available = self._create_schema()
+        return self.available
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements: Iterable[tuple[str, tuple]]) -> None:
+        if not self.available:
+            return
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # Updates --------------------------------------------------------------
+
+    def add_message(self, session_id: str, idx: int, role: str, text: str) -> None:
+        if not text:
+            return
+        self._write(
+            [
+                (
+                    "INSERT INTO messages_fts (body, session_id, idx, role) VALUES (?, ?, ?, ?)",
+                    (_indexable(text), session_id, idx, role),
+                )
+            ]
+        )
+
+    def set_title(self, session_id: str, title: str) -> None:
+        self._write(self._title_statements(session_id, title))
+
+    def delete_session(self, session_id: str) -> None:
+        self._write(
+            [
+                ("DELETE FROM messages_fts WHERE session_id = ?", (session_id,)),
+                ("DELETE FROM titles_fts WHERE session_id = ?", (session_id,)),
+                ("DELETE FROM indexed_sessions WHERE session_id = ?", (session_id,)),
+            ]
+        )
+
+    def rebuild(self, sessions: Iterable[dict[str, Any]]) -> int:
+        """Replace the index with ``sessions`` (full dicts); returns the count."""
+        if not self.available and not self._recreate():
+            return 0
+        count = 0
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM messages_fts")
+            conn.execute("DELETE FROM titles_fts")
+            conn.execute("DELETE FROM indexed_sessions")
+            for session in sessions:
+                title = session.get("title") or ""
+                for sql, params in self._title_statements(session["id"], title):
+                    conn.execute(sql, params)
+                conn.executemany(
+                    "INSERT INTO messages_fts (body, session_id, idx, role) VALUES (?, ?, ?, ?)",
+                    [
+                        (_indexable(message_text(message)), session["id"], idx, message.get("role") or "")
+                        for idx, message in enumerate(session.get("messages") or [])
+                        if message_text(message)
+                    ],
+                )
+                count += 1
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('optimize')")
+        return count
+
+    @staticmethod
+    def _title_statements(session_id: str, title: str) -> list[tuple[str, tuple]]:
+        return [
+            ("DELETE FROM titles_fts WHERE session_id = ?", (session_id,)),
+            ("INSERT INTO titles_fts (title, session_id) VALUES (?, ?)", (title, session_id)),
+            (
+                "INSERT INTO indexed_sessions (session_id, title) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET title = excluded.title",
+                (session_id, title),
+            ),
+        ]
+
+    # Queries --------------------------------------------------------------
+
+    def search(self, text: str, limit: int = 20) -> dict[str, Any]:
+        """Return ranked title and message hits for ``text`` (best first)."""
+        started = time.perf_counter()
+        result: dict[str, Any] = {
+            "query": text,
+            "available": self.available,
+            "sessions": [],
+            "messages": [],
+        }
+        query = _match_query(text)
+        if self.available and query:
+            conn = self._connection()
+            result["sessions"] = [
+                dict(row)
+                for row in conn.execute(
+                    "SELECT session_id AS id, title, bm25(titles_fts) AS score "
+                    "FROM titles_fts WHERE titles_fts MATCH ? ORDER BY score LIMIT ?",
+                    (query, limit),
+                )
+            ]
+            result["messages"] = [
+                {**dict(row), "snippet": _snippet_html(row["snippet"])}
+                for row in conn.execute(
+                    "SELECT messages_fts.session_id, s.title, messages_fts.idx AS \"index\", "
+                    "messages_fts.role, "
+                    f"snippet(messages_fts, 0, '{_MARK_START}', '{_MARK_END}', '…', 16) AS snippet, "
+                    "bm25(messages_fts) AS score "
+                    "FROM messages_fts LEFT JOIN indexed_sessions AS s "
+                    "ON s.session_id = messages_fts.session_id "
+                    "WHERE messages_fts MATCH ? ORDER BY score LIMIT ?",
+                    (query, limit),
+                )
+            ]
+        result["took_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def is_empty(self) -> bool:
+        """True when no session is indexed (or the index is unusable)."""
+        if not self.available:
+            return True
+        row = self._connection().execute("SELECT 1 FROM indexed_sessions LIMIT 1").fetchone()
+        return row is None
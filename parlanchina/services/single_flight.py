@@ -0,0 +1,104 @@
+"""Coalesce identical in-flight calls into one upstream call.
+
+Several tabs or users often trigger the same read-only MCP tool call or the
+same auxiliary prompt at the same moment. The first caller (the leader) runs
+the call; callers that arrive with the same key while it is running wait for
+its result or exception instead of making their own.
+
+Callers may run on different event loops (the background loop, the ASGI
+server loop), so the shared result is a ``concurrent.futures.Future``. A
+leader that is cancelled while others are waiting lets the call finish for
+them; a follower whose leader's call was cancelled starts its own.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Flight:
+    future: concurrent.futures.Future = field(default_factory=concurrent.futures.Future)
+    waiters: int = 0
+
+
+@dataclass
+class _Counters:
+    calls: int = 0
+    shared: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(self.__dict__)
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._flights: dict[tuple[str, Hashable], _Flight] = {}
+        self._lock = threading.Lock()
+        self._counters: dict[str, _Counters] = {}
+
+    async def do(self, kind: str, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``factory()``, or the result of an identical call already running."""
+        ident = (kind, key)
+        with self._lock:
+            counters = self._counters.setdefault(kind, _Counters())
+            flight = self._flights.get(ident)
+            leader = flight is None
+            if leader:
+                flight = self._flights[ident] = _Flight()
+                counters.calls += 1
+            else:
+                flight.waiters += 1
+                counters.shared += 1
+        if not leader:
+            return await self._follow(flight, kind, key, factory)
+
+        task = asyncio.ensure_future(factory())
+        task.add_done_callback(lambda done: self._finish(ident, flight, done))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            with self._lock:
+                orphaned = flight.waiters == 0
+            if orphaned:
+                task.cancel()
+            raise
+
+    async def _follow(
+        self, flight: _Flight, kind: str, key: Hashable, factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        try:
+            return await asyncio.shield(asyncio.wrap_future(flight.future))
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if flight.future.cancelled() and not (current and current.cancelling()):
+                return await self.do(kind, key, factory)
+            raise
+        finally:
+            with self._lock:
+                flight.waiters -= 1
+
+    def _finish(self, ident: tuple[str, Hashable], flight: _Flight, task: asyncio.Future) -> None:
+        with self._lock:
+            if self._flights.get(ident) is flight:
+                del self._flights[ident]
+        if task.cancelled():
+            flight.future.cancel()
+        elif task.exception() is not None:
+            flight.future.set_exception(task.exception())
+        else:
+            flight.future.set_result(task.result())
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "kinds": {kind: c.as_dict() for kind, c in self._counters.items()},
+            }
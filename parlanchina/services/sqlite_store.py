@@ -0,0 +1,299 @@
+"""SQLite chat session storage.
+
+Sessions, messages and tool selections live in indexed tables of a single
+database running in WAL mode, so readers never block the writer and concurrent
+requests under ``threaded=True`` get transactional updates. Connections are
+per thread but tracked by the store so ``close`` can close all of them;
+writes that depend on current state use ``BEGIN IMMEDIATE``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from parlanchina.services.store_base import SESSION_FIELDS, ChatStoreBackend
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    model TEXT,
+    mode TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at DESC);
+
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (session_id, idx)
+);
+
+CREATE TABLE IF NOT EXISTS tool_selections (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    tool_ids TEXT,
+    PRIMARY KEY (session_id, kind)
+);
+"""
+
+# Session dict field -> tool_selections.kind
+_TOOL_FIELDS = {
+    "enabled_internal_tools": "internal",
+    "enabled_mcp_tools": "mcp",
+    "enabled_tools": "legacy",
+}
+_TOOL_KINDS = {kind: field for field, kind in _TOOL_FIELDS.items()}
+
+# Durability mode -> PRAGMA synchronous. In WAL mode NORMAL syncs at
+# checkpoints, which is SQLite's own form of batching.
+_SYNCHRONOUS = {"always": "FULL", "batched": "NORMAL", "never": "OFF"}
+
+
+class SqliteChatStore(ChatStoreBackend):
+    name = "sqlite"
+
+    def __init__(self, db_path: Path, durability: str = "batched") -> None:
+        self.db_path = db_path
+        self._synchronous = _SYNCHRONOUS.get(durability, "NORMAL")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    # Connections ----------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only the owning thread uses it; close() may run on another thread.
+            conn = sqlite3.connect(
+                self.db_path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self._synchronous}")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Run a write transaction that holds the database write lock from the start."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    # Public API -----------------------------------------------------------
+
+    def list_sessions(self, limit: int | None = None, offset: int = 0) -> list[dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT id, title, model, mode, created_at, updated_at, message_count "
+            "FROM sessions ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_session(self, session_id: str) -> Optional[dict[str, Any]]:
+        conn = self._connection()
+        # A single read transaction keeps header and messages consistent.
+        conn.execute("BEGIN")
+        try:
+            header = self._load_header(conn, session_id)
+            if header is None:
+                return None
+            rows = conn.execute(
+                "SELECT body FROM messages WHERE session_id = ? ORDER BY idx",
+                (session_id,),
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        header.pop("message_count", None)
+        header["messages"] = [json.loads(row["body"]) for row in rows]
+        return header
+
+    def load_messages(
+        self, session_id: str, start: int | None = None, end: int | None = None
+    ) -> Optional[tuple[dict[str, Any], list[dict[str, Any]]]]:
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            header = self._load_header(conn, session_id)
+            if header is None:
+                return None
+            first, last, _ = slice(start, end).indices(header["message_count"])
+            rows = conn.execute(
+                "SELECT body FROM messages WHERE session_id = ? AND idx >= ? AND idx < ? "
+                "ORDER BY idx",
+                (session_id, first, last),
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return header, [json.loads(row["body"]) for row in rows]
+
+    def load_header(self, session_id: str) -> Optional[dict[str, Any]]:
+        conn = self._connection()
+        # The session row and its tool selections are two queries; read them together.
+        conn.execute("BEGIN")
+        try:
+            return self._load_header(conn, session_id)
+        finally:
+            conn.execute("COMMIT")
+
+    def save_session(self, session: dict[str, Any]) -> None:
+        messages = session.get("messages") or []
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT message_count FROM sessions WHERE id = ?", (session["id"],)
+            ).fetchone()
+            stored_count = row["message_count"] if row else 0
+            header = {k: v for k, v in session.items() if k != "messages"}
+            header["message_count"] = max(stored_count, len(messages))
+            self._upsert_header(conn, header)
+            for idx in range(stored_count, len(messages)):
+                self._insert_message(conn, session["id"], idx, messages[idx])
+
+    def append_message(
+        self, session_id: str, message: dict[str, Any], updates: dict[str, Any]
+    ) -> dict[str, Any]:
+        with self._write() as conn:
+            header = self._require_header(conn, session_id)
+            self._insert_message(conn, session_id, header["message_count"], message)
+            header.update(updates)
+            header["message_count"] += 1
+            self._upsert_header(conn, header)
+        return header
+
+    @contextmanager
+    def transaction(
+        self, session_id: str
+    ) -> Iterator[tuple[dict[str, Any], dict[str, Any]]]:
+        with self._write() as conn:
+            header = self._require_header(conn, session_id)
+            updates: dict[str, Any] = {}
+            yield dict(header), updates
+            if updates:
+                header.update(updates)
+                self._upsert_header(conn, header)
+
+    def delete_session(self, session_id: str) -> None:
+        with self._write() as conn:
+            cursor = conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            if cursor.rowcount == 0:
+                raise FileNotFoundError(f"Session {session_id} not found")
+
+    def compact(self) -> int:
+        self._connection().execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return 0
+
+    def is_empty(self) -> bool:
+        row = self._connection().execute("SELECT 1 FROM sessions LIMIT 1").fetchone()
+        return row is None
+
+    def import_sessions(self, source: ChatStoreBackend) -> int:
+        """Copy every session from another backend; returns the number imported."""
+        imported = 0
+        for summary in source.list_sessions():
+            session = source.load_session(summary["id"])
+            if session is None:
+                continue
+            self.save_session(session)
+            imported += 1
+        return imported
+
+    # Rows -----------------------------------------------------------------
+
+    def _load_header(self, conn: sqlite3.Connection, session_id: str) -> Optional[dict[str, Any]]:
+        row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        header = json.loads(row["extra"] or "{}")
+        for field in SESSION_FIELDS:
+            header[field] = row[field]
+        header["message_count"] = row["message_count"]
+        for field in _TOOL_FIELDS:
+            header[field] = None
+        for tool_row in conn.execute(
+            "SELECT kind, tool_ids FROM tool_selections WHERE session_id = ?", (session_id,)
+        ):
+            field = _TOOL_KINDS.get(tool_row["kind"])
+            if field and tool_row["tool_ids"] is not None:
+                header[field] = json.loads(tool_row["tool_ids"])
+        return header
+
+    def _require_header(self, conn: sqlite3.Connection, session_id: str) -> dict[str, Any]:
+        header = self._load_header(conn, session_id)
+        if header is None:
+            raise FileNotFoundError(f"Session {session_id} not found")
+        return header
+
+    @staticmethod
+    def _upsert_header(conn: sqlite3.Connection, header: dict[str, Any]) -> None:
+        extra = {
+            k: v
+            for k, v in header.items()
+            if k not in SESSION_FIELDS and k not in _TOOL_FIELDS and k != "message_count"
+        }
+        conn.execute(
+            "INSERT INTO sessions (id, title, model, mode, created_at, updated_at, message_count, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET title = excluded.title, model = excluded.model, "
+            "mode = excluded.mode, created_at = excluded.created_at, updated_at = excluded.updated_at, "
+            "message_count = excluded.message_count, extra = excluded.extra",
+            (
+                header["id"],
+                header.get("title"),
+                header.get("model"),
+                header.get("mode"),
+                header.get("created_at"),
+                header.get("updated_at"),
+                header.get("message_count", 0),
+                json.dumps(extra, ensure_ascii=False),
+            ),
+        )
+        for field, kind in _TOOL_FIELDS.items():
+            value = header.get(field)
+            conn.execute(
+                "INSERT INTO tool_selections (session_id, kind, tool_ids) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id, kind) DO UPDATE SET tool_ids = excluded.tool_ids",
+                (header["id"], kind, None if value is None else json.dumps(value)),
+            )
+
+    @staticmethod
+    def _insert_message(
+        conn: sqlite3.Connection, session_id: str, idx: int, message: dict[str, Any]
+    ) -> None:
+        conn.execute(
+            "INSERT INTO messages (session_id, idx, role, body) VALUES (?, ?, ?, ?)",
+            (session_id, idx, message.get("role") or "", json.dumps(message, ensure_ascii=False)),
+        )
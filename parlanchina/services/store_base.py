@@ -0,0 +1,94 @@
+"""Storage backend interface for chat sessions.
+
+``chat_store`` exposes the public module-level API; backends only implement the
+primitives below. Session dicts keep the historical shape (``id``, ``title``,
+``model``, ``mode``, tool selections, timestamps, ``messages``); headers are the
+same dict without ``messages`` but with ``message_count``.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, ContextManager, Optional
+
+SESSION_FIELDS = ("id", "title", "model", "mode", "created_at", "updated_at")
+
+
+class ChatStoreBackend(ABC):
+    name: str = ""
+
+    @abstractmethod
+    def list_sessions(self, limit: int | None = None, offset: int = 0) -> list[dict[str, Any]]:
+        """Return session summaries sorted by ``updated_at`` (desc)."""
+
+    @abstractmethod
+    def load_session(self, session_id: str) -> Optional[dict[str, Any]]:
+        """Return the full session including ``messages``, or None."""
+
+    @abstractmethod
+    def load_header(self, session_id: str) -> Optional[dict[str, Any]]:
+        """Return session metadata without messages, or None."""
+
+    def load_messages(
+        self, session_id: str, start: int | None = None, end: int | None = None
+    ) -> Optional[tuple[dict[str, Any], list[dict[str, Any]]]]:
+        """Return ``(header, messages[start:end])``, or None when the session is missing.
+
+        Indices follow slice semantics. Backends override this to avoid
+        materialising messages outside the range.
+        """
+        session = self.load_session(session_id)
+        if session is None:
+            return None
+        messages = session.pop("messages", None) or []
+        session["message_count"] = len(messages)
+        return session, messages[start:end]
+
+    @abstractmethod
+    def save_session(self, session: dict[str, Any]) -> None:
+        """Create or overwrite a session; messages past the stored count are appended."""
+
+    @abstractmethod
+    def append_message(
+        self, session_id: str, message: dict[str, Any], updates: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Append one message, apply header ``updates`` and return the new header.
+
+        Raises FileNotFoundError when the session does not exist.
+        """
+
+    @abstractmethod
+    def transaction(
+        self, session_id: str
+    ) -> ContextManager[tuple[dict[str, Any], dict[str, Any]]]:
+        """Hold the session's write lock for the block and yield ``(header, updates)``.
+
+        Header ``updates`` collected in the block are written before the lock
+        is released; nothing is written if the block raises. The block must
+        not call other backend methods. Raises FileNotFoundError when the
+        session does not exist.
+        """
+
+    def update_session(self, session_id: str, updates: dict[str, Any]) -> dict[str, Any]:
+        """Apply header ``updates`` and return the new header.
+
+        Raises FileNotFoundError when the session does not exist.
+        """
+        with self.transaction(session_id) as (header, pending):
+            pending.update(updates)
+        return {**header, **updates}
+
+    @abstractmethod
+    def delete_session(self, session_id: str) -> None:
+        """Remove a session. Raises FileNotFoundError when it does not exist."""
+
+    def stats(self) -> dict[str, Any]:
+        """Return backend counters (cache hits/misses and the like)."""
+        return {}
+
+    def compact(self) -> int:
+        """Perform background maintenance; returns the number of sessions touched."""
+        return 0
+
+    def close(self) -> None:
+        """Release any held resources."""
@@ -0,0 +1,286 @@
+"""Session titles from the first user message.
+
+``PARLANCHINA_TITLE_STRATEGY`` selects how:
+
+- ``local``: an extractive title built from the message itself (no network).
+- ``llm``: one model call per session (the original behaviour).
+- ``hybrid`` (default): the local title is stored at once and later replaced
+  by a model title; sessions waiting for one are titled together in a single
+  request per model every ``PARLANCHINA_TITLE_BATCH_WINDOW`` seconds.
+
+Model titles only replace the title the session was given, so a rename by the
+user in the meantime wins, and they leave ``updated_at`` unchanged.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+from parlanchina.config import get_float_setting, get_int_setting, get_setting
+from parlanchina.services import aux_jobs, background_loop, chat_store, llm
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("local", "llm", "hybrid")
+DEFAULT_TITLE = "New chat"
+MAX_TITLE_WORDS = 6
+MAX_TITLE_CHARS = 50
+
+_TITLE_INSTRUCTIONS = (
+    "You are a helpful assistant that creates concise, descriptive titles for chat sessions. "
+    "Generate a short title (3-6 words) that summarizes the main topic or request from the "
+    "user's message. Respond with only the title, no quotes or additional text."
+)
+_BATCH_INSTRUCTIONS = (
+    "You create concise, descriptive titles (3-6 words) for chat sessions. You receive a JSON "
+    "object mapping ids to the first user message of each session. Respond with only a JSON "
+    "object mapping every id to its title, no quotes around titles beyond JSON syntax."
+)
+
+# Words that never start or fill a local title.
+_STOPWORDS = frozenset(
+    """
+    a about all also am an any are as at be been but by can could did do does doing done
+    for from get give had has have hello help hey hi how i i'd i'm if is it it's its just
+    kindly know let let's like make me my need no not of ok okay on or our please show so
+    some tell than thank thanks that the their them then there these they this those to
+    up us very want was way we were what when where which who whom why will with would
+    you your yours
+    al algo como cómo con cual cuál de del el en es esta está este hola la las lo los me
+    mi necesito para pero por porfa favor puedes puedo que qué quiero se si sobre su te
+    tu un una y yo
+    """.split()
+)
+# Short connectives kept between two content words ("list in Python").
+_CONNECTIVES = frozenset("of in for to and with on vs versus de en para con y".split())
+
+_WORD_RE = re.compile(r"[\w][\w'’.+#-]*[\w+#]|[\w]", re.UNICODE)
+_NOISE_RE = re.compile(r"```.*?(```|$)|`[^`]*`|https?://\S+|<[^>]+>", re.DOTALL)
+
+
+@dataclass
+class _PendingTitle:
+    session_id: str
+    message: str
+    expected: str
+
+
+_pending: dict[str, list[_PendingTitle]] = {}
+_scheduled: set[str] = set()
+_lock = threading.Lock()
+_stats: dict[str, int] = {
+    "local": 0,
+    "llm_calls": 0,
+    "batches": 0,
+    "batched_sessions": 0,
+    "upgraded": 0,
+    "kept": 0,
+}
+
+
+def title_strategy() -> str:
+    strategy = str(get_setting("PARLANCHINA_TITLE_STRATEGY", "hybrid") or "hybrid").lower()
+    return strategy if strategy in STRATEGIES else "hybrid"
+
+
+def local_title(message: str) -> str:
+    """Extract a short title from ``message`` (no network).
+
+    Takes the first run of content words of the message, dropping filler and
+    request phrasing, keeping short connectives between content words.
+    """
+    text = _NOISE_RE.sub(" ", message or "")
+    words: list[str] = []
+    content_words = 0
+    held: list[str] = []
+    for match in _WORD_RE.finditer(text):
+        word = match.group(0).strip(".-'’")
+        if not word:
+            continue
+        lower = word.lower()
+        if lower in _CONNECTIVES and words:
+            held.append(word)
+        elif lower not in _STOPWORDS:
+            if len(words) + len(held) + 1 > MAX_TITLE_WORDS:
+                held = []
+            words.extend(held)
+            held = []
+            words.append(word)
+            content_words += 1
+        else:
+            held = []
+        if len(words) >= MAX_TITLE_WORDS:
+            break
+        # Stop at the end of the first sentence once there is enough to go on.
+        end = text[match.end() : match.end() + 1]
+        if content_words >= 2 and end in {".", "?", "!", "\n"}:
+            break
+    if not words:
+        words = (message or "").split()[:MAX_TITLE_WORDS]
+    return _clean_title(" ".join(words)) or DEFAULT_TITLE
+
+
+def _clean_title(title: str) -> str:
+    title = " ".join(title.strip().strip('"').strip("'").split())
+    if len(title) > MAX_TITLE_CHARS:
+        title = title[: MAX_TITLE_CHARS - 3].rstrip() + "..."
+    return title[:1].upper() + title[1:]
+
+
+def initial_title(message: str) -> str | None:
+    """Title to store with the first message, or None to keep the default."""
+    if title_strategy() == "llm":
+        return None
+    with _lock:
+        _stats["local"] += 1
+    return local_title(message)
+
+
+def schedule_model_title(app, session_id: str, message: str, model: str, expected: str) -> bool:
+    """Queue a model title for the session; False if the strategy does not use one."""
+    strategy = title_strategy()
+    if strategy == "local":
+        return False
+    try:
+        if strategy == "llm":
+            aux_jobs.submit(
+                "title",
+                session_id,
+                lambda: _model_title(app, session_id, message, model, expected),
+            )
+            return True
+        with _lock:
+            _pending.setdefault(model, []).append(_PendingTitle(session_id, message, expected))
+            if model in _scheduled:
+                return True
+            _scheduled.add(model)
+        _schedule_batch(app, model, get_float_setting("PARLANCHINA_TITLE_BATCH_WINDOW", 2.0))
+        return True
+    except RuntimeError as exc:
+        logger.warning("Title generation for session %s not queued: %s", session_id, exc)
+        return False
+
+
+def _schedule_batch(app, model: str, delay: float) -> None:
+    """Queue a batch job after ``delay`` seconds (timed on the loop, not in a worker)."""
+
+    def _submit() -> None:
+        try:
+            aux_jobs.submit("title_batch", None, lambda: _run_batch(app, model))
+        except RuntimeError as exc:
+            with _lock:
+                _scheduled.discard(model)
+                dropped = _pending.pop(model, [])
+            logger.warning("Batched titles for %s session(s) not queued: %s", len(dropped), exc)
+
+    loop = background_loop.get_loop().loop
+    loop.call_soon_threadsafe(loop.call_later, max(0.0, delay), _submit)
+
+
+async def _run_batch(app, model: str) -> None:
+    """Title one batch of pending sessions; reschedules itself while more are waiting."""
+    size = max(1, get_int_setting("PARLANCHINA_TITLE_BATCH_SIZE", 20))
+    with _lock:
+        queued = _pending.get(model, [])
+        batch, _pending[model] = queued[:size], queued[size:]
+    try:
+        if batch:
+            await _batch_titles(app, model, batch)
+    finally:
+        with _lock:
+            more = bool(_pending.get(model))
+            if not more:
+                _pending.pop(model, None)
+                _scheduled.discard(model)
+        if more:
+            _schedule_batch(app, model, 0)
+
+
+async def _batch_titles(app, model: str, batch: list[_PendingTitle]) -> None:
+    if len(batch) == 1:
+        item = batch[0]
+        await _model_title(app, item.session_id, item.message, model, item.expected)
+        return
+    messages = {str(i): item.message[:500] for i, item in enumerate(batch, start=1)}
+    prompt = [
+        {"role": "system", "content": _BATCH_INSTRUCTIONS},
+        {"role": "user", "content": json.dumps(messages, ensure_ascii=False)},
+    ]
+    with app.app_context():
+        reply = await llm.complete_response(prompt, model)
+    with _lock:
+        _stats["llm_calls"] += 1
+        _stats["batches"] += 1
+        _stats["batched_sessions"] += len(batch)
+    titles = _parse_batch_reply(reply)
+    if not titles:
+        logger.warning("Batched title reply for %s sessions was not usable", len(batch))
+    for i, item in enumerate(batch, start=1):
+        title = titles.get(str(i))
+        if title:
+            await asyncio.to_thread(_apply_title, app, item.session_id, title, item.expected)
+
+
+def _parse_batch_reply(reply: str) -> dict[str, str]:
+    start, end = reply.find("{"), reply.rfind("}")
+    if start < 0 or end <= start:
+        return {}
+    try:
+        data = json.loads(reply[start : end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {str(k): _clean_title(v) for k, v in data.items() if isinstance(v, str) and v.strip()}
+
+
+async def _model_title(app, session_id: str, message: str, model: str, expected: str) -> None:
+    """One model call for one session; errors are logged and counted by ``aux_jobs``."""
+    prompt = [
+        {"role": "system", "content": _TITLE_INSTRUCTIONS},
+        {
+            "role": "user",
+            "content": f"Create a short title for a chat session based on this user message: {message}",
+        },
+    ]
+    with app.app_context():
+        reply = await llm.complete_response(prompt, model, cache_site="title")
+    with _lock:
+        _stats["llm_calls"] += 1
+    title = "" if reply in llm.FAILED_COMPLETIONS else _clean_title(reply)
+    if title:
+        await asyncio.to_thread(_apply_title, app, session_id, title, expected)
+
+
+def _apply_title(app, session_id: str, title: str, expected: str) -> None:
+    with app.app_context():
+        try:
+            # Compare and set under the session lock; a background title is
+            # not activity, so the session keeps its place in the list.
+            with chat_store.session_transaction(session_id, touch=False) as tx:
+                if tx.header.get("title") != expected:
+                    outcome = "kept"  # renamed meanwhile
+                else:
+                    tx.set_title(title)
+                    outcome = "upgraded"
+        except FileNotFoundError:
+            outcome = "kept"
+    with _lock:
+        _stats[outcome] += 1
+    if outcome == "upgraded":
+        logger.info("Generated title for session %s: %s", session_id, title)
+
+
+def stats() -> dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "strategy": title_strategy(),
+            "pending": sum(len(items) for items in _pending.values()),
+        }
@@ -135,6 +135,7 @@ document.addEventListener("DOMContentLoaded", () => {
     modeDraft: "ask",
     internal: [],
     mcp: [],
+    mcpServers: [],
     appliedInternal: new Set(),
     appliedMcp: new Set(),
     draftInternal: new Set(),
@@ -267,6 +268,20 @@ document.addEventListener("DOMContentLoaded", () => {
       mcpSection.appendChild(details);
     });
 
+    // Servers that failed or timed out while listing: show why, keep the rest usable.
+    toolState.mcpServers
+      .filter((server) => !server.ok)
+      .forEach((server) => {
+        const row = document.createElement("div");
+        row.className = "mt-2 rounded-lg border border-rose-200/70 bg-rose-50/60 px-3 py-2 text-xs text-rose-700 dark:border-rose-900/60 dark:bg-rose-950/30 dark:text-rose-300";
+        const name = document.createElement("span");
+        name.className = "font-semibold";
+        name.textContent = server.name;
+        row.appendChild(name);
+        row.appendChild(document.createTextNode(`: unavailable (${server.error || "error"})`));
+        mcpSection.appendChild(row);
+      });
+
     toolListEl.appendChild(mcpSection);
   };
 
@@ -281,6 +296,7 @@ document.addEventListener("DOMContentLoaded", () => {
       toolState.modeDraft = toolState.modeApplied;
       toolState.internal = data.internal || [];
       toolState.mcp = data.mcp || [];
+      toolState.mcpServers = data.mcp_servers || [];
       toolState.mcpEnabled = data.mcp_enabled !== false;
       toolState.mcpReason = data.reason || null;
       toolState.appliedInternal = new Set(
@@ -302,6 +318,7 @@ document.addEventListener("DOMContentLoaded", () => {
       console.debug("Unable to load tools", err);
       toolState.internal = [];
       toolState.mcp = [];
+      toolState.mcpServers = [];
       toolState.appliedInternal = new Set();
       toolState.appliedMcp = new Set();
       toolState.draftInternal = new Set();
@@ -610,28 +627,33 @@ document.addEventListener("DOMContentLoaded", () => {
       const response = await fetch(`/chat/${sessionId}/info`);
       if (response.ok) {
         const data = await response.json();
-        const currentTitle = sessionTitleEl.textContent;
-        if (data.title !== currentTitle && data.title !== "New chat") {
-          // Update main title
-          sessionTitleEl.textContent = data.title;
-          
-          // Update sidebar title for current session
-          const sidebarTitleEl = document.querySelector(`[data-session-id="${sessionId}"] .session-title`);
-          if (sidebarTitleEl) {
-            sidebarTitleEl.textContent = data.title;
-          }
-          
-          // Update page title
-          document.title = `${data.title} - Parlanchina`;
-        }
+        applySessionTitle(sessionId, data.title);
       }
     } catch (err) {
       console.debug("Failed to check for title update:", err);
     }
   };
 
-  const initializeExistingMessages = () => {
-    document.querySelectorAll('.assistant-message-wrapper').forEach((wrapper) => {
+  const applySessionTitle = (sessionId, title) => {
+    const currentTitle = sessionTitleEl.textContent;
+    if (!title || title === currentTitle || title === "New chat") {
+      return;
+    }
+    // Update main title
+    sessionTitleEl.textContent = title;
+
+    // Update sidebar title for current session
+    const sidebarTitleEl = document.querySelector(`[data-session-id="${sessionId}"] .session-title`);
+    if (sidebarTitleEl) {
+      sidebarTitleEl.textContent = title;
+    }
+
+    // Update page title
+    document.title = `${title} - Parlanchina`;
+  };
+
+  const initializeExistingMessages = (root = document) => {
+    root.querySelectorAll('.assistant-message-wrapper').forEach((wrapper) => {
       const content = wrapper.querySelector('.prose');
       if (!content) {
         return;
@@ -650,6 +672,55 @@ document.addEventListener("DOMContentLoaded", () => {
   initializeExistingMessages();
   runMermaid();
 
+  // Only the latest page is rendered server-side; older pages are fetched
+  // as the user scrolls towards the top.
+  const olderMessagesEl = document.getElementById('older-messages');
+  let loadingOlderMessages = false;
+
+  const loadOlderMessages = async () => {
+    const before = Number(messagesEl.dataset.firstIndex || 0);
+    if (loadingOlderMessages || before <= 0) {
+      return;
+    }
+    loadingOlderMessages = true;
+    try {
+      const response = await fetch(`/chat/${getCurrentSessionId()}/messages?before=${before}&format=html`);
+      if (!response.ok) {
+        return;
+      }
+      const data = await response.json();
+      const fragment = document.createElement('div');
+      fragment.innerHTML = data.html;
+      initializeExistingMessages(fragment);
+
+      const anchor = olderMessagesEl ? olderMessagesEl.nextSibling : messagesEl.firstChild;
+      const previousHeight = messagesEl.scrollHeight;
+      while (fragment.firstChild) {
+        messagesEl.insertBefore(fragment.firstChild, anchor);
+      }
+      // Keep the message the user was looking at in place.
+      messagesEl.scrollTop += messagesEl.scrollHeight - previousHeight;
+      messagesEl.dataset.firstIndex = String(data.start);
+      if (!data.has_more && olderMessagesEl) {
+        olderMessagesEl.remove();
+      }
+      runMermaid();
+    } catch (err) {
+      console.debug("Failed to load older messages:", err);
+    } finally {
+      loadingOlderMessages = false;
+    }
+  };
+
+  if (olderMessagesEl) {
+    messagesEl.scrollTop = messagesEl.scrollHeight;
+    messagesEl.addEventListener('scroll', () => {
+      if (messagesEl.scrollTop < 200) {
+        loadOlderMessages();
+      }
+    });
+  }
+
   const appendUserBubble = (content) => {
     const wrapper = document.createElement("div");
     wrapper.className = "flex justify-end";
@@ -721,6 +792,7 @@ document.addEventListener("DOMContentLoaded", () => {
     let pendingImages = [];
     let collectedImages = [];
     let remainder = "";
+    let toolProgress = null;
 
     const markMermaidRendering = () => {
       if (!hasMermaid && containsMermaidFence(buffer)) {
@@ -738,9 +810,12 @@ document.addEventListener("DOMContentLoaded", () => {
       const showImageIndicator =
         messageWrapper.dataset.imageIndicatorShown === 'true' &&
         messageWrapper.dataset.isRenderingImage === 'true';
-      const prefix = showImageIndicator
+      let prefix = showImageIndicator
         ? '<p class="text-sm text-slate-500 mb-2">Generating image...</p>'
         : '';
+      if (!prefix && toolProgress && !buffer) {
+        prefix = `<p class="text-sm text-slate-500 mb-2">Running tools… ${toolProgress.completed}/${toolProgress.total} done</p>`;
+      }
       contentDiv.innerHTML = prefix + safeHtml;
       messageWrapper.dataset.rawText = buffer;
       wrapMermaidDiagrams(contentDiv);
@@ -808,6 +883,10 @@ document.addEventListener("DOMContentLoaded", () => {
             case 'image':
               handleImageEvent(payload);
               break;
+            case 'tool_progress':
+              toolProgress = { completed: payload.completed || 0, total: payload.total || 0 };
+              renderBuffer();
+              break;
             case 'error':
               contentDiv.innerHTML = `<p class="text-sm text-red-500">${payload.message || 'Streaming error.'}</p>`;
               break;
@@ -975,6 +1054,7 @@ document.addEventListener("DOMContentLoaded", () => {
           toolState.modeDraft = toolState.modeApplied;
           toolState.internal = data.internal || toolState.internal;
           toolState.mcp = data.mcp || toolState.mcp;
+          toolState.mcpServers = data.mcp_servers || toolState.mcpServers;
           toolState.appliedInternal = new Set(
             (data.internal || []).filter((tool) => tool.applied).map((tool) => tool.id)
           );
@@ -1007,14 +1087,22 @@ document.addEventListener("DOMContentLoaded", () => {
       appendUserBubble(content);
       textarea.value = "";
 
-      await fetch(`/chat/${sessionId}`, {
+      const postResponse = await fetch(`/chat/${sessionId}`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(payload),
       });
+      const posted = postResponse.ok ? await postResponse.json().catch(() => ({})) : {};
 
-      // If this was the first message, start checking for title updates
+      // The first message may come back with an instant (local) title
       if (isFirstMessage) {
+        applySessionTitle(sessionId, posted.title);
+      }
+
+      // If a model title is on its way, start checking for title updates
+      if (isFirstMessage && posted.title_pending === false) {
+        isFirstMessage = false;
+      } else if (isFirstMessage) {
         isFirstMessage = false;
         // Start checking for title updates after a short delay
         setTimeout(() => {
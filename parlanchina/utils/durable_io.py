@@ -0,0 +1,214 @@
+"""Crash-safe file writes and cross-process locks for the file-based stores.
+
+Writes go to a temporary sibling and are moved into place with ``os.replace``,
+so readers see either the old or the new file, never a truncated one. How hard
+we push data to disk is controlled by a durability mode:
+
+- ``always``: fsync the file (and its directory after a rename) on every write.
+- ``batched``: remember written paths and fsync them from a background thread
+  every ``interval`` seconds.
+- ``never``: leave flushing to the OS.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - platform specific
+    fcntl = None
+
+try:  # Windows
+    import msvcrt
+except ImportError:  # pragma: no cover - platform specific
+    msvcrt = None
+
+DURABILITY_MODES = ("always", "batched", "never")
+
+
+def _fsync_path(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # Directories cannot be fsynced on every platform.
+        pass
+    finally:
+        os.close(fd)
+
+
+class Durability:
+    def __init__(self, mode: str = "batched", interval: float = 1.0) -> None:
+        if mode not in DURABILITY_MODES:
+            logger.warning("Unknown durability mode %r; using batched", mode)
+            mode = "batched"
+        self.mode = mode
+        self.interval = interval
+        self._pending: set[Path] = set()
+        self._lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+
+    def after_write(self, fileobj) -> None:
+        """Call with the still-open file object after writing to it."""
+        if self.mode == "always":
+            fileobj.flush()
+            os.fsync(fileobj.fileno())
+        elif self.mode == "batched":
+            self._schedule(Path(fileobj.name))
+
+    def after_replace(self, path: Path) -> None:
+        """Call after ``os.replace`` moved a file into ``path``."""
+        if self.mode == "always":
+            _fsync_path(path.parent)
+        elif self.mode == "batched":
+            self._schedule(path)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        directories: set[Path] = set()
+        for path in pending:
+            _fsync_path(path)
+            directories.add(path.parent)
+        for directory in directories:
+            _fsync_path(directory)
+
+    def _schedule(self, path: Path) -> None:
+        with self._lock:
+            self._pending.add(path)
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._run_flusher, name="parlanchina-fsync", daemon=True
+                )
+                self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:  # pragma: no cover - background safety
+                logger.exception("Batched fsync failed")
+
+
+def tmp_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def atomic_write_bytes(path: Path, data: bytes, durability: Durability | None = None) -> None:
+    tmp = tmp_path(path)
+    try:
+        with tmp.open("wb") as f:
+            f.write(data)
+            if durability is not None and durability.mode == "always":
+                durability.after_write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if durability is not None:
+        durability.after_replace(path)
+
+
+class ProcessLocks:
+    """Striped advisory locks on a single lock file, shared between processes.
+
+    Each key hashes to one byte of ``lock_path``; the byte is locked with
+    ``fcntl.lockf`` (or ``msvcrt.locking`` on Windows). Record locks belong to
+    the process, so in-process exclusion is the caller's job (a thread lock per
+    key) and stripes are reference counted here so two threads sharing a stripe
+    do not release it under each other. Without either module this is a no-op.
+    """
+
+    STRIPES = 1 << 16
+
+    def __init__(self, lock_path: Path) -> None:
+        self._fd: int | None = None
+        self._counts: dict[int, int] = {}
+        self._held: set[int] = set()
+        self._taking: set[int] = set()
+        self._cond = threading.Condition()
+        if fcntl is None and msvcrt is None:
+            return
+        try:
+            # Never closed: closing any descriptor drops all of our fcntl locks.
+            self._fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            logger.warning("Cannot open lock file %s; cross-process locking disabled", lock_path)
+
+    def _stripe(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.STRIPES
+
+    def acquire(self, key: str) -> None:
+        if self._fd is None:
+            return
+        stripe = self._stripe(key)
+        with self._cond:
+            self._counts[stripe] = self._counts.get(stripe, 0) + 1
+            # Another thread may be taking this stripe for the process.
+            while stripe in self._taking:
+                self._cond.wait()
+            if stripe in self._held:
+                return
+            self._taking.add(stripe)
+        try:
+            self._lock(stripe)
+        except BaseException:
+            with self._cond:
+                self._taking.discard(stripe)
+                self._decrement(stripe)
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._taking.discard(stripe)
+            self._held.add(stripe)
+            self._cond.notify_all()
+
+    def release(self, key: str) -> None:
+        if self._fd is None:
+            return
+        stripe = self._stripe(key)
+        with self._cond:
+            if self._decrement(stripe):
+                return
+            self._held.discard(stripe)
+            self._unlock(stripe)
+
+    def _decrement(self, stripe: int) -> int:
+        remaining = self._counts.get(stripe, 1) - 1
+        if remaining:
+            self._counts[stripe] = remaining
+        else:
+            self._counts.pop(stripe, None)
+        return remaining
+
+    def _lock(self, stripe: int) -> None:
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe, os.SEEK_SET)
+        else:  # pragma: no cover - Windows
+            while True:
+                os.lseek(self._fd, stripe, os.SEEK_SET)
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                    return
+                except OSError:
+                    # LK_LOCK gives up after ~10s; keep waiting like lockf does.
+                    continue
+
+    def _unlock(self, stripe: int) -> None:
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe, os.SEEK_SET)
+        else:  # pragma: no cover - Windows
+            os.lseek(self._fd, stripe, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
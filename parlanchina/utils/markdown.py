@@ -6,6 +6,9 @@ import html
 import bleach
 from markdown_it import MarkdownIt
 
+# Bump whenever the renderer or sanitizer output changes; cached HTML is keyed on it.
+RENDERER_VERSION = 1
+
 
 def _build_renderer() -> MarkdownIt:
     md = MarkdownIt("commonmark", {"linkify": True})
@@ -0,0 +1,20 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+
+def pytest_configure(config):
+    # Importing ``parlanchina`` builds an app for the resolved root, so point it
+    # away from the checkout before any test module is collected.
+    root = tempfile.mkdtemp(prefix="parlanchina-tests-")
+    os.environ["PARLANCHINA_ROOT"] = root
+    os.environ["PARLANCHINA_MODE"] = "dev"
+    config.add_cleanup(lambda: shutil.rmtree(root, ignore_errors=True))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_root(tmp_path, monkeypatch):
+    monkeypatch.setenv("PARLANCHINA_ROOT", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
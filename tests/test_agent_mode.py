@@ -0,0 +1,147 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from parlanchina.services import llm
+from parlanchina.services.rate_limiter import RateLimited
+
+
+def _chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta)])
+
+
+def _text(*parts: str) -> list:
+    return [_chunk(content=part) for part in parts]
+
+
+def _tool_call(name: str = "internal.image") -> list:
+    function = SimpleNamespace(name=name, arguments='{"prompt": "cat"}')
+    return [_chunk(tool_calls=[SimpleNamespace(index=0, id="call-1", function=function)])]
+
+
+class FakeClient:
+    """Chat-completions stub: each create() plays the next scripted turn."""
+
+    def __init__(self, turns: list) -> None:
+        self.turns = list(turns)
+        self.requests: list[dict] = []
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **request):
+        self.requests.append(request)
+        turn = self.turns.pop(0)
+        chunks, error = turn if isinstance(turn, tuple) else (turn, None)
+
+        async def _stream():
+            for chunk in chunks:
+                yield chunk
+            if error is not None:
+                raise error
+
+        return _stream()
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setenv("PARLANCHINA_AGENT_PLANNER", "off")
+    monkeypatch.setenv("PARLANCHINA_STREAM_USAGE", "false")
+
+    async def execute(call):
+        return "tool result", []
+
+    async def no_completion(messages, model, **kwargs):
+        raise AssertionError("unexpected completion call")
+
+    monkeypatch.setattr(llm, "_execute_tool_call", execute)
+    monkeypatch.setattr(llm, "complete_response", no_completion)
+
+    def run(turns: list, text: str = "draw a cat") -> tuple[list[llm.LLMEvent], FakeClient]:
+        client = FakeClient(turns)
+        monkeypatch.setattr(llm, "_get_client", lambda: client)
+
+        async def collect():
+            stream = llm.stream_response(
+                [{"role": "user", "content": text}], "gpt-test", "agent", ["internal.image"]
+            )
+            return [event async for event in stream]
+
+        return asyncio.run(collect()), client
+
+    return run
+
+
+def test_agent_answers_are_streamed_as_deltas(agent):
+    events, _ = agent([_tool_call(), _text("Here ", "is ", "a cat.")])
+
+    deltas = [e.text for e in events if e.type == "text_delta"]
+    assert deltas == ["Here ", "is ", "a cat."]
+    assert events[-1].type == "text_done"
+    assert events[-1].text == "Here is a cat."
+
+
+def test_failed_summary_turn_reports_an_error_after_partial_output(agent):
+    turns = [_tool_call() for _ in range(6)]
+    turns.append((_text("Partial "), RateLimited("busy", retry_after=3)))
+
+    events, _ = agent(turns)
+
+    assert [e.text for e in events if e.type == "text_delta"][-1] == "Partial "
+    assert events[-1].type == "error"
+    assert "rate limit" in events[-1].text
+    assert not any(e.type == "text_done" for e in events)
+
+
+def test_plan_is_cancelled_when_building_tool_payloads_fails(monkeypatch):
+    monkeypatch.setenv("PARLANCHINA_AGENT_PLANNER", "concurrent")
+    plan_started = asyncio.Event()
+    plan_cancelled = False
+
+    async def slow_plan(messages, model, **kwargs):
+        nonlocal plan_cancelled
+        plan_started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            plan_cancelled = True
+            raise
+
+    async def broken_payloads(**kwargs):
+        await plan_started.wait()
+        raise RuntimeError("catalog unavailable")
+
+    monkeypatch.setattr(llm, "complete_response", slow_plan)
+    monkeypatch.setattr(llm, "_build_agent_tool_payloads", broken_payloads)
+    monkeypatch.setattr(llm, "_get_client", lambda: FakeClient([]))
+
+    async def scenario():
+        text = "a long enough request to be worth planning first"
+        with pytest.raises(RuntimeError):
+            async for _ in llm.stream_response(
+                [{"role": "user", "content": text}], "gpt-test", "agent", ["internal.image"]
+            ):
+                pass
+        # Checked before asyncio.run() cancels whatever is left over.
+        await asyncio.sleep(0)
+        return plan_cancelled
+
+    assert asyncio.run(scenario())
+
+
+def test_plan_goes_in_a_system_note_before_the_user_message(agent, monkeypatch):
+    monkeypatch.setenv("PARLANCHINA_AGENT_PLANNER", "concurrent")
+
+    async def plan(messages, model, **kwargs):
+        return "1. Call generate_image."
+
+    monkeypatch.setattr(llm, "complete_response", plan)
+    llm._plan_cache.clear()
+
+    _, client = agent([_text("Done.")], text="draw a cat, please, in watercolour")
+
+    sent = client.requests[0]["messages"]
+    assert [m["role"] for m in sent] == ["system", "system", "user"]
+    assert sent[0]["content"] == llm._AGENT_SYSTEM_PROMPT
+    assert "1. Call generate_image." in sent[1]["content"]
+    assert sent[2]["content"] == "draw a cat, please, in watercolour"
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from parlanchina.services.aux_jobs import AuxJobQueue, QueueFull
+from parlanchina.services.background_loop import BackgroundLoop
+
+
+@pytest.fixture
+def loop():
+    loop = BackgroundLoop("test-aux")
+    yield loop
+    loop.close()
+
+
+def _sleeper(running: list[int], peak: list[int], delay: float = 0.05):
+    async def job():
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(delay)
+        running[0] -= 1
+        return "done"
+
+    return job
+
+
+def test_a_burst_runs_on_a_fixed_number_of_workers(loop):
+    queue = AuxJobQueue(loop, workers=2)
+    running, peak = [0], [0]
+
+    futures = [queue.submit("title", i, _sleeper(running, peak)) for i in range(6)]
+
+    assert [f.result(timeout=5) for f in futures] == ["done"] * 6
+    assert peak[0] == 2
+    assert queue.stats()["kinds"]["title"]["completed"] == 6
+    queue.close()
+
+
+def test_jobs_with_the_same_key_share_one_run(loop):
+    queue = AuxJobQueue(loop, workers=2)
+    calls = []
+
+    async def job():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "title"
+
+    first = queue.submit("title", "session-1", job)
+    second = queue.submit("title", "session-1", job)
+
+    assert second is first
+    assert first.result(timeout=5) == "title"
+    assert len(calls) == 1
+    assert queue.stats()["kinds"]["title"]["deduplicated"] == 1
+    queue.close()
+
+
+def test_a_full_queue_rejects_new_jobs(loop):
+    queue = AuxJobQueue(loop, workers=1, max_queue=1)
+    running, peak = [0], [0]
+    queue.submit("title", 1, _sleeper(running, peak, delay=0.2))
+    time.sleep(0.05)  # The first job is now running, not queued.
+    queue.submit("title", 2, _sleeper(running, peak))
+
+    rejected = queue.submit("title", 3, _sleeper(running, peak))
+
+    with pytest.raises(QueueFull):
+        rejected.result(timeout=1)
+    assert queue.stats()["kinds"]["title"]["dropped"] == 1
+    queue.close()
+
+
+def test_a_slow_job_times_out_without_blocking_the_worker(loop):
+    queue = AuxJobQueue(loop, workers=1, timeout=0.05)
+    running, peak = [0], [0]
+
+    slow = queue.submit("title", 1, _sleeper(running, peak, delay=5))
+    fast = queue.submit("title", 2, _sleeper(running, peak, delay=0))
+
+    with pytest.raises(TimeoutError):
+        slow.result(timeout=2)
+    assert fast.result(timeout=2) == "done"
+    assert queue.stats()["kinds"]["title"]["timed_out"] == 1
+    queue.close()
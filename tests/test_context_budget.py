@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from parlanchina.app import create_app
+from parlanchina.paths import ensure_app_dirs
+from parlanchina.services import chat_store, context_budget, llm
+
+# 400 characters count as 100 tokens, plus the per-message overhead.
+MESSAGE_TOKENS = 100 + context_budget.MESSAGE_OVERHEAD_TOKENS
+
+
+@pytest.fixture(autouse=True)
+def char_counting(monkeypatch):
+    monkeypatch.setattr(context_budget, "_tiktoken_available", False)
+    monkeypatch.setenv("PARLANCHINA_CONTEXT_MAX_TOKENS", "1000")
+    monkeypatch.setenv("PARLANCHINA_CONTEXT_RECENT_TURNS", "2")
+
+
+def _conversation(turns: int) -> list[dict]:
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"q{i}".ljust(400, ".")})
+        messages.append({"role": "assistant", "content": f"a{i}".ljust(400, ".")})
+    return messages
+
+
+def test_short_history_is_sent_whole():
+    messages = _conversation(3)
+
+    plan = context_budget.build_context(messages)
+
+    assert plan.messages == messages
+    assert plan.total_tokens == 6 * MESSAGE_TOKENS
+    assert not plan.needs_summary
+
+
+def test_long_history_keeps_the_recent_turns_within_budget():
+    messages = _conversation(10)
+
+    plan = context_budget.build_context(messages)
+
+    assert plan.window_start == 16
+    assert plan.sent_tokens <= 1000
+    assert plan.messages == messages[11:]
+    assert plan.dropped == 11
+    assert plan.needs_summary
+
+
+def test_summary_replaces_the_summarised_messages():
+    messages = _conversation(10)
+    summary = {"text": "The user asked about q0 to q3.", "through": 8}
+
+    plan = context_budget.build_context(messages, summary)
+
+    assert plan.messages[0]["role"] == "system"
+    assert plan.messages[0]["content"].endswith(summary["text"])
+    kept = plan.messages[1:]
+    assert kept == messages[-len(kept) :]
+    assert len(kept) <= len(messages) - plan.summary_through
+    assert plan.sent_tokens <= 1000
+
+
+def test_latest_user_message_is_kept_even_when_over_budget():
+    messages = _conversation(2) + [{"role": "user", "content": "x" * 8000}]
+
+    plan = context_budget.build_context(messages)
+
+    assert plan.messages[-1] is messages[-1]
+
+
+def test_token_counts_are_cached_by_content():
+    message = {"role": "user", "content": "cached content"}
+    before = context_budget.stats()["count_hits"]
+
+    context_budget.message_tokens(message)
+    context_budget.message_tokens(dict(message))
+
+    assert context_budget.stats()["count_hits"] == before + 1
+
+
+def test_summary_advances_over_the_dropped_turns(tmp_path, monkeypatch):
+    prompts = []
+
+    async def complete_response(prompt, model, **kwargs):
+        prompts.append(prompt[-1]["content"])
+        return f"summary {len(prompts)}"
+
+    monkeypatch.setattr(llm, "complete_response", complete_response)
+    app = create_app(tmp_path, ensure_app_dirs(tmp_path))
+    with app.app_context():
+        session_id = chat_store.create_session("Long", "gpt-test")["id"]
+        for message in _conversation(10):
+            if message["role"] == "user":
+                chat_store.append_user_message(session_id, message["content"])
+            else:
+                chat_store.append_assistant_message(session_id, message["content"])
+
+    asyncio.run(context_budget._advance_summary(app, session_id, "gpt-test"))
+
+    with app.app_context():
+        summary = chat_store.load_session(session_id)["context_summary"]
+        # A concurrent update that started from an older summary is discarded.
+        assert not context_budget._store_summary(session_id, "stale", 0, 16, "gpt-test")
+    assert summary["text"] == "summary 1"
+    assert summary["through"] == 16
+    assert "q0" in prompts[0] and "q8" not in prompts[0]
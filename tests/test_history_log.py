@@ -0,0 +1,95 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from parlanchina.__main__ import main
+from parlanchina.services.history_log import HistoryLog
+
+
+def _ts(minutes: int) -> str:
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return (base + timedelta(minutes=minutes)).isoformat()
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = HistoryLog(tmp_path, flush_interval=3600, block_bytes=200, max_bytes=1000)
+    yield log
+    log.close()
+
+
+def test_read_range_spans_rotated_and_compressed_segments(tmp_path, log):
+    for minute in range(60):
+        log.append({"ts": _ts(minute), "text": f"message {minute}"})
+    log.flush()
+    log.close()
+
+    assert list((tmp_path / "history").glob("history-*.jsonl.gz"))
+    reopened = HistoryLog(tmp_path, flush_interval=3600)
+    try:
+        entries = list(reopened.read_range(_ts(10), _ts(45)))
+    finally:
+        reopened.close()
+    assert [e["text"] for e in entries] == [f"message {m}" for m in range(10, 45)]
+
+
+def test_age_rotation_does_not_reread_the_index(tmp_path, monkeypatch):
+    log = HistoryLog(tmp_path, flush_interval=3600, max_age=0.2)
+    try:
+        log.append({"ts": datetime.now(timezone.utc).isoformat(), "text": "first"})
+        log.flush()
+
+        def fail():
+            raise AssertionError("index read on flush")
+
+        with monkeypatch.context() as patched:
+            patched.setattr(log, "_read_index", fail)
+            log.append({"ts": datetime.now(timezone.utc).isoformat(), "text": "second"})
+            log.flush()
+        assert not list((tmp_path / "history").glob("history-*"))
+
+        time.sleep(0.25)
+        log.append({"ts": datetime.now(timezone.utc).isoformat(), "text": "third"})
+        log.flush()
+        assert list((tmp_path / "history").glob("history-*"))
+    finally:
+        log.close()
+
+
+def test_failed_write_keeps_entries_for_the_next_flush(tmp_path, log, monkeypatch):
+    log.append({"ts": _ts(0), "text": "kept"})
+    handle = log._active_handle()
+
+    class BrokenHandle:
+        def fileno(self):
+            return handle.fileno()
+
+        def write(self, data):
+            handle.write(data[:5])
+            handle.flush()
+            raise OSError("disk full")
+
+        def close(self):
+            handle.close()
+
+    with monkeypatch.context() as patched, pytest.raises(OSError):
+        patched.setattr(log, "_active_handle", lambda: BrokenHandle())
+        log.flush()
+
+    log.append({"ts": _ts(1), "text": "next"})
+    log.flush()
+    assert [e["text"] for e in log.read_range()] == ["kept", "next"]
+
+
+def test_history_command_prints_a_range(tmp_path, capsys):
+    log = HistoryLog(tmp_path / "data", flush_interval=3600)
+    for minute in range(3):
+        log.append({"ts": _ts(minute), "role": "user", "text": str(minute)})
+    log.close()
+
+    main(["history", "--root", str(tmp_path), "--since", _ts(1)])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["text"] for line in lines] == ["1", "2"]
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from parlanchina.services.json_store import JsonChatStore
+
+
+def _session(session_id: str, messages: list[dict] | None = None) -> dict:
+    return {
+        "id": session_id,
+        "title": "Title",
+        "model": "gpt-test",
+        "mode": "ask",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": "2026-01-01T00:00:00+00:00",
+        "messages": messages or [],
+    }
+
+
+def _user(text: str) -> dict:
+    return {"role": "user", "content": text}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JsonChatStore(tmp_path)
+    yield store
+    store.close()
+
+
+def test_legacy_session_is_listed_and_migrated_on_write(tmp_path, store):
+    legacy = _session("old", [_user("hi")])
+    (tmp_path / "sessions" / "old.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    assert [s["id"] for s in store.list_sessions()] == ["old"]
+    assert store.load_session("old")["messages"] == [_user("hi")]
+
+    header = store.append_message("old", {"role": "assistant", "raw_markdown": "yo"}, {})
+
+    assert header["message_count"] == 2
+    on_disk = json.loads((tmp_path / "sessions" / "old.json").read_text(encoding="utf-8"))
+    assert "messages" not in on_disk
+    assert (tmp_path / "sessions" / "old.messages.jsonl").exists()
+    assert (tmp_path / "sessions" / "old.state").exists()
+
+    reopened = JsonChatStore(tmp_path)
+    try:
+        messages = reopened.load_session("old")["messages"]
+        assert messages == [_user("hi"), {"role": "assistant", "raw_markdown": "yo"}]
+    finally:
+        reopened.close()
+
+
+def test_torn_tail_is_ignored_and_overwritten(tmp_path, store):
+    store.save_session(_session("s1", [_user("one"), _user("two")]))
+    log = tmp_path / "sessions" / "s1.messages.jsonl"
+    with open(log, "ab") as f:
+        f.write(b'{"role": "user", "conte')
+
+    reopened = JsonChatStore(tmp_path)
+    try:
+        assert [m["content"] for m in reopened.load_session("s1")["messages"]] == ["one", "two"]
+        reopened.append_message("s1", _user("three"), {})
+        assert [m["content"] for m in reopened.load_session("s1")["messages"]] == ["one", "two", "three"]
+    finally:
+        reopened.close()
+
+    fresh = JsonChatStore(tmp_path)
+    try:
+        header, messages = fresh.load_messages("s1", -1, None)
+        assert header["message_count"] == 3
+        assert messages == [_user("three")]
+    finally:
+        fresh.close()
+
+
+def test_compaction_drops_a_torn_tail(tmp_path, store):
+    store.save_session(_session("s1", [_user("one")]))
+    log = tmp_path / "sessions" / "s1.messages.jsonl"
+    with open(log, "ab") as f:
+        f.write(b'{"role": "us')
+
+    assert store.compact_session("s1")
+    state = json.loads((tmp_path / "sessions" / "s1.state").read_text(encoding="utf-8"))
+    assert log.stat().st_size == state["log_bytes"]
+    assert store.load_session("s1")["messages"] == [_user("one")]
+
+
+def test_append_does_not_rewrite_the_header(tmp_path, store):
+    store.save_session(_session("s1"))
+    header_path = tmp_path / "sessions" / "s1.json"
+    before = header_path.stat().st_ino
+
+    store.append_message("s1", _user("hello"), {"updated_at": "2026-01-02T00:00:00+00:00"})
+
+    assert header_path.stat().st_ino == before
+    assert store.list_sessions()[0]["updated_at"] == "2026-01-02T00:00:00+00:00"
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from parlanchina.services.background_loop import BackgroundLoop
+from parlanchina.services.mcp_catalog import ToolCatalog
+
+SERVER = SimpleNamespace(name="srv", command="server")
+
+
+def _tool(name: str) -> SimpleNamespace:
+    return SimpleNamespace(name=name)
+
+
+class FakeServer:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.version = 1
+        self.calls = 0
+        self.fail = False
+
+    async def list_tools(self, config):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("server down")
+        return [_tool(f"tool_v{self.version}")]
+
+
+@pytest.fixture
+def loop():
+    loop = BackgroundLoop("test-catalog")
+    yield loop
+    loop.close()
+
+
+def _names(tools) -> list[str]:
+    return [tool.name for tool in tools]
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_fresh_listings_are_served_from_the_cache(loop):
+    server = FakeServer()
+    catalog = ToolCatalog(server.list_tools, loop=loop, ttl=60)
+
+    assert _names(catalog.tools(SERVER, 1)) == ["tool_v1"]
+    assert catalog.tool(SERVER, 1, "tool_v1").name == "tool_v1"
+    assert server.calls == 1
+    assert catalog.stats()["srv"]["hits"] == 1
+
+
+def test_config_or_file_changes_invalidate_the_listing(loop):
+    server = FakeServer()
+    catalog = ToolCatalog(server.list_tools, loop=loop, ttl=60)
+    catalog.tools(SERVER, 1)
+
+    catalog.tools(SERVER, 2)
+    catalog.tools(SimpleNamespace(name="srv", command="other"), 2)
+
+    assert server.calls == 3
+
+
+def test_stale_listing_is_served_while_refreshing(loop):
+    server = FakeServer()
+    catalog = ToolCatalog(server.list_tools, loop=loop, ttl=0.05, max_stale=60)
+    catalog.tools(SERVER, 1)
+    server.version = 2
+    time.sleep(0.06)
+
+    assert _names(catalog.tools(SERVER, 1)) == ["tool_v1"]
+    _wait_for(lambda: catalog.stats()["srv"]["refreshes"] == 1)
+    assert _names(catalog.tools(SERVER, 1)) == ["tool_v2"]
+
+
+def test_failed_refresh_keeps_the_old_listing(loop):
+    server = FakeServer()
+    catalog = ToolCatalog(server.list_tools, loop=loop, ttl=0.05, max_stale=60)
+    catalog.tools(SERVER, 1)
+    server.fail = True
+    time.sleep(0.06)
+
+    catalog.tools(SERVER, 1)
+    _wait_for(lambda: catalog.stats()["srv"]["errors"] == 1)
+
+    assert _names(catalog.tools(SERVER, 1)) == ["tool_v1"]
+    assert catalog.stats()["srv"]["error"] == "server down"
+
+
+def test_concurrent_misses_share_one_listing(loop):
+    server = FakeServer(delay=0.05)
+    catalog = ToolCatalog(server.list_tools, loop=loop, ttl=60)
+
+    async def scenario():
+        return await asyncio.gather(*(catalog.tools_async(SERVER, 1) for _ in range(5)))
+
+    results = loop.run(scenario(), timeout=5)
+    assert [_names(tools) for tools in results] == [["tool_v1"]] * 5
+    assert server.calls == 1
+
+
+def test_listing_finishes_after_the_caller_times_out(loop):
+    server = FakeServer(delay=0.2)
+    catalog = ToolCatalog(server.list_tools, loop=loop, ttl=60)
+
+    with pytest.raises(TimeoutError):
+        loop.run(catalog.tools_async(SERVER, 1), timeout=0.05)
+    time.sleep(0.3)
+
+    assert _names(catalog.tools(SERVER, 1)) == ["tool_v1"]
+    assert server.calls == 1
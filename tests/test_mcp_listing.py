@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pytest
+
+from parlanchina.services import mcp_manager
+from parlanchina.services.background_loop import BackgroundLoop
+from parlanchina.services.mcp_catalog import ToolCatalog
+from parlanchina.services.mcp_manager import MCPToolSummary, _ServerConfig, _TransportConfig
+
+# Per server: seconds to answer, or the error it fails with.
+_BEHAVIOUR = {"fast": 0.2, "also_fast": 0.2, "broken": ConnectionError("refused"), "hung": 5.0}
+
+
+async def _list_tools(server):
+    behaviour = _BEHAVIOUR[server.name]
+    if isinstance(behaviour, Exception):
+        raise behaviour
+    await asyncio.sleep(behaviour)
+    return [MCPToolSummary(name="lookup", description="", input_schema=None)]
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    loop = BackgroundLoop("test-listing")
+    servers = {
+        name: _ServerConfig(name, None, _TransportConfig(type="stdio", command=name))
+        for name in _BEHAVIOUR
+    }
+    monkeypatch.setattr(mcp_manager, "_ensure_servers_loaded", lambda: None)
+    monkeypatch.setattr(mcp_manager, "_fastmcp_available", True)
+    monkeypatch.setattr(mcp_manager, "_servers", servers)
+    monkeypatch.setattr(mcp_manager, "_catalog", ToolCatalog(_list_tools, loop=loop, ttl=60))
+    yield loop
+    loop.close(timeout=1)
+
+
+def test_servers_are_listed_concurrently_and_failures_stay_isolated(loop):
+    started = time.monotonic()
+    tools, statuses = loop.run(mcp_manager.list_all_tools_async(timeout=0.5), timeout=5)
+    elapsed = time.monotonic() - started
+
+    # Sequential listing would take at least 0.2 + 0.2 + 0.5 seconds.
+    assert elapsed < 0.8
+    assert [tool["id"] for tool in tools] == ["fast.lookup", "also_fast.lookup"]
+    by_name = {status.name: status for status in statuses}
+    assert by_name["fast"].ok and by_name["fast"].tool_count == 1
+    assert by_name["broken"].error == "refused"
+    assert by_name["hung"].error == "timed out after 0.5s"
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from parlanchina.services.mcp_pool import MCPClientPool
+
+
+class FakeClient:
+    """Stands in for a fastmcp Client: entering it "starts the server"."""
+
+    def __init__(self, config, connect_delay: float = 0.0) -> None:
+        self.config = config
+        self.connect_delay = connect_delay
+        self.connected = False
+        self.exited = False
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.connect_delay)
+        self.connected = True
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.connected = False
+        self.exited = True
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def ping(self) -> bool:
+        if not self.connected:
+            raise ConnectionError("server exited")
+        return True
+
+
+@pytest.fixture
+def clients():
+    return []
+
+
+@pytest.fixture
+def pool(clients):
+    def connect(config):
+        client = FakeClient(config, connect_delay=0.05)
+        clients.append(client)
+        return client
+
+    pool = MCPClientPool(connect, size=1, health_interval=0)
+    yield pool
+    pool.close()
+
+
+async def _name_of(client):
+    return client.config.name
+
+
+def test_calls_reuse_one_warm_connection(pool, clients):
+    config = SimpleNamespace(name="srv", command="server")
+
+    for _ in range(5):
+        assert pool.run(config, _name_of) == "srv"
+
+    assert len(clients) == 1
+    assert pool.stats()["srv"]["connects"] == 1
+    assert pool.stats()["srv"]["calls"] == 5
+
+
+def test_concurrent_first_calls_open_a_single_connection(pool, clients):
+    config = SimpleNamespace(name="srv", command="server")
+
+    async def scenario():
+        return await asyncio.gather(*(pool.run_async(config, _name_of) for _ in range(4)))
+
+    assert asyncio.run(scenario()) == ["srv"] * 4
+    assert len(clients) == 1
+
+
+def test_a_dead_server_is_reconnected_once(pool, clients):
+    config = SimpleNamespace(name="srv", command="server")
+    pool.run(config, _name_of)
+
+    async def crash_then_answer(client):
+        if client is clients[0]:
+            client.connected = False
+            raise ConnectionError("broken pipe")
+        return "answered"
+
+    assert pool.run(config, crash_then_answer, retry=True) == "answered"
+    assert len(clients) == 2
+    assert clients[0].exited
+
+
+def test_changed_server_config_retires_old_connections(pool, clients):
+    pool.run(SimpleNamespace(name="srv", command="v1"), _name_of)
+    pool.run(SimpleNamespace(name="srv", command="v2"), _name_of)
+
+    assert [c.config.command for c in clients] == ["v1", "v2"]
+    # The old pool closes in the background.
+    deadline = time.monotonic() + 2
+    while not clients[0].exited and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert clients[0].exited
+    assert not clients[1].exited
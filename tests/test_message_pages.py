@@ -0,0 +1,83 @@
+import pytest
+
+from parlanchina.app import create_app
+from parlanchina.paths import ensure_app_dirs
+from parlanchina.services import chat_store
+from parlanchina.services.json_store import JsonChatStore
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("PARLANCHINA_INITIAL_MESSAGES", "3")
+    return create_app(tmp_path, ensure_app_dirs(tmp_path))
+
+
+@pytest.fixture
+def session_id(app):
+    with app.app_context():
+        session_id = chat_store.create_session("Paged", "gpt-test")["id"]
+        for i in range(7):
+            chat_store.append_user_message(session_id, f"message {i}")
+    return session_id
+
+
+def test_pages_walk_back_with_the_before_cursor(app, session_id):
+    client = app.test_client()
+    seen: list[str] = []
+    before = None
+    while True:
+        query = {"limit": 3} if before is None else {"limit": 3, "before": before}
+        page = client.get(f"/chat/{session_id}/messages", query_string=query).get_json()
+        seen = [m["content"] for m in page["messages"]] + seen
+        assert page["total"] == 7
+        if not page["has_more"]:
+            assert page["start"] == 0 and page["next_before"] is None
+            break
+        before = page["next_before"]
+
+    assert seen == [f"message {i}" for i in range(7)]
+
+
+def test_chat_view_renders_only_the_latest_messages(app, session_id):
+    client = app.test_client()
+
+    html = client.get(f"/chat/{session_id}").get_data(as_text=True)
+    assert "message 6" in html and "message 4" in html
+    assert "message 3" not in html
+
+    page = client.get(
+        f"/chat/{session_id}/messages", query_string={"before": 4, "limit": 2, "format": "html"}
+    ).get_json()
+    assert [m["content"] for m in page["messages"]] == ["message 2", "message 3"]
+    assert "message 3" in page["html"]
+
+
+def test_unknown_session_is_not_found(app):
+    assert app.test_client().get("/chat/missing/messages").status_code == 404
+
+
+def test_a_range_is_read_without_loading_the_whole_log(tmp_path, monkeypatch):
+    store = JsonChatStore(tmp_path)
+    messages = [{"role": "user", "content": str(i)} for i in range(50)]
+    store.save_session(
+        {
+            "id": "s1",
+            "title": "Long",
+            "model": "gpt-test",
+            "mode": "ask",
+            "created_at": "2026-01-01T00:00:00+00:00",
+            "updated_at": "2026-01-01T00:00:00+00:00",
+            "messages": messages,
+        }
+    )
+    store.close()
+
+    fresh = JsonChatStore(tmp_path)
+
+    def read_everything(*args):
+        raise AssertionError("whole log read")
+
+    monkeypatch.setattr(fresh, "_read_log", read_everything)
+    header, page = fresh.load_messages("s1", 45, 48)
+    assert header["message_count"] == 50
+    assert page == messages[45:48]
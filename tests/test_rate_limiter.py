@@ -0,0 +1,147 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from parlanchina.services import rate_limiter
+from parlanchina.services.rate_limiter import ModelLimiter, RateLimited
+
+
+def _rate_limit_error(headers: dict | None = None, code: str | None = None) -> openai.RateLimitError:
+    response = SimpleNamespace(
+        status_code=429,
+        headers=headers or {},
+        request=SimpleNamespace(method="POST", url="https://api.test/v1/responses"),
+    )
+    return openai.RateLimitError("slow down", response=response, body={"code": code} if code else None)
+
+
+def _failing(errors: list[Exception], result: str = "ok"):
+    calls = []
+
+    async def factory():
+        calls.append(time.monotonic())
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return factory, calls
+
+
+async def _send(limiter: ModelLimiter, factory, timeout: float = 10.0):
+    permit = await limiter.acquire(1, time.monotonic() + timeout)
+    ok = False
+    try:
+        result = await permit.send(factory)
+        ok = True
+        return result
+    finally:
+        limiter.release(ok)
+
+
+def test_retry_after_header_pauses_then_retries():
+    limiter = ModelLimiter("m", concurrency=4)
+    factory, calls = _failing([_rate_limit_error({"retry-after": "0.3"})])
+
+    assert asyncio.run(_send(limiter, factory)) == "ok"
+
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.29
+    stats = limiter.stats()
+    assert stats["throttled"] == 1
+    assert stats["retries"] == 1
+
+
+def test_retry_after_pauses_other_requests_to_the_model():
+    limiter = ModelLimiter("m", concurrency=4)
+    factory, _ = _failing([_rate_limit_error({"retry-after-ms": "300"})])
+
+    async def scenario():
+        first = asyncio.create_task(_send(limiter, factory))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        await _send(limiter, _failing([])[0])
+        await first
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.2
+
+
+def test_retry_after_values_are_parsed_and_capped():
+    assert rate_limiter._retry_after(_rate_limit_error({"retry-after-ms": "250"})) == 0.25
+    assert rate_limiter._retry_after(_rate_limit_error({"retry-after": "2"})) == 2.0
+    assert rate_limiter._retry_after(_rate_limit_error({"retry-after": "3600"})) == 60.0
+    assert rate_limiter._retry_after(_rate_limit_error({"retry-after": "soon"})) is None
+    assert rate_limiter._retry_after(_rate_limit_error({})) is None
+
+
+def test_retries_stop_after_max_retries():
+    limiter = ModelLimiter("m", max_retries=1)
+    errors = [_rate_limit_error({"retry-after": "0"}) for _ in range(3)]
+    factory, calls = _failing(errors)
+
+    with pytest.raises(RateLimited):
+        asyncio.run(_send(limiter, factory))
+    assert len(calls) == 2
+
+
+def test_insufficient_quota_is_not_retried():
+    limiter = ModelLimiter("m")
+    factory, calls = _failing([_rate_limit_error(code="insufficient_quota")])
+
+    with pytest.raises(RateLimited):
+        asyncio.run(_send(limiter, factory))
+    assert len(calls) == 1
+    assert limiter.stats()["decreases"] == 0
+
+
+def test_aimd_halves_once_per_burst_and_grows_back():
+    limiter = ModelLimiter("m", concurrency=8, max_concurrency=8)
+
+    limiter.failed(_rate_limit_error({"retry-after": "0"}))
+    limiter.failed(_rate_limit_error({"retry-after": "0"}))
+    assert limiter.stats()["limit"] == 4.0
+    assert limiter.stats()["decreases"] == 1
+
+    async def succeed(n: int) -> None:
+        for _ in range(n):
+            await _send(limiter, _failing([])[0])
+
+    asyncio.run(succeed(4))
+    assert 4.8 < limiter.stats()["limit"] < 5.0
+
+    asyncio.run(succeed(200))
+    assert limiter.stats()["limit"] == 8.0
+
+
+def test_concurrency_limit_bounds_in_flight_requests():
+    limiter = ModelLimiter("m", concurrency=2, max_concurrency=2)
+    active = peak = 0
+
+    async def slow():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+        return "ok"
+
+    async def scenario():
+        return await asyncio.gather(*(_send(limiter, slow) for _ in range(6)))
+
+    assert asyncio.run(scenario()) == ["ok"] * 6
+    assert peak == 2
+
+
+def test_waiting_past_the_deadline_raises():
+    limiter = ModelLimiter("m", rpm=6)
+
+    async def scenario():
+        await _send(limiter, _failing([])[0], timeout=0.2)
+        await _send(limiter, _failing([])[0], timeout=0.2)
+
+    with pytest.raises(RateLimited):
+        asyncio.run(scenario())
+    assert limiter.stats()["timed_out"] == 1
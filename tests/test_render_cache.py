@@ -0,0 +1,62 @@
+import pytest
+
+from parlanchina.app import create_app
+from parlanchina.paths import ensure_app_dirs
+from parlanchina.services import chat_store, render_cache
+from parlanchina.services.render_cache import RenderCache
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    rendered: list[str] = []
+
+    def render_markdown(md_text):
+        rendered.append(md_text)
+        return f"<p>{md_text}</p>"
+
+    monkeypatch.setattr(render_cache, "render_markdown", render_markdown)
+    return rendered
+
+
+def test_markdown_is_rendered_once_per_content(renders):
+    cache = RenderCache(max_entries=2)
+
+    assert cache.render("a") == "<p>a</p>"
+    cache.render("a")
+    cache.render("b")
+    cache.render("c")
+
+    assert renders == ["a", "b", "c"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path, renders):
+    RenderCache(disk_dir=tmp_path).render("shared")
+    other = RenderCache(disk_dir=tmp_path)
+
+    assert other.render("shared") == "<p>shared</p>"
+    assert renders == ["shared"]
+    assert other.stats()["disk_hits"] == 1
+
+
+@pytest.mark.parametrize("store_html", [False, True])
+def test_assistant_messages_store_markdown_and_render_lazily(tmp_path, monkeypatch, store_html):
+    monkeypatch.setenv("PARLANCHINA_STORE_HTML", str(store_html).lower())
+    app = create_app(tmp_path, ensure_app_dirs(tmp_path))
+    with app.app_context():
+        session_id = chat_store.create_session(None, "gpt-test")["id"]
+        chat_store.append_assistant_message(session_id, "**bold**")
+        stored = chat_store.load_session(session_id)["messages"][0]
+        shown = render_cache.with_html([stored])[0]
+
+    assert stored["raw_markdown"] == "**bold**"
+    assert ("html" in stored) is store_html
+    assert "<strong>bold</strong>" in shown["html"]
+
+
+def test_stored_html_of_older_sessions_is_used_as_is(tmp_path):
+    app = create_app(tmp_path, ensure_app_dirs(tmp_path))
+    legacy = {"role": "assistant", "raw_markdown": "**bold**", "html": "<p>as stored</p>"}
+    with app.app_context():
+        assert render_cache.with_html([legacy])[0]["html"] == "<p>as stored</p>"
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+
+from parlanchina.app import create_app
+from parlanchina.paths import ensure_app_dirs
+from parlanchina.services import llm, response_cache
+from parlanchina.services.response_cache import ResponseCache, request_key
+
+
+def test_key_ignores_whitespace_and_extra_fields():
+    a = [{"role": "user", "content": "Explain  this\nerror", "html": "<p>x</p>"}]
+    b = [{"role": "USER", "content": "Explain this error"}]
+
+    assert request_key("gpt-test", a) == request_key("gpt-test", b)
+    assert request_key("gpt-test", a) != request_key("gpt-other", a)
+
+
+def test_entries_expire_after_the_ttl():
+    cache = ResponseCache(ttl=0.05)
+    cache.put("title", "k", "A title")
+
+    assert cache.get("title", "k") == "A title"
+    time.sleep(0.06)
+    assert cache.get("title", "k") is None
+    assert cache.stats()["sites"]["title"]["expired"] == 1
+
+
+def test_memory_tier_is_bounded_by_entries_and_bytes():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put("title", "a", "aaaa")
+    cache.put("title", "b", "bbbb")
+    cache.put("title", "c", "cccc")
+    cache.put("title", "big", "x" * 11)
+
+    assert cache.get("title", "a") is None
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 8
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ResponseCache(disk_dir=tmp_path).put("explain", "key", "Cached explanation")
+    fresh = ResponseCache(disk_dir=tmp_path)
+
+    assert fresh.get("explain", "key") == "Cached explanation"
+    assert fresh.stats()["sites"]["explain"]["disk_hits"] == 1
+
+
+def test_disk_tier_is_pruned_oldest_first(tmp_path):
+    cache = ResponseCache(disk_dir=tmp_path, disk_max_bytes=200)  # Room for two entries.
+    for key in ("aa1", "aa2", "aa3"):
+        cache.put("title", key, "x" * 40)
+        time.sleep(0.01)
+    cache.clear()
+
+    assert cache.prune_disk() == 1
+    assert cache.get("title", "aa1") is None
+    assert cache.get("title", "aa3") is not None
+
+
+@pytest.fixture
+def completions(tmp_path, monkeypatch):
+    calls = []
+
+    async def _coalesced_completion(messages, model):
+        calls.append(messages)
+        return "Error generating response" if "fail" in messages[-1]["content"] else "reply"
+
+    monkeypatch.setattr(llm, "_coalesced_completion", _coalesced_completion)
+    monkeypatch.setenv("PARLANCHINA_RESPONSE_CACHE", "true")
+    app = create_app(tmp_path, ensure_app_dirs(tmp_path))
+    with app.app_context():
+        yield calls
+
+
+def _complete(content, cache_site="title"):
+    messages = [{"role": "user", "content": content}]
+    return asyncio.run(llm.complete_response(messages, "gpt-test", cache_site=cache_site))
+
+
+def test_auxiliary_replies_are_served_from_the_cache(completions):
+    assert _complete("name this chat") == "reply"
+    assert _complete("name  this chat") == "reply"
+
+    assert len(completions) == 1
+    assert response_cache.stats()["sites"]["title"]["hits"] == 1
+
+
+def test_failures_and_uncached_call_sites_always_call_the_model(completions):
+    _complete("fail")
+    _complete("fail")
+    _complete("answer", cache_site=None)
+    _complete("answer", cache_site=None)
+
+    assert len(completions) == 4
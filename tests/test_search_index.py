@@ -0,0 +1,42 @@
+from parlanchina.app import create_app
+from parlanchina.paths import ensure_app_dirs
+from parlanchina.services import chat_store
+from parlanchina.services.search_index import SearchIndex
+
+
+def test_snippets_escape_message_html(tmp_path):
+    index = SearchIndex(tmp_path / "search.db")
+    index.add_message("s1", 0, "user", 'try <img src=x onerror=alert(1)> in python & "quotes"')
+
+    snippet = index.search("python")["messages"][0]["snippet"]
+
+    assert "<img" not in snippet
+    assert "&lt;img src=x onerror=alert(1)&gt;" in snippet
+    assert "<mark>python</mark>" in snippet
+    assert "&amp; &quot;quotes&quot;" in snippet
+
+
+def test_stray_marker_characters_in_messages_do_not_open_marks(tmp_path):
+    index = SearchIndex(tmp_path / "search.db")
+    index.add_message("s1", 0, "user", "odd \ue000text\ue001 about python")
+
+    snippet = index.search("python")["messages"][0]["snippet"]
+
+    assert snippet.count("<mark>") == snippet.count("</mark>") == 1
+
+
+def test_empty_index_is_backfilled_on_startup(tmp_path):
+    app = create_app(tmp_path, ensure_app_dirs(tmp_path))
+    with app.app_context():
+        session = chat_store.create_session(None, "gpt-test")
+        chat_store.append_user_message(session["id"], "backfill me please")
+    # As after upgrading: sessions on disk, but no search database yet.
+    app.extensions.pop("parlanchina_search_index")
+    (tmp_path / "data" / "search.db").unlink()
+
+    chat_store.start_search_backfill(app).join()
+
+    with app.app_context():
+        hits = chat_store.search("backfill")
+    assert [hit["session_id"] for hit in hits["messages"]] == [session["id"]]
+    assert chat_store.start_search_backfill(app) is None
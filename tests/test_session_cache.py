@@ -0,0 +1,108 @@
+import json
+
+from parlanchina.app import create_app
+from parlanchina.paths import ensure_app_dirs
+from parlanchina.services import chat_store
+from parlanchina.services.json_store import JsonChatStore
+
+
+def _session(session_id: str) -> dict:
+    return {
+        "id": session_id,
+        "title": "Title",
+        "model": "gpt-test",
+        "mode": "agent",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": "2026-01-01T00:00:00+00:00",
+        "enabled_mcp_tools": ["db.query"],
+        "messages": [{"role": "user", "content": "hi"}],
+    }
+
+
+def _open(tmp_path, monkeypatch, cache_size: int = 128) -> tuple[JsonChatStore, list[str]]:
+    store = JsonChatStore(tmp_path, cache_size=cache_size)
+    parsed: list[str] = []
+    original = store._load_header
+
+    def load(session_id):
+        parsed.append(session_id)
+        return original(session_id)
+
+    monkeypatch.setattr(store, "_load_header", load)
+    return store, parsed
+
+
+def _seed(tmp_path, *session_ids: str) -> None:
+    store = JsonChatStore(tmp_path)
+    for session_id in session_ids:
+        store.save_session(_session(session_id))
+    store.close()
+
+
+def test_repeated_reads_parse_the_session_once(tmp_path, monkeypatch):
+    _seed(tmp_path, "s1")
+    store, parsed = _open(tmp_path, monkeypatch)
+
+    store.load_header("s1")
+    store.load_session("s1")
+    store.load_messages("s1", -1, None)
+    assert store.load_header("s1")["enabled_mcp_tools"] == ["db.query"]
+
+    assert parsed == ["s1"]
+    stats = store.stats()["session_cache"]
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+
+def test_files_changed_on_disk_are_reparsed(tmp_path, monkeypatch):
+    _seed(tmp_path, "s1")
+    store, parsed = _open(tmp_path, monkeypatch)
+    store.load_header("s1")
+
+    header_path = tmp_path / "sessions" / "s1.json"
+    header = json.loads(header_path.read_text(encoding="utf-8"))
+    header["title"] = "Changed elsewhere"
+    header_path.write_text(json.dumps(header), encoding="utf-8")
+
+    assert store.load_header("s1")["title"] == "Changed elsewhere"
+    assert parsed == ["s1", "s1"]
+
+
+def test_writes_refresh_and_deletes_drop_the_entry(tmp_path, monkeypatch):
+    _seed(tmp_path, "s1")
+    store, parsed = _open(tmp_path, monkeypatch)
+    store.load_session("s1")
+
+    store.update_session("s1", {"title": "Renamed"})
+    assert store.load_header("s1")["title"] == "Renamed"
+    store.append_message("s1", {"role": "assistant", "raw_markdown": "yo"}, {})
+    assert len(store.load_session("s1")["messages"]) == 2
+    assert parsed == ["s1"]
+
+    store.delete_session("s1")
+    assert store.load_session("s1") is None
+    assert store.stats()["session_cache"]["entries"] == 0
+
+
+def test_cache_is_bounded_and_can_be_disabled(tmp_path, monkeypatch):
+    _seed(tmp_path, "s1", "s2", "s3")
+    store, _ = _open(tmp_path, monkeypatch, cache_size=2)
+    for session_id in ("s1", "s2", "s3"):
+        store.load_header(session_id)
+    assert store.stats()["session_cache"]["entries"] == 2
+
+    uncached, parsed = _open(tmp_path, monkeypatch, cache_size=0)
+    uncached.load_header("s1")
+    uncached.load_header("s1")
+    assert parsed == ["s1", "s1"]
+
+
+def test_admin_stats_reports_cache_counters(tmp_path):
+    app = create_app(tmp_path, ensure_app_dirs(tmp_path))
+    with app.app_context():
+        session = chat_store.create_session(None, "gpt-test")
+        chat_store.load_header(session["id"])
+
+    stats = app.test_client().get("/admin/stats").get_json()
+
+    assert stats["store"]["backend"] == "json"
+    assert stats["store"]["session_cache"]["hits"] >= 1
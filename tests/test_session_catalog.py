@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from parlanchina.services.json_store import JsonChatStore
+
+
+def _session(session_id: str, updated_at: str) -> dict:
+    return {
+        "id": session_id,
+        "title": f"Session {session_id}",
+        "model": "gpt-test",
+        "mode": "ask",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": updated_at,
+        "messages": [{"role": "user", "content": "hi"}],
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JsonChatStore(tmp_path)
+    for day in range(1, 4):
+        store.save_session(_session(f"s{day}", f"2026-01-0{day}T00:00:00+00:00"))
+    yield store
+    store.close()
+
+
+def _count_header_loads(store, monkeypatch) -> list[str]:
+    loaded: list[str] = []
+    original = store._load_header
+
+    def load(session_id):
+        loaded.append(session_id)
+        return original(session_id)
+
+    monkeypatch.setattr(store, "_load_header", load)
+    return loaded
+
+
+def test_listing_sorts_pages_and_omits_messages(store):
+    sessions = store.list_sessions()
+
+    assert [s["id"] for s in sessions] == ["s3", "s2", "s1"]
+    assert sessions[0]["message_count"] == 1
+    assert "messages" not in sessions[0]
+    assert [s["id"] for s in store.list_sessions(limit=1, offset=1)] == ["s2"]
+
+
+def test_only_sessions_changed_on_disk_are_parsed_again(tmp_path, store, monkeypatch):
+    store.list_sessions()
+    loaded = _count_header_loads(store, monkeypatch)
+
+    store.list_sessions()
+    assert loaded == []
+
+    header_path = tmp_path / "sessions" / "s1.json"
+    header = json.loads(header_path.read_text(encoding="utf-8"))
+    header["title"] = "Renamed elsewhere"
+    header_path.write_text(json.dumps(header), encoding="utf-8")
+
+    titles = {s["id"]: s["title"] for s in store.list_sessions()}
+    assert loaded == ["s1"]
+    assert titles["s1"] == "Renamed elsewhere"
+
+
+def test_catalog_is_written_on_close_and_reused(tmp_path, store, monkeypatch):
+    store.list_sessions()
+    store.close()
+
+    raw = json.loads((tmp_path / "sessions_catalog.json").read_text(encoding="utf-8"))
+    assert raw["version"] == 2
+    assert set(raw["sessions"]) == {"s1", "s2", "s3"}
+
+    reopened = JsonChatStore(tmp_path)
+    try:
+        loaded = _count_header_loads(reopened, monkeypatch)
+        assert len(reopened.list_sessions()) == 3
+        assert loaded == []
+    finally:
+        reopened.close()
+
+
+def test_unreadable_catalog_is_rebuilt(tmp_path, store):
+    store.close()
+    (tmp_path / "sessions_catalog.json").write_text("{not json", encoding="utf-8")
+
+    reopened = JsonChatStore(tmp_path)
+    try:
+        assert [s["id"] for s in reopened.list_sessions()] == ["s3", "s2", "s1"]
+    finally:
+        reopened.close()
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from parlanchina.services.json_store import JsonChatStore
+from parlanchina.services.sqlite_store import SqliteChatStore
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        store = JsonChatStore(tmp_path)
+    else:
+        store = SqliteChatStore(tmp_path / "sessions.db")
+    yield store
+    store.close()
+
+
+def _session(session_id: str, **fields) -> dict:
+    return {
+        "id": session_id,
+        "title": "Title",
+        "model": "gpt-test",
+        "mode": "ask",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": "2026-01-01T00:00:00+00:00",
+        "messages": [],
+        **fields,
+    }
+
+
+def test_transactions_do_not_lose_updates(store):
+    store.save_session(_session("s1", counter=0))
+
+    def bump() -> None:
+        for _ in range(25):
+            with store.transaction("s1") as (header, updates):
+                updates["counter"] = header["counter"] + 1
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.load_header("s1")["counter"] == 100
+
+
+def test_transaction_discards_updates_when_the_block_raises(store):
+    store.save_session(_session("s1"))
+
+    with pytest.raises(ValueError):
+        with store.transaction("s1") as (_, updates):
+            updates["title"] = "Changed"
+            raise ValueError
+
+    assert store.load_header("s1")["title"] == "Title"
+
+
+def test_update_session_returns_the_merged_header(store):
+    store.save_session(_session("s1"))
+
+    header = store.update_session("s1", {"title": "New", "model": "gpt-other"})
+
+    assert header["title"] == "New"
+    assert store.load_header("s1")["model"] == "gpt-other"
+
+
+def test_transaction_on_a_missing_session_raises(store):
+    with pytest.raises(FileNotFoundError):
+        with store.transaction("missing"):
+            pass
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+
+import pytest
+
+from parlanchina.services.single_flight import SingleFlight
+
+
+def test_identical_calls_share_one_result():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("k", "same", work) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [1] * 5
+    assert flight.stats()["kinds"]["k"] == {"calls": 1, "shared": 4}
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_errors_are_shared_with_followers():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.do("k", "same", work) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_leader_lets_the_call_finish_for_followers():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do("k", "same", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.do("k", "same", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "done"
+    assert calls == 1
+
+
+def test_cancelled_leader_without_followers_cancels_the_call():
+    flight = SingleFlight()
+    finished = False
+
+    async def work():
+        nonlocal finished
+        await asyncio.sleep(0.1)
+        finished = True
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do("k", "same", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await asyncio.sleep(0.15)
+
+    asyncio.run(scenario())
+    assert not finished
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_follower_starts_its_own_call_when_the_flight_was_cancelled():
+    flight = SingleFlight()
+    calls = 0
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await gate.wait()
+                raise asyncio.CancelledError
+            return "fresh"
+
+        leader = asyncio.create_task(flight.do("k", "same", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.do("k", "same", work))
+        await asyncio.sleep(0.01)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "fresh"
+    assert calls == 2
+
+
+def test_cancelled_follower_does_not_disturb_the_leader():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do("k", "same", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.do("k", "same", work))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_calls_are_shared_across_event_loops():
+    flight = SingleFlight()
+    calls = 0
+    results = []
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return "done"
+
+    def run_in_thread():
+        results.append(asyncio.run(flight.do("k", "same", work)))
+
+    threads = [threading.Thread(target=run_in_thread) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["done"] * 3
+    assert calls == 1
@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+
+import pytest
+
+from parlanchina.services.json_store import JsonChatStore
+from parlanchina.services.sqlite_store import SqliteChatStore
+
+
+@pytest.fixture
+def json_store(tmp_path):
+    store = JsonChatStore(tmp_path / "json")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    store = SqliteChatStore(tmp_path / "sessions.db")
+    yield store
+    store.close()
+
+
+def _session(session_id: str, updated_at: str, **fields) -> dict:
+    return {
+        "id": session_id,
+        "title": f"Session {session_id}",
+        "model": "gpt-test",
+        "mode": "agent",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": updated_at,
+        **fields,
+    }
+
+
+def _set_fields(record: dict) -> dict:
+    # SQLite reports unset tool selections as None; the JSON backend omits them.
+    return {k: v for k, v in record.items() if v is not None}
+
+
+def test_import_round_trips_sessions(json_store, sqlite_store):
+    json_store.save_session(
+        _session(
+            "a",
+            "2026-01-02T00:00:00+00:00",
+            enabled_internal_tools=["image"],
+            enabled_mcp_tools=["db.query"],
+            context_summary={"text": "earlier", "through": 1, "tokens": 2},
+            messages=[
+                {"role": "user", "content": "hola"},
+                {"role": "assistant", "raw_markdown": "**hi**", "images": [], "model": "gpt-test"},
+            ],
+        )
+    )
+    json_store.save_session(_session("b", "2026-01-03T00:00:00+00:00", messages=[]))
+
+    assert sqlite_store.import_sessions(json_store) == 2
+
+    assert [s["id"] for s in sqlite_store.list_sessions()] == ["b", "a"]
+    for session_id in ("a", "b"):
+        assert _set_fields(sqlite_store.load_session(session_id)) == _set_fields(
+            json_store.load_session(session_id)
+        )
+        assert _set_fields(sqlite_store.load_header(session_id)) == _set_fields(
+            json_store.load_header(session_id)
+        )
+
+
+def test_import_keeps_message_order_for_paged_reads(json_store, sqlite_store):
+    messages = [{"role": "user", "content": str(i)} for i in range(10)]
+    json_store.save_session(_session("a", "2026-01-02T00:00:00+00:00", messages=messages))
+
+    sqlite_store.import_sessions(json_store)
+
+    header, page = sqlite_store.load_messages("a", 7, None)
+    assert header["message_count"] == 10
+    assert page == messages[7:]
+
+
+def test_close_closes_connections_opened_by_other_threads(sqlite_store):
+    sqlite_store.save_session(_session("a", "2026-01-02T00:00:00+00:00", messages=[]))
+    opened = []
+
+    def read() -> None:
+        sqlite_store.load_header("a")
+        opened.append(sqlite_store._local.conn)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join()
+
+    sqlite_store.close()
+
+    with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+        opened[0].execute("SELECT 1")
+    assert sqlite_store.load_header("a")["title"] == "Session a"
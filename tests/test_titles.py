@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from parlanchina.app import create_app
+from parlanchina.paths import ensure_app_dirs
+from parlanchina.services import chat_store, llm, titles
+
+
+@pytest.mark.parametrize(
+    ("message", "title"),
+    [
+        ("Can you help me write a Python script to parse CSV files?", "Write Python script to parse CSV"),
+        ("How do I configure nginx reverse proxy for websockets", "Configure nginx reverse proxy for websockets"),
+        ("hi", "Hi"),
+        ("", titles.DEFAULT_TITLE),
+    ],
+)
+def test_local_title_keeps_the_content_words(message, title):
+    assert titles.local_title(message) == title
+
+
+def test_llm_strategy_keeps_the_default_title(monkeypatch):
+    monkeypatch.setenv("PARLANCHINA_TITLE_STRATEGY", "llm")
+    assert titles.initial_title("Explain Rust lifetimes") is None
+
+    monkeypatch.setenv("PARLANCHINA_TITLE_STRATEGY", "local")
+    assert titles.initial_title("Explain Rust lifetimes") == "Explain Rust lifetimes"
+
+
+@pytest.fixture
+def app(tmp_path):
+    return create_app(tmp_path, ensure_app_dirs(tmp_path))
+
+
+def _model_reply(monkeypatch, reply: str) -> None:
+    async def complete_response(prompt, model, **kwargs):
+        return reply
+
+    monkeypatch.setattr(llm, "complete_response", complete_response)
+
+
+def test_model_title_upgrades_the_local_one(app, monkeypatch):
+    _model_reply(monkeypatch, '"Rust lifetime basics"')
+    with app.app_context():
+        session_id = chat_store.create_session("Explain Rust lifetimes", "gpt-test")["id"]
+
+    asyncio.run(
+        titles._model_title(app, session_id, "Explain Rust lifetimes", "gpt-test", "Explain Rust lifetimes")
+    )
+
+    with app.app_context():
+        assert chat_store.load_header(session_id)["title"] == "Rust lifetime basics"
+
+
+def test_model_title_does_not_overwrite_a_rename(app, monkeypatch):
+    _model_reply(monkeypatch, "Rust lifetime basics")
+    with app.app_context():
+        session_id = chat_store.create_session("Explain Rust lifetimes", "gpt-test")["id"]
+        chat_store.update_session_title(session_id, "My notes")
+
+    asyncio.run(
+        titles._model_title(app, session_id, "Explain Rust lifetimes", "gpt-test", "Explain Rust lifetimes")
+    )
+
+    with app.app_context():
+        assert chat_store.load_header(session_id)["title"] == "My notes"
+
+
+def test_failed_model_call_keeps_the_local_title(app, monkeypatch):
+    _model_reply(monkeypatch, next(iter(llm.FAILED_COMPLETIONS)))
+    with app.app_context():
+        session_id = chat_store.create_session("Explain Rust lifetimes", "gpt-test")["id"]
+
+    asyncio.run(
+        titles._model_title(app, session_id, "Explain Rust lifetimes", "gpt-test", "Explain Rust lifetimes")
+    )
+
+    with app.app_context():
+        assert chat_store.load_header(session_id)["title"] == "Explain Rust lifetimes"
+
+
+def test_batch_reply_is_parsed_despite_surrounding_text():
+    reply = 'Here you go:\n{"1": "CSV parsing", "2": "  ", "3": 4}\nThanks'
+
+    assert titles._parse_batch_reply(reply) == {"1": "CSV parsing"}
+    assert titles._parse_batch_reply("no json here") == {}
@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from parlanchina.services import background_loop, llm
+from parlanchina.services.llm import _ToolCall
+
+_caller = contextvars.ContextVar("caller", default=None)
+
+
+@pytest.fixture
+def tracked_tools(monkeypatch):
+    monkeypatch.setenv("PARLANCHINA_TOOL_CONCURRENCY", "3")
+    monkeypatch.setenv("PARLANCHINA_TOOL_CONCURRENCY_PER_SERVER", "1")
+    monkeypatch.setattr(llm, "_tool_limits", None)
+    active: dict[str, int] = {}
+    peaks: dict[str, int] = {}
+
+    async def execute(call: _ToolCall):
+        for key in (call.server, "*"):
+            active[key] = active.get(key, 0) + 1
+            peaks[key] = max(peaks.get(key, 0), active[key])
+        await asyncio.sleep(0.02)
+        for key in (call.server, "*"):
+            active[key] -= 1
+        return f"{call.tool_id} for {_caller.get()}", []
+
+    monkeypatch.setattr(llm, "_execute_tool_call", execute)
+    return peaks
+
+
+async def _turn(name: str, tool_ids: list[str]) -> tuple[list[str], list[llm.LLMEvent]]:
+    _caller.set(name)
+    calls = [_ToolCall(f"c{i}", tool_id, {}, tool_id) for i, tool_id in enumerate(tool_ids)]
+    results: list[str] = []
+    events = [event async for event in llm._run_tool_calls(calls, results)]
+    return results, events
+
+
+def test_limits_are_shared_across_turns(tracked_tools):
+    async def scenario():
+        return await asyncio.gather(
+            _turn("a", ["db.query", "web.fetch", "fs.read"]),
+            _turn("b", ["db.query", "web.fetch", "git.log"]),
+        )
+
+    (results_a, events_a), (results_b, _) = asyncio.run(scenario())
+
+    assert tracked_tools["db"] == tracked_tools["web"] == 1
+    assert tracked_tools["*"] <= 3
+    assert results_a == ["db.query for a", "web.fetch for a", "fs.read for a"]
+    assert results_b[2] == "git.log for b"
+    assert [event.tool["completed"] for event in events_a] == [1, 2, 3]
+
+
+def test_turns_on_the_background_loop_use_the_same_limits(tracked_tools):
+    async def scenario():
+        return await asyncio.gather(_turn("a", ["db.query"] * 2), _turn("b", ["db.query"]))
+
+    results = background_loop.run(scenario(), timeout=5)
+
+    assert tracked_tools["db"] == 1
+    assert [r for r, _ in results] == [["db.query for a"] * 2, ["db.query for b"]]